@@ -1,11 +1,12 @@
 import logging
-from app.services.elevenlabs import ElevenLabsService
+from typing import Iterator
+from app.services.registry import get_elevenlabs_service
 
 logger = logging.getLogger(__name__)
 
 class AudioAgent:
     def __init__(self):
-        self.service = ElevenLabsService()
+        self.service = get_elevenlabs_service()
     
     def generate_audio(self, text: str, age: int) -> str:
         try:
@@ -25,6 +26,21 @@ class AudioAgent:
             logger.error(f"Error generating audio: {e}")
             raise
 
+    def stream_audio(self, text: str, age: int) -> Iterator[bytes]:
+        """Yield MP3 chunks for the lesson text as they are synthesized."""
+        try:
+            age = int(age)
+        except (ValueError, TypeError) as e:
+            logger.error(f"Invalid age parameter: {e}")
+            raise TypeError(f"Age must be an integer, got {type(age)}: {age}")
+        voice_params = self._select_voice_profile(age)
+        return self.service.stream_text_to_speech(
+            text=text,
+            voice=voice_params['name'],
+            stability=voice_params['stability'],
+            similarity_boost=voice_params['similarity']
+        )
+
     def _select_voice_profile(self, age: int) -> dict:
         age_groups = {
             (3,6): {'name': 'Child', 'stability': 0.7, 'similarity': 0.8},
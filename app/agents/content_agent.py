@@ -1,14 +1,19 @@
 # agents/content_agent.py
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
+import json
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from app.services.mistral import MistralService
+from app.services.registry import get_mistral_service
+from app.utils import resilience
+from app.utils.cache import LessonCache
+from app.utils.json_repair import repair_json, extract_partial_string
+from app.config import LESSON_CACHE_ENABLED
 
-class ContentAgent:
-    def __init__(self):
-        self.llm = MistralService().get_model()
-        self.prompt_template = PromptTemplate(
-            input_variables=["age", "prompt"],
-            template="""Generate educational content for {age}-year-olds about: {prompt}
+logger = logging.getLogger(__name__)
+
+LESSON_INSTRUCTIONS = """Generate educational content for {age}-year-olds about: {prompt}
             Limit to 200-300 words.
             Use simple language with concrete examples
             Include a scenario showing real-world application 
@@ -19,8 +24,210 @@ class ContentAgent:
             Vocabulary has to be constrained to {age}+2 grade level
             
             """
+
+STRUCTURED_INSTRUCTIONS = """
+            Respond with a single JSON object and nothing else, with exactly these keys:
+            "body": the lesson text described above, as one string
+            "hashtags": 10 educational hashtags, each a single word or compound word prefixed with #
+            "learning_points": 3 to 5 short key takeaways
+            "quiz": 2 or 3 objects with "question" and "answer" strings
+            "image_prompts": up to 5 one-sentence descriptions of friendly illustrations for the lesson
+            """
+
+class ContentAgent:
+    def __init__(self, cache: Optional[LessonCache] = None):
+        self.service = get_mistral_service()
+        self.llm = self.service.get_model()
+        self.cache = cache if cache is not None else (LessonCache() if LESSON_CACHE_ENABLED else None)
+        self.prompt_template = PromptTemplate(
+            input_variables=["age", "prompt"],
+            template=LESSON_INSTRUCTIONS
+        )
+        self.structured_prompt_template = PromptTemplate(
+            input_variables=["age", "prompt"],
+            template=LESSON_INSTRUCTIONS + STRUCTURED_INSTRUCTIONS
         )
     
     def generate_content(self, age: int, prompt: str) -> str:
+        cache_key = LessonCache.make_key(age, prompt, MistralService.MODEL, MistralService.TEMPERATURE)
+        if self.cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Lesson cache hit for age {age}: {prompt}")
+                return cached
+
         chain = LLMChain(llm=self.llm, prompt=self.prompt_template)
-        return chain.run(age=age, prompt=prompt)
+        content = resilience.call("mistral", chain.run, endpoint=MistralService.MODEL, age=age, prompt=prompt)
+        if self.cache and content:
+            self.cache.set(cache_key, content)
+        return content
+
+    def stream_content(self, age: int, prompt: str) -> Iterator[str]:
+        """Yield the lesson text token by token, serving cache hits in one piece."""
+        cache_key = LessonCache.make_key(age, prompt, MistralService.MODEL, MistralService.TEMPERATURE)
+        if self.cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Lesson cache hit for age {age}: {prompt}")
+                yield cached
+                return
+
+        parts = []
+        for token in self.service.stream(self.prompt_template.format(age=age, prompt=prompt)):
+            parts.append(token)
+            yield token
+
+        content = "".join(parts)
+        if self.cache and content:
+            self.cache.set(cache_key, content)
+
+    def stream_structured(self, age: int, prompt: str) -> Iterator[Tuple[str, Any]]:
+        """
+        Generate the lesson body, hashtags, learning points, quiz and image prompts in one call.
+
+        Yields ("body", text) events as the lesson body streams in, then a single
+        ("lesson", dict) event once the JSON response has been parsed (and
+        repaired locally if it is malformed).
+        """
+        cache_key = LessonCache.make_key(
+            age, prompt, MistralService.MODEL, MistralService.TEMPERATURE, variant="structured"
+        )
+        if self.cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Structured lesson cache hit for age {age}: {prompt}")
+                lesson = json.loads(cached)
+                yield "body", lesson["body"]
+                yield "lesson", lesson
+                return
+
+        raw = ""
+        emitted = 0
+        for token in self.service.stream(
+            self.structured_prompt_template.format(age=age, prompt=prompt), json_mode=True
+        ):
+            raw += token
+            body = extract_partial_string(raw, "body")
+            if len(body) > emitted:
+                yield "body", body[emitted:]
+                emitted = len(body)
+
+        lesson = self.parse_structured(raw)
+        if len(lesson["body"]) > emitted and lesson["body"].startswith(extract_partial_string(raw, "body")):
+            yield "body", lesson["body"][emitted:]
+        if self.cache and lesson["parsed"]:
+            self.cache.set(cache_key, json.dumps(lesson))
+        yield "lesson", lesson
+
+    def generate_structured(self, age: int, prompt: str) -> Dict[str, Any]:
+        """Blocking form of stream_structured; returns the parsed lesson."""
+        for kind, payload in self.stream_structured(age, prompt):
+            if kind == "lesson":
+                return payload
+        raise RuntimeError("Structured generation returned no lesson")
+
+    def generate_structured_batch(self, ages: List[int], prompt: str) -> Dict[int, Dict[str, Any]]:
+        """
+        Generate the structured lesson for several ages, one concurrent request per uncached age.
+
+        Args:
+            ages (List[int]): Target ages
+            prompt (str): Lesson topic shared by every age
+
+        Returns:
+            Dict[int, Dict[str, Any]]: Parsed lesson per age that succeeded; cached ages are not
+            re-requested and ages whose request or parse failed are logged and left out
+        """
+        lessons: Dict[int, Dict[str, Any]] = {}
+        keys = {
+            age: LessonCache.make_key(age, prompt, MistralService.MODEL, MistralService.TEMPERATURE, variant="structured")
+            for age in ages
+        }
+        if self.cache:
+            for age, key in keys.items():
+                cached = self.cache.get(key)
+                if cached is not None:
+                    lessons[age] = json.loads(cached)
+
+        missing = [age for age in ages if age not in lessons]
+        if missing:
+            logger.info(f"Requesting lessons for ages {missing} concurrently: {prompt}")
+            responses = self.service.batch(
+                [self.structured_prompt_template.format(age=age, prompt=prompt) for age in missing], json_mode=True
+            )
+            for age, raw in zip(missing, responses):
+                try:
+                    if isinstance(raw, Exception):
+                        raise raw
+                    lesson = self.parse_structured(raw)
+                except Exception as e:
+                    logger.error(f"Structured lesson for age {age} failed: {str(e)}")
+                    continue
+                if self.cache and lesson["parsed"]:
+                    self.cache.set(keys[age], json.dumps(lesson))
+                lessons[age] = lesson
+        return {age: lessons[age] for age in ages if age in lessons}
+
+    @staticmethod
+    def parse_structured(raw: str) -> Dict[str, Any]:
+        """
+        Normalize a structured response into a lesson dict.
+
+        Output that cannot be parsed, or parses without a body, is a failed
+        response: the body is salvaged from the partial JSON, or taken from the
+        raw text when the model answered in prose. Raw JSON is never used as
+        the lesson text.
+
+        Raises:
+            ValueError: If no lesson body can be recovered
+        """
+        data = repair_json(raw)
+        body = str((data or {}).get("body") or "").strip()
+        parsed = bool(body)
+        if not body:
+            logger.warning("Structured lesson has no parseable body; salvaging it from the raw response")
+            body = extract_partial_string(raw, "body").strip()
+            if not body and data is None and not raw.lstrip().startswith(("{", "`")):
+                body = raw.strip()
+        if not body:
+            raise ValueError("Structured lesson response has no usable body")
+        data = data or {}
+
+        def strings(value) -> list:
+            return [str(v).strip() for v in value if str(v).strip()] if isinstance(value, list) else []
+
+        quiz = []
+        for item in data.get("quiz") or []:
+            if isinstance(item, dict) and item.get("question"):
+                quiz.append({"question": str(item["question"]).strip(), "answer": str(item.get("answer", "")).strip()})
+            elif isinstance(item, str) and item.strip():
+                quiz.append({"question": item.strip(), "answer": ""})
+
+        return {
+            "body": body,
+            "hashtags": ["#" + tag.lstrip("#").replace(" ", "") for tag in strings(data.get("hashtags"))][:10],
+            "learning_points": strings(data.get("learning_points")),
+            "quiz": quiz,
+            "image_prompts": strings(data.get("image_prompts"))[:5],
+            "parsed": parsed,
+        }
+
+    @staticmethod
+    def format_lesson(lesson: Dict[str, Any]) -> str:
+        """Render a structured lesson as the plain text shown, narrated and saved; quiz answers are left out."""
+        sections = [lesson["body"]]
+        if lesson["learning_points"]:
+            sections.append("Key learning points:\n" + "\n".join(f"- {point}" for point in lesson["learning_points"]))
+        if lesson["quiz"]:
+            sections.append("Quiz:\n" + "\n".join(
+                f"{i}. {item['question']}" for i, item in enumerate(lesson["quiz"], 1)
+            ))
+        return "\n\n".join(sections)
+
+    @staticmethod
+    def format_answers(lesson: Dict[str, Any]) -> str:
+        """Render the quiz answer key, kept apart from the narrated lesson text."""
+        answered = [(i, item) for i, item in enumerate(lesson["quiz"], 1) if item["answer"]]
+        if not answered:
+            return ""
+        return "Quiz answers:\n" + "\n".join(f"{i}. {item['question']}\n   Answer: {item['answer']}" for i, item in answered)
@@ -1,18 +1,29 @@
-import io
+import time
 import logging
-from typing import List
-from PIL import Image, ImageDraw, ImageFont
+from typing import List, Optional
+from PIL import Image, ImageDraw, ImageFile, ImageFont
 import textwrap
-import requests
-from app.services.fal_ai import FalService
+import contextvars
+import concurrent.futures
+from app.services.registry import get_fal_service, get_http_session
+from app.utils.keywords import get_keyword_extractor
+from app.utils.resilience import bounded_timeout
+from app.utils.telemetry import span, traced
+from app.config import (
+    IMAGE_GENERATION_WORKERS,
+    IMAGE_DOWNLOAD_MAX_BYTES,
+    IMAGE_DOWNLOAD_TIMEOUT_SECONDS,
+)
 
 NUMBER_OF_IMAGES = 5
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 
 logger = logging.getLogger(__name__)
 
 class ImageAgent:
-    def __init__(self):
-        self.service = FalService()
+    def __init__(self, max_workers: int = IMAGE_GENERATION_WORKERS):
+        self.service = get_fal_service()
+        self.max_workers = max(1, max_workers)
         try:
             self.font = ImageFont.truetype("arial.ttf", 24)
         except IOError:
@@ -20,39 +31,45 @@ class ImageAgent:
             self.font = ImageFont.load_default()
 
     def _extract_keywords(self, text: str) -> List[str]:
-        # Simple keyword extraction - split by spaces and take unique words
-        words = set(text.lower().split())
-        # Remove common stop words (you might want to expand this list)
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to'}
-        return list(words - stop_words)
+        # Locally ranked TF-IDF keywords, best first
+        return get_keyword_extractor().extract(text, limit=NUMBER_OF_IMAGES)
 
-    def generate_images(self, text: str, age: int, content_labels: List[str] = None) -> List[Image.Image]:
+    def generate_images(
+        self,
+        text: str,
+        age: int,
+        content_labels: List[str] = None,
+        image_prompts: List[str] = None
+    ) -> List[Image.Image]:
         try:
             # Use provided content labels if available, otherwise extract keywords
             keywords = content_labels if content_labels else self._extract_keywords(text)
+            # Remove '#' if present in the keyword
+            keywords = [keyword.lstrip('#') for keyword in keywords[:NUMBER_OF_IMAGES] if keyword.lstrip('#')]
+            # Scene descriptions from a structured lesson, paired with the keywords in order
+            descriptions = list(image_prompts or [])[:len(keywords)]
+            descriptions += [None] * (len(keywords) - len(descriptions))
             images = []
-            
-            for keyword in keywords[:5]:
-                # Remove '#' if present in the keyword
-                keyword = keyword.replace('#', '') if keyword.startswith('#') else keyword
-                prompt = f"Educational illustration for {age} year olds about {keyword}, digital art style, friendly, colorful"
-                try:
-                    # Get image URLs from FalService
-                    image_urls = self.service.generate_images(
-                        prompt=prompt,
-                        num_images=1
+
+            # Submit every keyword at once; each worker generates and then downloads,
+            # so downloads for early keywords overlap with generation for later ones
+            workers = min(self.max_workers, len(keywords)) or 1
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(
+                        contextvars.copy_context().run, self._generate_keyword_images, keyword, age, description
                     )
-                    
-                    # Download and process each image
-                    for url in image_urls:
-                        response = requests.get(url)
-                        image = Image.open(io.BytesIO(response.content))
-                        annotated_img = self._add_text_overlay(image, keyword)
-                        images.append(annotated_img)
-                        
-                except Exception as e:
-                    logger.error(f"Failed to generate image for keyword '{keyword}': {str(e)}")
-                    continue
+                    for keyword, description in zip(keywords, descriptions)
+                ]
+
+                # Collect in keyword order regardless of completion order
+                for keyword, future in zip(keywords, futures):
+                    try:
+                        for image in future.result():
+                            images.append(self._add_text_overlay(image, keyword))
+                    except Exception as e:
+                        logger.error(f"Failed to generate image for keyword '{keyword}': {str(e)}")
+                        continue
             
             if not images:
                 raise Exception("Failed to generate any images")
@@ -63,6 +80,42 @@ class ImageAgent:
             logger.error(f"Error in image generation process: {str(e)}")
             raise
 
+    def _generate_keyword_images(self, keyword: str, age: int, description: Optional[str] = None) -> List[Image.Image]:
+        subject = f"{keyword}: {description}" if description else keyword
+        prompt = f"Educational illustration for {age} year olds about {subject}, digital art style, friendly, colorful"
+        with span("images.keyword", keyword=keyword):
+            # Get image URLs from FalService
+            image_urls = self.service.generate_images(
+                prompt=prompt,
+                num_images=1
+            )
+
+            # Download and decode each image while still on the worker thread
+            return [self._download_image(url) for url in image_urls]
+
+    @traced("download.image")
+    def _download_image(self, url: str) -> Image.Image:
+        """Stream an image, decoding each chunk as it arrives, within size and time limits."""
+        # Never wait past the request deadline
+        timeout = bounded_timeout(IMAGE_DOWNLOAD_TIMEOUT_SECONDS)
+        deadline = time.monotonic() + timeout
+        with get_http_session().get(url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            declared_size = int(response.headers.get('Content-Length') or 0)
+            if declared_size > IMAGE_DOWNLOAD_MAX_BYTES:
+                raise ValueError(f"Image is {declared_size} bytes, over the {IMAGE_DOWNLOAD_MAX_BYTES} byte limit")
+
+            parser = ImageFile.Parser()
+            received = 0
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                received += len(chunk)
+                if received > IMAGE_DOWNLOAD_MAX_BYTES:
+                    raise ValueError(f"Image download exceeded the {IMAGE_DOWNLOAD_MAX_BYTES} byte limit")
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Image download exceeded {timeout:.1f}s")
+                parser.feed(chunk)
+            return parser.close()
+
     def _add_text_overlay(self, image: Image.Image, text: str) -> Image.Image:
         draw = ImageDraw.Draw(image)
         text_lines = textwrap.wrap(text, width=20)
@@ -1,12 +1,12 @@
 import logging
-from app.services.fal_ai import FalService
+from app.services.registry import get_fal_service
 from app.utils.output_manager import OutputManager
 
 logger = logging.getLogger(__name__)
 
 class VideoAgent:
     def __init__(self):
-        self.service = FalService()
+        self.service = get_fal_service()
     
     def generate_video(self, text: str, age: int, request_id: str = None) -> str:
         try:
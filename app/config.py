@@ -4,10 +4,162 @@ import logging
 from dotenv import load_dotenv
 from typing import Optional
 
+# Load .env before any module-level setting below reads the environment
+load_dotenv()
+
 # Client and server settings
 PORT_APP = 1116
 SERVER_HOST = "0.0.0.0"
 
+# Connection pool settings
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+
+# Background download settings (generated videos)
+DOWNLOAD_CHUNK_BYTES = int(os.getenv("DOWNLOAD_CHUNK_BYTES", str(1024 * 1024)))
+DOWNLOAD_MAX_RETRIES = int(os.getenv("DOWNLOAD_MAX_RETRIES", "5"))
+DOWNLOAD_TIMEOUT_SECONDS = float(os.getenv("DOWNLOAD_TIMEOUT_SECONDS", "30"))
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+VIDEO_DOWNLOAD_WAIT_SECONDS = float(os.getenv("VIDEO_DOWNLOAD_WAIT_SECONDS", "120"))
+
+# Composed lesson video render profiles
+RENDER_PROFILES = {
+    # Interactive: low resolution and fps, fastest x264 preset
+    "preview": {"height": 360, "fps": 12, "preset": "ultrafast", "crf": 30, "audio_bitrate": "64k"},
+    # Background: full resolution and quality
+    "final": {"height": None, "fps": 24, "preset": "medium", "crf": 20, "audio_bitrate": "128k"},
+}
+RENDER_THREADS = int(os.getenv("RENDER_THREADS", str(os.cpu_count() or 2)))
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+
+# Resilience settings
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "600"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+RETRY_MIN_WAIT_SECONDS = float(os.getenv("RETRY_MIN_WAIT_SECONDS", "0.5"))
+RETRY_MAX_WAIT_SECONDS = float(os.getenv("RETRY_MAX_WAIT_SECONDS", "4"))
+# Send a duplicate request when a call is slower than this; 0 disables hedging
+LABEL_HEDGE_AFTER_SECONDS = float(os.getenv("LABEL_HEDGE_AFTER_SECONDS", "0"))
+IMAGE_HEDGE_AFTER_SECONDS = float(os.getenv("IMAGE_HEDGE_AFTER_SECONDS", "0"))
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "8"))
+
+# Workflow settings
+WORKFLOW_MAX_WORKERS = int(os.getenv("WORKFLOW_MAX_WORKERS", "4"))
+IMAGE_GENERATION_WORKERS = int(os.getenv("IMAGE_GENERATION_WORKERS", "5"))
+
+# Image download and storage settings
+IMAGE_DOWNLOAD_MAX_BYTES = int(os.getenv("IMAGE_DOWNLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+IMAGE_DOWNLOAD_TIMEOUT_SECONDS = float(os.getenv("IMAGE_DOWNLOAD_TIMEOUT_SECONDS", "30"))
+IMAGE_OUTPUT_FORMAT = os.getenv("IMAGE_OUTPUT_FORMAT", "WEBP").upper()  # WEBP, AVIF, JPEG or PNG
+IMAGE_OUTPUT_QUALITY = int(os.getenv("IMAGE_OUTPUT_QUALITY", "80"))
+IMAGE_ENCODE_WORKERS = int(os.getenv("IMAGE_ENCODE_WORKERS", "4"))
+# Smaller renditions saved next to each full-size image (longest side in pixels)
+IMAGE_RENDITIONS = {
+    "thumb": int(os.getenv("IMAGE_THUMB_SIZE", "256")),
+    "medium": int(os.getenv("IMAGE_MEDIUM_SIZE", "768")),
+}
+
+# Lesson text cache settings
+LESSON_CACHE_ENABLED = os.getenv("LESSON_CACHE_ENABLED", "true").lower() == "true"
+LESSON_CACHE_PATH = os.getenv(
+    "LESSON_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "outputs", ".cache", "lessons.db")
+)
+LESSON_CACHE_MAX_ENTRIES = int(os.getenv("LESSON_CACHE_MAX_ENTRIES", "5000"))
+LESSON_CACHE_TTL_SECONDS = int(os.getenv("LESSON_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+# Provider rate limits shared by every process on the host; 0 disables a limit.
+# "provider:endpoint" entries add a tighter limit for one model endpoint on top of the provider's
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_PATH = os.getenv(
+    "RATE_LIMIT_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "outputs", ".cache", "ratelimits.db")
+)
+# In-flight slots held longer than this are assumed to belong to a dead process
+RATE_LIMIT_LEASE_SECONDS = int(os.getenv("RATE_LIMIT_LEASE_SECONDS", "900"))
+RATE_LIMITS = {
+    "mistral": {
+        "rps": float(os.getenv("MISTRAL_RPS", "5")),
+        "max_in_flight": int(os.getenv("MISTRAL_MAX_IN_FLIGHT", "8")),
+    },
+    "elevenlabs": {
+        "rps": float(os.getenv("ELEVENLABS_RPS", "5")),
+        "max_in_flight": int(os.getenv("ELEVENLABS_MAX_IN_FLIGHT", "4")),
+    },
+    "fal": {
+        "rps": float(os.getenv("FAL_RPS", "10")),
+        "max_in_flight": int(os.getenv("FAL_MAX_IN_FLIGHT", "10")),
+    },
+    "fal:fal-ai/kling-video/v1.6/standard/text-to-video": {
+        "rps": 0,
+        "max_in_flight": int(os.getenv("FAL_VIDEO_MAX_IN_FLIGHT", "2")),
+    },
+}
+
+# Ask for the lesson, hashtags, learning points, quiz and image prompts as one JSON response
+LESSON_STRUCTURED_OUTPUT = os.getenv("LESSON_STRUCTURED_OUTPUT", "true").lower() == "true"
+
+# Content labels: "mistral" asks the model for hashtags, "local" ranks keywords with TF-IDF (no API call)
+LABEL_PROVIDER = os.getenv("LABEL_PROVIDER", "mistral").lower()
+KEYWORD_INDEX_PATH = os.getenv(
+    "KEYWORD_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "outputs", ".index", "keywords.json")
+)
+
+# Scheduler lanes: text and audio share the fast lane, images and video get their own
+SCHEDULER_LANES = {
+    "fast": {
+        "workers": int(os.getenv("SCHEDULER_FAST_WORKERS", "8")),
+        "max_queue": int(os.getenv("SCHEDULER_FAST_MAX_QUEUE", "64")),
+    },
+    "image": {
+        "workers": int(os.getenv("SCHEDULER_IMAGE_WORKERS", "4")),
+        "max_queue": int(os.getenv("SCHEDULER_IMAGE_MAX_QUEUE", "32")),
+    },
+    "video": {
+        "workers": int(os.getenv("SCHEDULER_VIDEO_WORKERS", "2")),
+        "max_queue": int(os.getenv("SCHEDULER_VIDEO_MAX_QUEUE", "8")),
+    },
+}
+# Concurrent Gradio event handlers; provider work is bounded by the lanes above
+GRADIO_CONCURRENCY_LIMIT = int(os.getenv("GRADIO_CONCURRENCY_LIMIT", "32"))
+GRADIO_MAX_QUEUE = int(os.getenv("GRADIO_MAX_QUEUE", "128"))
+
+# Output catalogue (SQLite index of everything under outputs/)
+CATALOGUE_PATH = os.getenv(
+    "CATALOGUE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "outputs", ".index", "catalogue.db")
+)
+
+# Batch generation (python -m app.utils.batch)
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+
+# Offline lesson bundles
+BUNDLE_DIR = os.getenv(
+    "BUNDLE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "outputs", ".bundles")
+)
+
+# Semantic lesson reuse settings
+SEMANTIC_REUSE_ENABLED = os.getenv("SEMANTIC_REUSE_ENABLED", "true").lower() == "true"
+SEMANTIC_REUSE_THRESHOLD = float(os.getenv("SEMANTIC_REUSE_THRESHOLD", "0.85"))
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+# Audio settings
+VOICE_CATALOGUE_TTL_SECONDS = int(os.getenv("VOICE_CATALOGUE_TTL_SECONDS", "3600"))
+
+# Telemetry: Prometheus metrics endpoint served next to the Gradio app, and per-request spans
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+# Loopback only by default; set to 0.0.0.0 to let a remote Prometheus scrape it
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+TRACE_MAX_REQUESTS = int(os.getenv("TRACE_MAX_REQUESTS", "200"))
+# Set a PostHog project key to also send one event per finished request (needs the posthog package)
+POSTHOG_API_KEY = os.getenv("POSTHOG_KEY")
+POSTHOG_HOST = os.getenv("POSTHOG_URL", "https://us.i.posthog.com")
+
+# Startup settings
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "5.0"))
+
 # UI settings
 ICON_IMAGE_PATH = "./images/edubyte.gif"
 
@@ -45,6 +197,9 @@ class Config:
             raise ValueError(f"Missing required API keys: {', '.join(missing_keys)}")
     
     def _setup_logging(self) -> None:
+        # Entry points such as main.setup_logging configure logging first; only fall back when none has
+        if logging.getLogger().handlers:
+            return
         logging.basicConfig(
             level=logging.INFO,
             format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
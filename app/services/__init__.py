@@ -1,5 +1,19 @@
-from .mistral import MistralService
-from .elevenlabs import ElevenLabsService
-from .fal_ai import FalService
+# Services are imported on first attribute access so that importing the
+# package (e.g. for the registry) does not pull in every provider SDK.
+import importlib
 
-__all__ = ['MistralService', 'ElevenLabsService', 'FalService']
+_LAZY_ATTRIBUTES = {
+    'MistralService': '.mistral',
+    'ElevenLabsService': '.elevenlabs',
+    'FalService': '.fal_ai',
+    'ServiceRegistry': '.registry',
+}
+
+__all__ = ['MistralService', 'ElevenLabsService', 'FalService', 'ServiceRegistry']
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
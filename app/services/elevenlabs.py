@@ -1,39 +1,151 @@
 # services/elevenlabs.py
 import os
+import time
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional
+from elevenlabs import VoiceSettings
 from elevenlabs.client import ElevenLabs
+from app.config import VOICE_CATALOGUE_TTL_SECONDS
+from app.utils.resilience import resilient
+
+logger = logging.getLogger(__name__)
+
+class VoiceRegistry:
+    """Process-wide cache of the ElevenLabs voice catalogue.
+
+    The catalogue is fetched once, then refreshed on a background thread when
+    it is older than the TTL, so callers never wait on `voices.get_all()`
+    after the first lookup.
+    """
+    # Voice `age` labels that suit each profile name from AudioAgent
+    PROFILE_AGE_LABELS = {
+        'child': ('young',),
+        'teen': ('young', 'middle aged', 'middle-aged'),
+        'adult': ('middle aged', 'middle-aged', 'old'),
+    }
+
+    _shared: Optional['VoiceRegistry'] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, client: ElevenLabs, ttl_seconds: int = VOICE_CATALOGUE_TTL_SECONDS):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self._voices: List = []
+        self._by_name: Dict[str, str] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    @classmethod
+    def shared(cls, client: ElevenLabs) -> 'VoiceRegistry':
+        """Return the registry shared by every ElevenLabsService in this process."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(client)
+            return cls._shared
+
+    def refresh(self) -> None:
+        """Fetch the voice catalogue and swap it in."""
+        voices = self.client.voices.get_all().voices
+        with self._lock:
+            self._voices = list(voices)
+            self._by_name = {v.name.lower(): v.voice_id for v in self._voices if v.name}
+            self._loaded_at = time.monotonic()
+        logger.info(f"Loaded {len(self._voices)} ElevenLabs voices")
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Background voice catalogue refresh failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def voices(self) -> List:
+        """Return the cached catalogue, loading it on first use."""
+        if not self._voices:
+            self.refresh()
+        elif time.monotonic() - self._loaded_at > self.ttl_seconds:
+            with self._lock:
+                start_refresh = not self._refreshing
+                self._refreshing = True
+            if start_refresh:
+                threading.Thread(target=self._refresh_in_background, daemon=True).start()
+        return self._voices
+
+    def resolve(self, name: str) -> str:
+        """
+        Resolve a voice or profile name to a voice_id.
+
+        Args:
+            name (str): An ElevenLabs voice name, or a profile name such as 'Child'
+
+        Returns:
+            str: voice_id of the exact match, else of an age-appropriate voice, else of the first voice
+        """
+        voices = self.voices()
+        if not voices:
+            raise ValueError("No ElevenLabs voices available")
+
+        key = (name or '').lower()
+        if key in self._by_name:
+            return self._by_name[key]
+
+        for age_label in self.PROFILE_AGE_LABELS.get(key, ()):
+            for v in voices:
+                labels = getattr(v, 'labels', None) or {}
+                if str(labels.get('age', '')).lower() == age_label:
+                    return v.voice_id
+
+        logger.warning(f"Voice '{name}' not found, using '{voices[0].name}'")
+        return voices[0].voice_id
+
 
 class ElevenLabsService:
+    MODEL_ID = "eleven_multilingual_v2"
+
     def __init__(self):
         self.api_key = os.getenv('ELEVENLABS_API_KEY')
         if not self.api_key:
             raise ValueError("ELEVENLABS_API_KEY not found in environment variables")
         self.client = ElevenLabs(api_key=self.api_key)
+        self.voices = VoiceRegistry.shared(self.client)
     
     def text_to_speech(self, text: str, voice: str = "Josh", stability: float = 0.5, similarity_boost: float = 0.5) -> bytes:
-        try:
-            # Get available voices
-            voices_response = self.client.voices.get_all()
-            voices = voices_response.voices  # Access the 'voices' attribute
+        # Consume the stream and return bytes
+        return b''.join(self.stream_text_to_speech(text, voice, stability, similarity_boost))
 
-            # Use the first available one
-            selected_voice = voices[0]        
-            
-            if not selected_voice:
-                raise ValueError(f"Voice '{voice}' not founde")
-            
-            # Generate audio using the selected voice 
+    @resilient("elevenlabs", endpoint=MODEL_ID)
+    def stream_text_to_speech(self, text: str, voice: str = "Josh", stability: float = 0.5, similarity_boost: float = 0.5) -> Iterator[bytes]:
+        """
+        Synthesize speech and yield MP3 chunks as they arrive.
+
+        Args:
+            text (str): Text to speak
+            voice (str): Voice or profile name resolved through the VoiceRegistry
+            stability (float): ElevenLabs stability setting
+            similarity_boost (float): ElevenLabs similarity boost setting
+
+        Returns:
+            Iterator[bytes]: MP3 audio chunks in playback order
+        """
+        try:
+            # Resolve the voice from the cached catalogue
+            voice_id = self.voices.resolve(voice)
 
-           # Generate audio using the selected voice
-            audio_generator = self.client.text_to_speech.convert(
+            # The streaming endpoint starts returning audio before synthesis completes
+            audio_stream = self.client.text_to_speech.convert_as_stream(
                 text=text,
-                voice_id=selected_voice.voice_id,
-                model_id="eleven_multilingual_v2",
+                voice_id=voice_id,
+                model_id=self.MODEL_ID,
                 output_format="mp3_44100_128",
+                voice_settings=VoiceSettings(stability=stability, similarity_boost=similarity_boost),
             )
-            
-            # Consume the generator and return bytes
-            return b''.join(chunk for chunk in audio_generator)
-            
+            for chunk in audio_stream:
+                if chunk:
+                    yield chunk
             
         except Exception as e:
-            raise Exception(f"Text-to-speech generation failed: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Text-to-speech generation failed: {str(e)}")
@@ -3,19 +3,24 @@ import os
 import logging
 import fal_client
 from typing import Optional, Dict, Any, List
+from app.config import IMAGE_HEDGE_AFTER_SECONDS
+from app.utils.resilience import resilient
 
 logger = logging.getLogger(__name__)
 
 class FalService:
     # Constants
     MAX_PROMPT_LENGTH = 2500
+    VIDEO_ENDPOINT = "fal-ai/kling-video/v1.6/standard/text-to-video"
+    IMAGE_ENDPOINT = "fal-ai/flux/dev"
 
     def __init__(self):
         """Initialize the FAL service with API key from environment variables."""
         self.api_key = os.getenv('FAL_KEY')
         if not self.api_key:
             raise ValueError("FAL_KEY not found in environment variables")
-        fal_client.api_key = self.api_key
+        # One client per service keeps a pooled keep-alive HTTP connection
+        self.client = fal_client.SyncClient(key=self.api_key)
 
     def _log_progress(self, update: Any) -> None:
         """Handle progress updates from fal-ai."""
@@ -30,6 +35,7 @@ class FalService:
             return prompt[:self.MAX_PROMPT_LENGTH]
         return prompt
 
+    @resilient("fal", endpoint=VIDEO_ENDPOINT)
     def generate_video(self, prompt: str, duration: int = 5) -> str:
         """
         Generate a video based on the provided prompt.
@@ -45,8 +51,8 @@ class FalService:
             # Validate and truncate prompt
             prompt = self._validate_and_truncate_prompt(prompt)
             
-            result = fal_client.subscribe(
-                "fal-ai/kling-video/v1.6/standard/text-to-video",
+            result = self.client.subscribe(
+                self.VIDEO_ENDPOINT,
                 arguments={
                     "prompt": prompt,
                     "num_frames": duration * 30,  # 30fps
@@ -68,6 +74,7 @@ class FalService:
             logger.error(f"Video generation failed: {str(e)}")
             raise
 
+    @resilient("fal", endpoint=IMAGE_ENDPOINT, hedge_after=IMAGE_HEDGE_AFTER_SECONDS)
     def generate_images(
         self,
         prompt: str,
@@ -86,8 +93,8 @@ class FalService:
             List[str]: List of URLs for the generated images
         """
         try:
-            result = fal_client.subscribe(
-                "fal-ai/flux/dev",
+            result = self.client.subscribe(
+                self.IMAGE_ENDPOINT,
                 arguments={
                     "prompt": prompt,
                     "seed": seed,
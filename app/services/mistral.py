@@ -1,20 +1,61 @@
 import os
+import threading
+from typing import Iterator, List, Union
+from langchain_core.runnables import RunnableLambda
 from langchain_mistralai.chat_models import ChatMistralAI
+from app.utils import resilience
+from app.utils.resilience import resilient
 
 class MistralService:
+    MODEL = "mistral-large-latest"   #Use latest model for educational content generation 
+    TEMPERATURE = 0.7
+    MAX_TOKENS = 2000
+
     def __init__(self):
         self.api_key = os.getenv('MISTRAL_API_KEY')
         if not self.api_key:
             raise ValueError("MISTRAL_API_KEY not found in environment variables")
+        self._model = None
+        self._model_lock = threading.Lock()
     
     def get_model(self):
-        return ChatMistralAI(
-            mistral_api_key=self.api_key,
-            model="mistral-large-latest",   #Use latest model for educational content generation 
-            temperature=0.7,
-            max_tokens=2000
-        )
+        # Build the chat client once so its HTTP connection pool is reused
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = ChatMistralAI(
+                        mistral_api_key=self.api_key,
+                        model=self.MODEL,
+                        temperature=self.TEMPERATURE,
+                        max_tokens=self.MAX_TOKENS
+                    )
+        return self._model
 
+    @resilient("mistral", endpoint=MODEL)
     def generate_content(self, prompt: str) -> str:
         model = self.get_model()
         return model.predict(prompt)
+
+    @resilient("mistral", endpoint=MODEL)
+    def stream(self, prompt: str, json_mode: bool = False) -> Iterator[str]:
+        """Yield response tokens as they arrive; json_mode asks for a single JSON object."""
+        model = self.get_model()
+        if json_mode:
+            model = model.bind(response_format={"type": "json_object"})
+        for chunk in model.stream(prompt):
+            if chunk.content:
+                yield chunk.content
+
+    def batch(self, prompts: List[str], json_mode: bool = False) -> List[Union[str, Exception]]:
+        """Fan the prompts out as concurrent, independent requests; each one passes the breaker and rate limits.
+
+        A failed request is returned as its exception, in its prompt's position, so one
+        failure does not discard the other responses.
+        """
+        model = self.get_model()
+        if json_mode:
+            model = model.bind(response_format={"type": "json_object"})
+        invoke = RunnableLambda(
+            lambda prompt: resilience.call("mistral", model.invoke, prompt, endpoint=self.MODEL).content
+        )
+        return invoke.batch(prompts, config={"max_concurrency": len(prompts)}, return_exceptions=True)
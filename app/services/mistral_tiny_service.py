@@ -5,10 +5,14 @@ from langchain.prompts import ChatPromptTemplate
 from langchain.output_parsers import CommaSeparatedListOutputParser
 from langchain.schema import HumanMessage, SystemMessage
 from typing import List
+from app.config import LABEL_HEDGE_AFTER_SECONDS
+from app.utils import resilience
 
 logger = logging.getLogger(__name__)
 
 class MistralService:
+    MODEL = "mistral-large-latest"
+
     def __init__(self):
         self.api_key = os.getenv('MISTRAL_API_KEY')
         if not self.api_key:
@@ -18,7 +22,7 @@ class MistralService:
     def _get_model(self):
         return ChatMistralAI(
             mistral_api_key=self.api_key,
-            model="mistral-large-latest",
+            model=self.MODEL,
             temperature=0.3,
             max_tokens=2000
         )
@@ -42,7 +46,11 @@ class MistralService:
             output_parser = CommaSeparatedListOutputParser()
             chain = prompt | self.model | output_parser
             
-            hashtags = chain.invoke({"content": content})
+            # Labels are short and latency-sensitive, so a slow call may be hedged
+            hashtags = resilience.call(
+                "mistral", chain.invoke, {"content": content},
+                endpoint=self.MODEL, hedge_after=LABEL_HEDGE_AFTER_SECONDS
+            )
             return [tag.strip() for tag in hashtags if tag.strip().startswith('#')][:10]
 
         except Exception as e:
@@ -59,7 +67,7 @@ class MistralService:
             output_parser = CommaSeparatedListOutputParser()
             chain = prompt | self.model | output_parser
             
-            hashtags = chain.invoke({"content": content})
+            hashtags = resilience.call("mistral", chain.invoke, {"content": content}, endpoint=self.MODEL)
             return [f"#{tag.strip().replace('#', '')}" for tag in hashtags if tag.strip()][:10]
 
         except Exception as e:
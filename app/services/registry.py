@@ -0,0 +1,123 @@
+# services/registry.py
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict
+
+from app.config import HTTP_POOL_SIZE
+
+if TYPE_CHECKING:
+    import requests
+
+logger = logging.getLogger(__name__)
+
+class ServiceRegistry:
+    """Process-wide holder for long-lived provider clients and agents.
+
+    Instances are created on first use and then shared by every request and
+    worker thread, so connection pools, TLS sessions and model clients are
+    reused instead of rebuilt per request.
+    """
+    _instances: Dict[str, Any] = {}
+    _factories: Dict[str, Callable[[], Any]] = {}
+    _build_locks: Dict[str, threading.Lock] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, name: str, factory: Callable[[], Any]) -> Any:
+        """Return the shared instance for `name`, building it on first use.
+
+        A factory set with `register` takes precedence over `factory`.
+
+        Each name is built under its own lock, so a factory may look up other
+        shared instances (agents fetch their provider services) and a slow
+        factory only delays callers waiting for that same name.
+        """
+        instance = cls._instances.get(name)
+        if instance is None:
+            with cls._lock:
+                build_lock = cls._build_locks.setdefault(name, threading.Lock())
+            with build_lock:
+                instance = cls._instances.get(name)
+                if instance is None:
+                    logger.info(f"Creating shared instance for '{name}'")
+                    instance = cls._factories.get(name, factory)()
+                    with cls._lock:
+                        cls._instances[name] = instance
+        return instance
+
+    @classmethod
+    def override(cls, name: str, instance: Any) -> None:
+        """Replace a shared instance, e.g. with a stand-in provider."""
+        with cls._lock:
+            cls._instances[name] = instance
+
+    @classmethod
+    def register(cls, name: str, factory: Callable[[], Any]) -> None:
+        """Build `name` with `factory` on first use, e.g. a stand-in provider created lazily."""
+        with cls._lock:
+            cls._factories[name] = factory
+
+    @classmethod
+    def reset(cls) -> None:
+        """Drop every shared instance and registered factory so the next lookup rebuilds it."""
+        with cls._lock:
+            session = cls._instances.get('http_session')
+            if session is not None:
+                session.close()
+            cls._instances.clear()
+            cls._factories.clear()
+
+
+def _create_http_session() -> 'requests.Session':
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_http_session() -> 'requests.Session':
+    """Keep-alive HTTP session with a connection pool sized for the worker threads."""
+    return ServiceRegistry.get('http_session', _create_http_session)
+
+
+def get_mistral_service():
+    from app.services.mistral import MistralService
+    return ServiceRegistry.get('mistral', MistralService)
+
+
+def get_label_service():
+    from app.services.mistral_tiny_service import MistralService
+    return ServiceRegistry.get('mistral_labels', MistralService)
+
+
+def get_elevenlabs_service():
+    from app.services.elevenlabs import ElevenLabsService
+    return ServiceRegistry.get('elevenlabs', ElevenLabsService)
+
+
+def get_fal_service():
+    from app.services.fal_ai import FalService
+    return ServiceRegistry.get('fal', FalService)
+
+
+def get_content_agent():
+    from app.agents.content_agent import ContentAgent
+    return ServiceRegistry.get('content_agent', ContentAgent)
+
+
+def get_image_agent():
+    from app.agents.image_agent import ImageAgent
+    return ServiceRegistry.get('image_agent', ImageAgent)
+
+
+def get_audio_agent():
+    from app.agents.audio_agent import AudioAgent
+    return ServiceRegistry.get('audio_agent', AudioAgent)
+
+
+def get_video_agent():
+    from app.agents.video_agent import VideoAgent
+    return ServiceRegistry.get('video_agent', VideoAgent)
@@ -1,14 +1,14 @@
 import gradio as gr
+import queue
 import logging
-from typing import List, Any
+import threading
+from typing import Any, Iterator, List
 from app.utils.validators import ContentValidator
-from app.agents.content_agent import ContentAgent
-from app.agents.image_agent import ImageAgent
-from app.agents.video_agent import VideoAgent
-from app.agents.audio_agent import AudioAgent
-from app.utils.error_handling import ErrorHandler
 from app.utils.output_manager import OutputManager
-from app.utils.label_generator import generate_content_labels  # Add this import
+from app.utils.lesson_pipeline import LessonPipeline, find_reusable_lesson
+from app.utils.workflow import SUCCESS
+from app.utils.scheduler import get_scheduler
+from app.config import VIDEO_DOWNLOAD_WAIT_SECONDS
 
 # Define custom CSS before the interface creation
 custom_css = """
@@ -69,127 +69,197 @@ custom_css = """
 """
 
 logger = logging.getLogger(__name__)
-error_handler = ErrorHandler()
 
-def start_generation_workflow(age: int, prompt: str, video_needed: bool = False, images_needed: bool = False) -> List[Any]:
+# Gallery image rendition for each bandwidth preference
+BANDWIDTH_RENDITIONS = {
+    "Low (thumbnails)": "thumb",
+    "Standard": "medium",
+    "High (full size)": "full",
+}
+DEFAULT_BANDWIDTH = "Standard"
+
+# Status box each workflow stage reports to
+STAGE_PROGRESS_KEYS = {
+    "content": "content",
+    "labels": "content",
+    "images": "images",
+    "audio": "audio",
+    "video": "video",
+}
+
+STAGE_RUNNING_MESSAGES = {
+    "content": "Writing lesson...",
+    "labels": "Generating content labels...",
+    "images": "Generating images...",
+    "audio": "Generating audio...",
+    "video": "Generating video (this can take a few minutes)...",
+}
+
+def select_media_renditions(media_files: List[str], bandwidth: str) -> List[str]:
+    """Swap each image for the rendition that suits the session's bandwidth preference."""
+    rendition = BANDWIDTH_RENDITIONS.get(bandwidth, "medium")
+    return [OutputManager.rendition_path(path, rendition) for path in media_files]
+
+def show_full_size(full_media: List[str], evt: gr.SelectData):
+    """Load the full-size version of the selected gallery item on demand."""
+    index = evt.index[0] if isinstance(evt.index, (list, tuple)) else evt.index
+    if index is None or index >= len(full_media) or full_media[index].endswith('.mp4'):
+        return gr.update(value=None, visible=False)
+    return gr.update(value=full_media[index], visible=True)
+
+def start_generation_workflow(
+    age: int,
+    prompt: str,
+    video_needed: bool = False,
+    images_needed: bool = False,
+    bandwidth: str = DEFAULT_BANDWIDTH
+) -> Iterator[List[Any]]:
     try:
         # Convert age to integer
         age = int(age)
         
-        # Generate request ID and create output directories
-        request_id = OutputManager.generate_request_id()
-        output_paths = OutputManager.create_request_directory(request_id)
-        logger.info(f"Starting generation workflow with request ID: {request_id}, video generation: {video_needed}")
-        
         # Validate input
         validation = ContentValidator.validate_prompt(prompt)
         if not validation["valid"]:
             raise ValueError(", ".join(validation["errors"]))
+
+        # Serve a near-duplicate earlier lesson without calling any provider
+        lesson = find_reusable_lesson(age, prompt, video_needed, images_needed)
+        if lesson:
+            media_files = (lesson["images"] if images_needed else []) + ([lesson["video"]] if video_needed else [])
+            reused = f"Reused lesson {lesson['request_id']}"
+            yield [
+                gr.update(value=reused),
+                gr.update(value=reused),
+                gr.update(value=reused if images_needed else "Image generation skipped"),
+                gr.update(value=reused if video_needed else "Video generation skipped"),
+                gr.update(value=lesson["content"]),
+                gr.update(value=lesson["audio"]),
+                gr.update(value=select_media_renditions(media_files, bandwidth)),
+                gr.update(value=lesson["answers"]),
+                media_files,
+            ]
+            return
+        
+        # Stages report tokens, audio chunks and status changes to the handler through this queue
+        events = queue.Queue()
+        pipeline = LessonPipeline(
+            age, prompt, video_needed, images_needed, emit=lambda kind, payload: events.put((kind, payload))
+        )
+        request_id = pipeline.request_id
+        output_paths = pipeline.output_paths
+        logger.info(f"Scheduler queue depths: {get_scheduler().queue_depths()}")
         
         # Initialize progress
         progress = {
             "content": "Starting content generation...",
-            "images": "Waiting...",
-            "video": "Waiting...",
+            "images": "Waiting..." if images_needed else "Image generation skipped",
+            "video": "Waiting..." if video_needed else "Video generation skipped",
             "audio": "Waiting..."
         }
-        
-        # Generate content using error handler
-        content_agent = ContentAgent()
-        content = error_handler.api_call_with_retry(
-            content_agent.generate_content,
-            age, 
-            prompt
-        )
-        
-        # Generate content labels before saving content
-        content_labels = generate_content_labels(content)
-        logger.info(f"Generated content labels: {content_labels}")
-        
-        # Append content labels to the content before saving
-        formatted_labels = "\n\nLabels: " + ", ".join(content_labels)
-        content_with_labels = content + formatted_labels
-        
-        content_path = OutputManager.save_text_output(request_id, content_with_labels)
-        progress["content"] = "Content generated successfully"
-        
-        # Conditionally generate images using content labels
-        images = []
-        image_paths = []
-        if images_needed:
-            progress["images"] = "Generating images..."
-            image_agent = ImageAgent()
-            images = error_handler.api_call_with_retry(
-                image_agent.generate_images,
-                content, 
-                age,
-                content_labels  # Pass the labels to image agent
-            )
-            image_paths = OutputManager.save_images_output(request_id, images)
-            progress["images"] = f"Images generated successfully and saved to {output_paths['images']}"
-        else:
-            progress["images"] = "Image generation skipped"
 
-        # Generate audio and save it
-        audio_agent = AudioAgent()
-        audio = error_handler.api_call_with_retry(
-            audio_agent.generate_audio,
-            content, 
-            age
-        )
-        
-        if audio is None:
-            progress["audio"] = "Audio generation failed"
-            audio_path = ""
-        else:
-            audio_path = OutputManager.save_audio_output(request_id, audio)
-            if audio_path:
-                progress["audio"] = f"Audio generated successfully and saved to {output_paths['audio']}"
-            else:
-                progress["audio"] = "Failed to save audio output"
+        # Run the graph in the background and relay its events to the UI as they happen
+        def run_graph():
+            try:
+                events.put(("done", pipeline.run(
+                    on_complete=lambda name, result: events.put(("stage_done", (name, result))),
+                    on_start=lambda name: events.put(("stage_start", name))
+                )))
+            except Exception as e:
+                events.put(("error", e))
 
-        # Store all media in a single list
+        threading.Thread(target=run_graph, daemon=True).start()
+
+        content_parts = []
         media_files = []
+        audio_streamed = False
+
+        def snapshot(content_update=None, audio_update=None, media_update=None, answers_update=None) -> List[Any]:
+            return [
+                gr.update(value=progress["content"]),
+                gr.update(value=progress["audio"]),
+                gr.update(value=progress["images"]),
+                gr.update(value=progress["video"]),
+                content_update or gr.update(),
+                audio_update or gr.update(),
+                media_update or gr.update(),
+                answers_update or gr.update(),
+                list(media_files),  # Full-size paths for on-demand viewing
+            ]
+
+        while True:
+            kind, payload = events.get()
+            if kind == "token":
+                content_parts.append(payload)
+                yield snapshot(content_update=gr.update(value="".join(content_parts)))
+            elif kind == "content_reset":
+                content_parts = []
+            elif kind == "audio":
+                audio_streamed = True
+                progress["audio"] = "Streaming audio..."
+                yield snapshot(audio_update=gr.update(value=payload))
+            elif kind == "stage_start":
+                progress[STAGE_PROGRESS_KEYS[payload]] = STAGE_RUNNING_MESSAGES[payload]
+                yield snapshot()
+            elif kind == "stage_done":
+                name, result = payload
+                key = STAGE_PROGRESS_KEYS[name]
+                if result["status"] == SUCCESS:
+                    progress[key] = f"{name.capitalize()} completed in {result['elapsed']:.1f}s"
+                    if name == "images":
+                        # Show images while audio and video are still running
+                        media_files.extend(result["result"])
+                        yield snapshot(media_update=gr.update(value=select_media_renditions(media_files, bandwidth)))
+                        continue
+                elif name == "labels":
+                    progress[key] = "Content generated; labels unavailable"
+                else:
+                    progress[key] = f"{name.capitalize()} generation failed: {result['error']}"
+                yield snapshot()
+            elif kind == "error":
+                raise payload
+            else:
+                results = payload
+                break
+
+        if results["content"]["status"] != SUCCESS:
+            raise RuntimeError(f"Content generation failed: {results['content']['error']}")
+        content = results["content"]["result"]["text"]
+        progress["content"] = "Content generated successfully"
+
+        if images_needed and results["images"]["status"] == SUCCESS:
+            progress["images"] = "Images generated successfully"
+
+        if results["audio"]["status"] == SUCCESS:
+            progress["audio"] = f"Audio generated successfully and saved to {output_paths['audio']}"
+
+        if video_needed and results["video"]["status"] == SUCCESS and results["video"]["result"]:
+            media_files.append(results["video"]["result"])
+            progress["video"] = "Video generated successfully"
         
-        # Add images if generated
-        if images and image_paths:
-            media_files.extend(image_paths)
-            progress["images"] = f"Images generated successfully"
-        
-        # Add video if generated
-        if video_needed:
-            video_agent = VideoAgent()
-            video = error_handler.api_call_with_retry(
-                video_agent.generate_video,
-                content, 
-                age,
-                request_id
-            )
-            video_path = OutputManager.save_video_output(request_id, video)
-            if video_path:
-                media_files.append(video_path)
-                progress["video"] = "Video generated successfully"
-        else:
-            progress["video"] = "Video generation skipped"
-            
-        logger.info(f"Completed generation workflow for request ID: {request_id}")
-        
-        return [
-            gr.update(value=progress["content"]),
-            gr.update(value=progress["audio"]),
-            gr.update(value=progress["images"]),
-            gr.update(value=progress["video"]),
-            gr.update(value=content),
-            gr.update(value=audio_path if audio_path else None),  # Only return path if valid
-            gr.update(value=media_files),  # Combined media files
-        ]
+        yield snapshot(
+            content_update=gr.update(value=content),
+            audio_update=gr.update() if audio_streamed else gr.update(value=None),  # Streamed audio is already playing
+            media_update=gr.update(value=select_media_renditions(media_files, bandwidth)),  # Combined media files
+            answers_update=gr.update(value=results["content"]["result"]["answers"]),
+        )
+
+        # Switch the gallery to the local copy of the video once its download completes
+        for download in pipeline.video_downloads:
+            try:
+                local_path = download.result(timeout=VIDEO_DOWNLOAD_WAIT_SECONDS)
+                media_files[-1] = local_path
+                progress["video"] = "Video generated and saved locally"
+                yield snapshot(media_update=gr.update(value=select_media_renditions(media_files, bandwidth)))
+            except Exception as e:
+                logger.warning(f"Keeping remote video URL for {request_id}: {str(e)}")
         
     except ValueError as ve:
         logger.warning(f"Validation error: {str(ve)}")
-        return [gr.update(value=f"Error: {str(ve)}")] * 7  # Updated count
+        yield [gr.update(value=f"Error: {str(ve)}")] * 8 + [[]]  # Updated count
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
-        return [gr.update(value="An unexpected error occurred")] * 7  # Updated count
+        yield [gr.update(value="An unexpected error occurred")] * 8 + [[]]  # Updated count
 
 def create_interface():
     with gr.Blocks(
@@ -237,6 +307,12 @@ def create_interface():
                 value=True,
                 info="Generate educational illustrations"
             )
+            bandwidth_radio = gr.Radio(
+                label="Bandwidth",
+                choices=list(BANDWIDTH_RENDITIONS),
+                value=DEFAULT_BANDWIDTH,
+                info="Low shows thumbnails; click one to load it in full"
+            )
         
         submit_btn = gr.Button("Generate Content", variant="primary",min_width="250px")
         
@@ -249,7 +325,7 @@ def create_interface():
 
         with gr.Accordion("Generated Content", open=True):
             content_output = gr.Textbox(label="Generated Learning Text", interactive=False,lines=6)
-            audio_output = gr.Audio(label="Audio Bytes", interactive=False)
+            audio_output = gr.Audio(label="Audio Bytes", interactive=False, streaming=True, autoplay=True)
             # Combined gallery for images and video
             media_output = gr.Gallery(
                 label="Multi-modal Media",
@@ -262,14 +338,21 @@ def create_interface():
                 show_share_button=False,
                 show_download_button=True,
             )
+            full_image_output = gr.Image(label="Full-size image", interactive=False, visible=False)
+            full_media_state = gr.State([])
+
+        # Kept out of the narrated lesson text so listeners aren't told the answers
+        with gr.Accordion("Quiz Answers", open=False):
+            answers_output = gr.Textbox(label="Answer Key", interactive=False, lines=4)
 
         submit_btn.click(
             fn=start_generation_workflow,
-            inputs=[age_dropdown, prompt_input, video_checkbox, images_checkbox],
+            inputs=[age_dropdown, prompt_input, video_checkbox, images_checkbox, bandwidth_radio],
             outputs=[
                 text_status, audio_status, image_status, video_status,
-                content_output, audio_output, media_output
+                content_output, audio_output, media_output, answers_output, full_media_state
             ]
         )
+        media_output.select(fn=show_full_size, inputs=[full_media_state], outputs=[full_image_output])
     
     return demo
\ No newline at end of file
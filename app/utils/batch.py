@@ -0,0 +1,276 @@
+# utils/batch.py
+import os
+import csv
+import json
+import time
+import hashlib
+import logging
+import argparse
+import threading
+import concurrent.futures
+from typing import Any, Dict, Iterator, List, Set
+
+from app.config import BATCH_WORKERS
+from app.utils.cache import LessonCache
+from app.utils.validators import ContentValidator
+from app.utils.workflow import SUCCESS
+
+logger = logging.getLogger(__name__)
+
+MODALITIES = ("images", "video")
+
+
+def _parse_modalities(value: Any) -> List[str]:
+    """Accept a list or a string such as "images,video" or "images video"; text and audio are always made."""
+    if isinstance(value, str):
+        value = value.replace("|", ",").replace(" ", ",").split(",")
+    requested = {str(v).strip().lower() for v in value or [] if str(v).strip()}
+    unknown = requested - set(MODALITIES) - {"text", "audio"}
+    if unknown:
+        raise ValueError(f"Unknown modalities: {', '.join(sorted(unknown))}")
+    return [m for m in MODALITIES if m in requested]
+
+
+def _parse_ages(value: Any) -> List[int]:
+    """Accept an age, a list, "6,8,10" or a range such as "6-10"."""
+    if isinstance(value, (int, float)):
+        return [int(value)]
+    if isinstance(value, str):
+        value = value.strip()
+        if "-" in value:
+            low, high = (int(part) for part in value.split("-", 1))
+            return list(range(low, high + 1))
+        value = value.replace(" ", ",").split(",")
+    return sorted({int(v) for v in value if str(v).strip()})
+
+
+def _parse_row(line: int, record: Any) -> Dict[str, Any]:
+    if isinstance(record, str):
+        record = json.loads(record)
+    if not isinstance(record, dict):
+        raise ValueError("Row is not an object")
+    ages = record.get("ages", record.get("age"))
+    try:
+        parsed_ages = _parse_ages(ages)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid age {ages!r}")
+    return {
+        "line": line,
+        "ages": parsed_ages,
+        "prompt": str(record.get("prompt") or "").strip(),
+        "modalities": _parse_modalities(record.get("modalities")),
+    }
+
+
+def read_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield {line, ages, prompt, modalities} rows from a CSV (with a header) or JSONL file.
+
+    A malformed row (bad JSON, unknown modality, unreadable age) does not stop
+    the file: it is yielded with an `error` and recorded as failed by run_row.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith(('.jsonl', '.ndjson')):
+            records = ((i, line) for i, line in enumerate(f, 1) if line.strip())
+        else:
+            records = enumerate(csv.DictReader(f), 2)
+        for line, record in records:
+            try:
+                row = _parse_row(line, record)
+            except ValueError as e:
+                logger.warning(f"Batch row {line} is malformed: {str(e)}")
+                prompt = record.get("prompt") if isinstance(record, dict) else None
+                row = {"line": line, "ages": [], "prompt": str(prompt or "").strip(), "modalities": [], "error": str(e)}
+            yield row
+
+
+def row_key(row: Dict[str, Any]) -> str:
+    """Identify a row by ages, normalized prompt and modalities, so reordering the input does not matter."""
+    raw = "|".join([",".join(map(str, row["ages"])), LessonCache.normalize_prompt(row["prompt"]), ",".join(row["modalities"])])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class BatchRunner:
+    """Generate many lessons headlessly with a worker pool, resumably.
+
+    Every finished row is appended to a checkpoint JSONL file as soon as it
+    completes. A rerun with the same checkpoint skips rows that already
+    succeeded and retries the ones that failed. Provider pressure stays
+    bounded by the scheduler lanes and rate limits, whatever the pool size.
+    """
+
+    def __init__(self, checkpoint_path: str, workers: int = BATCH_WORKERS):
+        self.checkpoint_path = checkpoint_path
+        self.workers = workers
+        self._lock = threading.Lock()
+
+    def completed_keys(self) -> Set[str]:
+        """Keys of rows the checkpoint records as succeeded."""
+        done = set()
+        if not os.path.exists(self.checkpoint_path):
+            return done
+        with open(self.checkpoint_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by an interrupted run
+                    continue
+                if record.get("status") == "ok":
+                    done.add(record["key"])
+        return done
+
+    def _checkpoint(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            with open(self.checkpoint_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def run_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate (or reuse) one lesson, or one lesson per age, and return its checkpoint record."""
+        from app.utils.lesson_pipeline import LessonPipeline, MultiAgeLessonPipeline, find_reusable_lesson
+
+        images_needed = "images" in row["modalities"]
+        video_needed = "video" in row["modalities"]
+        record = {"key": row_key(row), "line": row["line"], "ages": row["ages"], "prompt": row["prompt"]}
+        start = time.perf_counter()
+        try:
+            if row.get("error"):
+                raise ValueError(row["error"])
+            validation = ContentValidator.validate_prompt(row["prompt"])
+            if not validation["valid"]:
+                raise ValueError(", ".join(validation["errors"]))
+            if not row["ages"]:
+                raise ValueError("No age given")
+
+            lesson = None if len(row["ages"]) > 1 else find_reusable_lesson(
+                row["ages"][0], row["prompt"], video_needed, images_needed
+            )
+            if lesson:
+                record.update(status="ok", request_id=lesson["request_id"], reused=True, stages={})
+            elif len(row["ages"]) > 1:
+                # Several ages get concurrent text requests and share the age-independent media
+                multi = MultiAgeLessonPipeline(row["ages"], row["prompt"], video_needed, images_needed)
+                grouped = multi.run()
+                if video_needed:
+                    multi.wait_for_video()
+                failed = {name: s["error"] for name, s in grouped["stages"].items() if s["status"] != SUCCESS}
+                record.update(
+                    status="failed" if failed else "ok",
+                    request_ids={str(age): lesson["request_id"] for age, lesson in grouped["lessons"].items()},
+                    reused=False,
+                    stages={name: round(s["elapsed"], 3) for name, s in grouped["stages"].items() if s["status"] == SUCCESS},
+                )
+                if failed:
+                    record["errors"] = failed
+            else:
+                pipeline = LessonPipeline(row["ages"][0], row["prompt"], video_needed, images_needed)
+                results = pipeline.run()
+                if video_needed:
+                    pipeline.wait_for_video()
+                failed = {name: r["error"] for name, r in results.items() if r["status"] != SUCCESS}
+                record.update(
+                    status="failed" if failed else "ok",
+                    request_id=pipeline.request_id,
+                    reused=False,
+                    stages={name: round(r["elapsed"], 3) for name, r in results.items() if r["status"] == SUCCESS},
+                )
+                if failed:
+                    record["errors"] = failed
+        except Exception as e:
+            logger.error(f"Batch row {row['line']} failed: {str(e)}")
+            record.update(status="failed", errors={"row": str(e)})
+        record["elapsed"] = round(time.perf_counter() - start, 3)
+        self._checkpoint(record)
+        return record
+
+    def run(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Run every row not already completed and summarize the run.
+
+        Args:
+            rows (List[Dict[str, Any]]): Rows from read_rows
+
+        Returns:
+            Dict[str, Any]: Counts, wall time, throughput and per-stage timings
+        """
+        done = self.completed_keys()
+        pending = [row for row in rows if row_key(row) not in done]
+        logger.info(f"Batch: {len(rows)} rows, {len(rows) - len(pending)} already done, {len(pending)} to run")
+
+        records = []
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.run_row, row) for row in pending]
+            for future in concurrent.futures.as_completed(futures):
+                record = future.result()
+                records.append(record)
+                logger.info(
+                    f"Batch progress {len(records)}/{len(pending)}: line {record['line']} {record['status']} "
+                    f"in {record['elapsed']:.1f}s"
+                )
+        return self.summarize(rows, pending, records, time.perf_counter() - start)
+
+    @staticmethod
+    def summarize(
+        rows: List[Dict[str, Any]],
+        pending: List[Dict[str, Any]],
+        records: List[Dict[str, Any]],
+        wall_seconds: float
+    ) -> Dict[str, Any]:
+        succeeded = [r for r in records if r["status"] == "ok"]
+        # A multi-age row produces one lesson per age
+        lessons = sum(1 if r.get("reused") else len(r["ages"]) for r in succeeded)
+        stage_times: Dict[str, List[float]] = {}
+        for record in succeeded:
+            for stage, seconds in record.get("stages", {}).items():
+                stage_times.setdefault(stage, []).append(seconds)
+
+        def percentile(values: List[float], q: float) -> float:
+            ordered = sorted(values)
+            return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+        return {
+            "rows": len(rows),
+            "skipped": len(rows) - len(pending),
+            "attempted": len(records),
+            "succeeded": len(succeeded),
+            "lessons": lessons,
+            "reused": sum(1 for r in succeeded if r.get("reused")),
+            "failed": [{"line": r["line"], "prompt": r["prompt"], "errors": r.get("errors")} for r in records if r["status"] != "ok"],
+            "wall_seconds": round(wall_seconds, 2),
+            "lessons_per_minute": round(lessons / wall_seconds * 60, 2) if wall_seconds > 0 else 0.0,
+            "mean_lesson_seconds": round(sum(r["elapsed"] for r in records) / len(records), 2) if records else 0.0,
+            "stages": {
+                stage: {
+                    "mean": round(sum(times) / len(times), 2),
+                    "p50": round(percentile(times, 0.5), 2),
+                    "p95": round(percentile(times, 0.95), 2),
+                }
+                for stage, times in sorted(stage_times.items())
+            },
+        }
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from app.config import Config
+
+    parser = argparse.ArgumentParser(description="Pre-generate lessons from a CSV or JSONL of age, prompt, modalities")
+    parser.add_argument("input", help="CSV with an age,prompt,modalities header, or JSONL with those keys")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Lessons generated at once")
+    parser.add_argument("--checkpoint", help="Progress file used to resume (default: <input>.checkpoint.jsonl)")
+    parser.add_argument("--summary", help="Where to write the JSON summary (default: <input>.summary.json)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    Config()  # Fail fast on missing API keys
+
+    base = os.path.splitext(args.input)[0]
+    runner = BatchRunner(args.checkpoint or f"{base}.checkpoint.jsonl", workers=args.workers)
+    summary = runner.run(list(read_rows(args.input)))
+    with open(args.summary or f"{base}.summary.json", 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,148 @@
+# utils/bundle_exporter.py
+import os
+import json
+import time
+import hashlib
+import logging
+import zipfile
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.config import BUNDLE_DIR
+from app.utils.catalogue import get_catalogue
+from app.utils.output_manager import OutputManager
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT_VERSION = 1
+
+
+class LessonBundleExporter:
+    """Package a finished lesson as a self-contained offline bundle.
+
+    A bundle is a zip holding the lesson text, narration, thumbnail images,
+    a low-bitrate Ken Burns slideshow (the 2D stand-in for generated video)
+    and a manifest with checksums. Community hubs can serve it as-is, with no
+    provider calls.
+    """
+
+    def __init__(self, bundle_dir: str = BUNDLE_DIR):
+        self.bundle_dir = bundle_dir
+        Path(bundle_dir).mkdir(parents=True, exist_ok=True)
+
+    def bundle_path(self, request_id: str) -> str:
+        return os.path.join(self.bundle_dir, f"{request_id}.zip")
+
+    def export(self, request_id: str, force: bool = False) -> str:
+        """
+        Build the bundle for one lesson.
+
+        Args:
+            request_id (str): Lesson to export
+            force (bool): Rebuild even if an up-to-date bundle exists
+
+        Returns:
+            str: Path of the bundle zip
+        """
+        from PIL import Image
+        from app.utils.video_processor import VideoProcessor
+
+        lesson = OutputManager.load_lesson(request_id)
+        if lesson is None:
+            raise ValueError(f"Lesson {request_id} has no saved text")
+        bundle_path = self.bundle_path(request_id)
+        text_path = OutputManager.get_output_paths(request_id)['text']
+        if not force and os.path.exists(bundle_path) and os.path.getmtime(bundle_path) >= os.path.getmtime(text_path):
+            logger.info(f"Bundle for {request_id} is up to date")
+            return bundle_path
+
+        start = time.perf_counter()
+        details = get_catalogue().get_lesson(request_id) or {}
+        files: List[Dict[str, Any]] = []
+
+        with tempfile.TemporaryDirectory(prefix="edubytes-bundle-") as temp_dir:
+            slideshow_path = None
+            if lesson['images']:
+                # Medium renditions are plenty for a 360p slideshow
+                images = []
+                for path in lesson['images']:
+                    with Image.open(OutputManager.rendition_path(path, 'medium')) as image:
+                        images.append(image.copy())
+                slideshow_path = VideoProcessor.create_slideshow(
+                    os.path.join(temp_dir, 'slideshow.mp4'), images, lesson['audio'] or None
+                )
+
+            tmp_bundle = bundle_path + '.tmp'
+            with zipfile.ZipFile(tmp_bundle, 'w') as bundle:
+                # Text is deflated; media is already compressed, so it is stored
+                bundle.writestr('lesson.txt', lesson['content'], compress_type=zipfile.ZIP_DEFLATED)
+                files.append(self._describe('lesson.txt', lesson['content'].encode('utf-8')))
+                if lesson['answers']:
+                    bundle.writestr('answers.txt', lesson['answers'], compress_type=zipfile.ZIP_DEFLATED)
+                    files.append(self._describe('answers.txt', lesson['answers'].encode('utf-8')))
+                if lesson['audio']:
+                    files.append(self._add_file(bundle, lesson['audio'], 'audio.mp3'))
+                if slideshow_path:
+                    files.append(self._add_file(bundle, slideshow_path, 'slideshow.mp4'))
+                for index, path in enumerate(lesson['images']):
+                    thumb = OutputManager.rendition_path(path, 'thumb')
+                    files.append(self._add_file(bundle, thumb, f"images/image_{index}{os.path.splitext(thumb)[1]}"))
+
+                manifest = {
+                    'format_version': BUNDLE_FORMAT_VERSION,
+                    'request_id': request_id,
+                    'age': details.get('age'),
+                    'prompt': details.get('prompt'),
+                    'labels': lesson['labels'],
+                    'created_at': details.get('created_at'),
+                    'exported_at': time.time(),
+                    'files': files,
+                }
+                bundle.writestr('manifest.json', json.dumps(manifest, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+            os.replace(tmp_bundle, bundle_path)
+
+        elapsed = time.perf_counter() - start
+        OutputManager._update_catalogue('record_asset', request_id, 'bundle', bundle_path, elapsed)
+        logger.info(f"Exported bundle {bundle_path} ({os.path.getsize(bundle_path)} bytes) in {elapsed:.2f}s")
+        return bundle_path
+
+    def export_popular(self, limit: int = 20) -> List[str]:
+        """Build bundles for the most reused lessons; failures are logged and skipped."""
+        bundles = []
+        for lesson in get_catalogue().popular_lessons(limit):
+            try:
+                bundles.append(self.export(lesson['request_id']))
+            except Exception as e:
+                logger.error(f"Failed to export bundle for {lesson['request_id']}: {str(e)}")
+        return bundles
+
+    @staticmethod
+    def _describe(name: str, data: bytes) -> Dict[str, Any]:
+        return {'name': name, 'size_bytes': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+
+    @staticmethod
+    def _add_file(bundle: zipfile.ZipFile, path: str, name: str) -> Dict[str, Any]:
+        bundle.write(path, name, compress_type=zipfile.ZIP_STORED)
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(chunk)
+        return {'name': name, 'size_bytes': os.path.getsize(path), 'sha256': sha256.hexdigest()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export offline lesson bundles")
+    parser.add_argument("--request-id", action="append", default=[], help="Lesson to export (repeatable)")
+    parser.add_argument("--popular", type=int, metavar="N", help="Export the N most reused lessons")
+    parser.add_argument("--force", action="store_true", help="Rebuild bundles that are already up to date")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    exporter = LessonBundleExporter()
+    for request_id in args.request_id:
+        print(exporter.export(request_id, force=args.force))
+    if args.popular:
+        for path in exporter.export_popular(args.popular):
+            print(path)
@@ -0,0 +1,123 @@
+# utils/cache.py
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from app.config import LESSON_CACHE_PATH, LESSON_CACHE_MAX_ENTRIES, LESSON_CACHE_TTL_SECONDS
+from app.utils.telemetry import increment
+
+logger = logging.getLogger(__name__)
+
+
+class LessonCache:
+    """Disk-backed lesson text cache shared by every process on the host.
+
+    Entries live in a SQLite database (WAL mode, so concurrent readers and a
+    writer from several processes can share it). Entries older than the TTL
+    are dropped and the least recently used ones are evicted once the cache
+    holds more than `max_entries`. Hit and miss counters are stored in the
+    same database so they aggregate across processes.
+    """
+
+    def __init__(
+        self,
+        path: str = LESSON_CACHE_PATH,
+        max_entries: int = LESSON_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = LESSON_CACHE_TTL_SECONDS
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        Path(os.path.dirname(path)).mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS lessons ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_lessons_last_access ON lessons(last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO stats (name, value) VALUES ('hits', 0), ('misses', 0)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # A fresh connection per call keeps the cache safe to use from worker threads
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """Lowercase, collapse whitespace and drop trailing punctuation."""
+        prompt = re.sub(r"\s+", " ", prompt.strip().lower())
+        return prompt.rstrip(" .!?")
+
+    @staticmethod
+    def make_key(age: int, prompt: str, model: str, temperature: float, variant: str = "text") -> str:
+        """Build the cache key from age, normalized prompt, model name and temperature."""
+        raw = "|".join([variant, str(int(age)), LessonCache.normalize_prompt(prompt), model, f"{float(temperature):.3f}"])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value, or None on a miss or an expired entry."""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT value, created_at FROM lessons WHERE key = ?", (key,)).fetchone()
+                if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM lessons WHERE key = ?", (key,))
+                    row = None
+                if row:
+                    conn.execute("UPDATE lessons SET last_access = ? WHERE key = ?", (now, key))
+                conn.execute("UPDATE stats SET value = value + 1 WHERE name = ?", ("hits" if row else "misses",))
+            increment("edubytes_cache_requests_total", cache="lesson", result="hit" if row else "miss")
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Lesson cache read failed: {str(e)}")
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        """Store a value and evict expired or least recently used entries."""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO lessons (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now)
+                )
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.error(f"Lesson cache write failed: {str(e)}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        if self.ttl_seconds:
+            conn.execute("DELETE FROM lessons WHERE created_at < ?", (now - self.ttl_seconds,))
+        if self.max_entries:
+            conn.execute(
+                "DELETE FROM lessons WHERE key IN ("
+                "SELECT key FROM lessons ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and the current number of entries."""
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            counters["entries"] = conn.execute("SELECT COUNT(*) FROM lessons").fetchone()[0]
+        return counters
+
+    def clear(self) -> None:
+        """Remove every entry and reset the counters."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM lessons")
+            conn.execute("UPDATE stats SET value = 0")
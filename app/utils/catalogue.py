@@ -0,0 +1,235 @@
+# utils/catalogue.py
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.config import CATALOGUE_PATH
+from app.services.registry import ServiceRegistry
+from app.utils.cache import LessonCache
+
+logger = logging.getLogger(__name__)
+
+
+class OutputCatalogue:
+    """SQLite index of everything written under outputs/.
+
+    One row per lesson (request_id, age, prompt hash, labels, reuse count),
+    one row per saved asset (modality, path, size, save time) and one row per
+    stage timing. Lookups by request_id, (age, prompt_hash) and creation time
+    are all indexed, so finding, listing and deduplicating lessons never
+    walks the outputs/ directory.
+    """
+
+    def __init__(self, path: str = CATALOGUE_PATH):
+        self.path = path
+        Path(os.path.dirname(path)).mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS lessons (
+                    request_id TEXT PRIMARY KEY,
+                    age INTEGER NOT NULL,
+                    prompt TEXT NOT NULL,
+                    prompt_hash TEXT NOT NULL,
+                    labels TEXT NOT NULL DEFAULT '[]',
+                    created_at REAL NOT NULL,
+                    reuse_count INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_lessons_age_prompt ON lessons(age, prompt_hash);
+                CREATE INDEX IF NOT EXISTS idx_lessons_created_at ON lessons(created_at);
+                CREATE INDEX IF NOT EXISTS idx_lessons_reuse_count ON lessons(reuse_count);
+                CREATE TABLE IF NOT EXISTS assets (
+                    request_id TEXT NOT NULL,
+                    modality TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size_bytes INTEGER,
+                    save_seconds REAL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (request_id, modality, path)
+                );
+                CREATE TABLE IF NOT EXISTS timings (
+                    request_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    seconds REAL NOT NULL,
+                    PRIMARY KEY (request_id, stage)
+                );
+            """)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One connection per call; each `with` block is a single transaction
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def prompt_hash(prompt: str) -> str:
+        """Hash of the normalized prompt, shared with the lesson cache's normalization."""
+        return hashlib.sha256(LessonCache.normalize_prompt(prompt).encode("utf-8")).hexdigest()
+
+    def record_lesson(self, request_id: str, age: int, prompt: str, created_at: Optional[float] = None) -> None:
+        """Register a new lesson."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO lessons (request_id, age, prompt, prompt_hash, created_at) VALUES (?, ?, ?, ?, ?)",
+                (request_id, int(age), prompt, self.prompt_hash(prompt), created_at or time.time())
+            )
+
+    def set_labels(self, request_id: str, labels: List[str]) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE lessons SET labels = ? WHERE request_id = ?", (json.dumps(labels), request_id))
+
+    def record_asset(self, request_id: str, modality: str, path: str, save_seconds: Optional[float] = None) -> None:
+        """Register (or replace) a saved file for a lesson."""
+        size = os.path.getsize(path) if os.path.exists(path) else None
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO assets (request_id, modality, path, size_bytes, save_seconds, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (request_id, modality, path, size, save_seconds, time.time())
+            )
+
+    def replace_assets(self, request_id: str, modality: str, paths: List[str], save_seconds: Optional[float] = None) -> None:
+        """Swap every asset of one modality for `paths` in a single transaction."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM assets WHERE request_id = ? AND modality = ?", (request_id, modality))
+            conn.executemany(
+                "INSERT INTO assets (request_id, modality, path, size_bytes, save_seconds, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (request_id, modality, path, os.path.getsize(path) if os.path.exists(path) else None, save_seconds, now)
+                    for path in paths
+                ]
+            )
+
+    def record_timings(self, request_id: str, timings: Dict[str, float]) -> None:
+        """Store per-stage elapsed seconds for a lesson."""
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO timings (request_id, stage, seconds) VALUES (?, ?, ?)",
+                [(request_id, stage, float(seconds)) for stage, seconds in timings.items()]
+            )
+
+    def record_reuse(self, request_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE lessons SET reuse_count = reuse_count + 1 WHERE request_id = ?", (request_id,))
+
+    def _lesson_from_row(self, conn: sqlite3.Connection, row: sqlite3.Row) -> Dict[str, Any]:
+        lesson = dict(row)
+        lesson["labels"] = json.loads(lesson["labels"])
+        lesson["assets"] = {}
+        for asset in conn.execute(
+            "SELECT modality, path, size_bytes FROM assets WHERE request_id = ? ORDER BY path", (row["request_id"],)
+        ):
+            lesson["assets"].setdefault(asset["modality"], []).append(
+                {"path": asset["path"], "size_bytes": asset["size_bytes"]}
+            )
+        lesson["timings"] = dict(
+            conn.execute("SELECT stage, seconds FROM timings WHERE request_id = ?", (row["request_id"],)).fetchall()
+        )
+        return lesson
+
+    def get_lesson(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Return a lesson with its assets and timings, or None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM lessons WHERE request_id = ?", (request_id,)).fetchone()
+            return self._lesson_from_row(conn, row) if row else None
+
+    def find_by_prompt(self, age: int, prompt: str, required_modalities: List[str] = ()) -> Optional[str]:
+        """Return the newest lesson for this age and normalized prompt that has every required modality."""
+        query = "SELECT l.request_id FROM lessons l WHERE l.age = ? AND l.prompt_hash = ?"
+        params: List[Any] = [int(age), self.prompt_hash(prompt)]
+        for modality in required_modalities:
+            query += " AND EXISTS (SELECT 1 FROM assets a WHERE a.request_id = l.request_id AND a.modality = ?)"
+            params.append(modality)
+        query += " ORDER BY l.created_at DESC LIMIT 1"
+        with self._connect() as conn:
+            row = conn.execute(query, params).fetchone()
+        return row["request_id"] if row else None
+
+    def iter_prompts(self, modality: str = 'text') -> Iterator[Dict[str, Any]]:
+        """Yield request_id, age and prompt for every lesson that has an asset of `modality`."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT l.request_id, l.age, l.prompt FROM lessons l WHERE l.prompt != '' AND EXISTS "
+                "(SELECT 1 FROM assets a WHERE a.request_id = l.request_id AND a.modality = ?) ORDER BY l.created_at",
+                (modality,)
+            ).fetchall()
+        for row in rows:
+            yield dict(row)
+
+    def list_lessons(self, age: Optional[int] = None, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """List lessons newest first, optionally for one age."""
+        query = "SELECT * FROM lessons"
+        params: List[Any] = []
+        if age is not None:
+            query += " WHERE age = ?"
+            params.append(int(age))
+        query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        with self._connect() as conn:
+            return [self._lesson_from_row(conn, row) for row in conn.execute(query, params).fetchall()]
+
+    def popular_lessons(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most reused lessons first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM lessons WHERE reuse_count > 0 ORDER BY reuse_count DESC, created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+            return [self._lesson_from_row(conn, row) for row in rows]
+
+    def backfill(self, output_dir: str) -> int:
+        """Catalogue lesson directories written before the catalogue existed. Returns the number added."""
+        added = 0
+        for request_id in sorted(os.listdir(output_dir)):
+            request_dir = os.path.join(output_dir, request_id)
+            if request_id.startswith('.') or not os.path.isdir(request_dir) or self.get_lesson(request_id):
+                continue
+            metadata_path = os.path.join(request_dir, 'metadata.json')
+            metadata = {}
+            if os.path.exists(metadata_path):
+                with open(metadata_path, encoding='utf-8') as f:
+                    metadata = json.load(f)
+            self.record_lesson(
+                request_id, metadata.get('age', 0), metadata.get('prompt', ''),
+                created_at=metadata.get('created_at') or os.path.getmtime(request_dir)
+            )
+            for modality in ('text', 'audio', 'images', 'video'):
+                modality_dir = os.path.join(request_dir, modality)
+                if os.path.isdir(modality_dir):
+                    paths = [os.path.join(modality_dir, name) for name in sorted(os.listdir(modality_dir))]
+                    if paths:
+                        self.replace_assets(request_id, modality, paths)
+            added += 1
+        logger.info(f"Backfilled {added} lessons into the output catalogue")
+        return added
+
+
+def get_catalogue() -> OutputCatalogue:
+    return ServiceRegistry.get('catalogue', OutputCatalogue)
+
+
+if __name__ == "__main__":
+    from app.utils.output_manager import OutputManager
+
+    parser = argparse.ArgumentParser(description="Maintain the outputs/ catalogue")
+    parser.add_argument("--backfill", action="store_true", help="Catalogue existing lesson directories")
+    parser.add_argument("--list", type=int, metavar="N", help="Print the N newest lessons")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.backfill:
+        get_catalogue().backfill(OutputManager.OUTPUT_DIR)
+    if args.list:
+        for lesson in get_catalogue().list_lessons(limit=args.list):
+            print(f"{lesson['request_id']}  age {lesson['age']:>2}  {lesson['prompt']}")
@@ -0,0 +1,163 @@
+# utils/downloader.py
+import os
+import time
+import base64
+import hashlib
+import logging
+import threading
+import concurrent.futures
+from typing import Dict, Optional
+
+from app.config import (
+    DOWNLOAD_CHUNK_BYTES,
+    DOWNLOAD_MAX_RETRIES,
+    DOWNLOAD_TIMEOUT_SECONDS,
+    DOWNLOAD_WORKERS,
+)
+from app.services.registry import get_http_session
+from app.utils.telemetry import increment
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_in_flight: Dict[str, concurrent.futures.Future] = {}
+_lock = threading.Lock()
+
+
+# Client errors worth retrying; any other 4xx (e.g. an expired or forbidden signed URL) fails at once
+RETRYABLE_CLIENT_ERRORS = (408, 429)
+
+
+class ChecksumError(Exception):
+    """Raised when a downloaded file does not match its expected size or checksum."""
+
+
+def _is_retryable(error: Exception) -> bool:
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return not (status is not None and 400 <= status < 500 and status not in RETRYABLE_CLIENT_ERRORS)
+
+
+def _file_digests(path: str, chunk_size: int = DOWNLOAD_CHUNK_BYTES) -> Dict[str, str]:
+    """Hash a file in fixed-size chunks so memory stays bounded."""
+    sha256, md5 = hashlib.sha256(), hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+            md5.update(chunk)
+    return {'sha256': sha256.hexdigest(), 'md5': base64.b64encode(md5.digest()).decode('ascii')}
+
+
+def _server_md5(headers) -> Optional[str]:
+    """Base64 MD5 advertised by the server (Content-MD5 or GCS x-goog-hash), if any."""
+    if headers.get('Content-MD5'):
+        return headers['Content-MD5']
+    for part in headers.get('x-goog-hash', '').split(','):
+        name, _, value = part.strip().partition('=')
+        if name == 'md5' and value:
+            return value
+    return None
+
+
+def download_file(url: str, output_path: str, expected_sha256: Optional[str] = None) -> str:
+    """
+    Download `url` to `output_path` in chunks, resuming with HTTP Range after failures.
+
+    Data goes to `<output_path>.part` and is renamed into place only after the
+    size and checksum checks pass. A `<output_path>.sha256` sidecar records the
+    verified digest.
+
+    Args:
+        url (str): Remote file URL
+        output_path (str): Final local path
+        expected_sha256 (Optional[str]): Hex digest the file must match, if known
+
+    Returns:
+        str: output_path
+
+    Raises:
+        ChecksumError: If the size or checksum does not match
+        requests.HTTPError: On a client error other than 408/429, which is not retried
+    """
+    partial_path = output_path + '.part'
+    expected_size = None
+    server_md5 = None
+
+    for attempt in range(1, DOWNLOAD_MAX_RETRIES + 1):
+        offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        try:
+            with get_http_session().get(url, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT_SECONDS) as response:
+                if offset and response.status_code == 416:
+                    # The server rejects the range, so the partial file is stale or
+                    # already overran the remote file; it cannot be trusted as complete
+                    os.remove(partial_path)
+                    raise ChecksumError(f"Server rejected resuming {url} at byte {offset}; discarded the partial file")
+                response.raise_for_status()
+                if offset and response.status_code != 206:
+                    logger.info(f"Server ignored the range request for {url}, restarting download")
+                    offset = 0
+
+                content_range = response.headers.get('Content-Range', '')
+                if '/' in content_range and not content_range.endswith('/*'):
+                    expected_size = int(content_range.rsplit('/', 1)[1])
+                elif response.headers.get('Content-Length'):
+                    expected_size = offset + int(response.headers['Content-Length'])
+                if not offset:
+                    server_md5 = _server_md5(response.headers)
+
+                with open(partial_path, 'ab' if offset else 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                        f.write(chunk)
+
+            # A body that ended early without an error is resumed from where it stopped
+            size = os.path.getsize(partial_path)
+            if expected_size is not None and size < expected_size:
+                raise ChecksumError(f"Downloaded {size} of {expected_size} bytes from {url}")
+            if expected_size is not None and size > expected_size:
+                os.remove(partial_path)
+                raise ChecksumError(f"Downloaded {size} bytes from {url}, expected {expected_size}; discarded the file")
+            break
+        except Exception as e:
+            if not _is_retryable(e):
+                logger.error(f"Download of {url} failed with a non-retryable error: {str(e)}")
+                raise
+            if attempt == DOWNLOAD_MAX_RETRIES:
+                logger.error(f"Download of {url} failed after {attempt} attempts: {str(e)}")
+                raise
+            logger.warning(f"Download of {url} interrupted (attempt {attempt}): {str(e)}; resuming")
+            increment("edubytes_retries_total", operation="download")
+            time.sleep(min(2 ** attempt, 10))
+
+    digests = _file_digests(partial_path)
+    if expected_sha256 and digests['sha256'] != expected_sha256.lower():
+        os.remove(partial_path)
+        raise ChecksumError(f"SHA-256 mismatch for {url}")
+    if server_md5 and digests['md5'] != server_md5:
+        os.remove(partial_path)
+        raise ChecksumError(f"MD5 mismatch for {url}")
+
+    os.replace(partial_path, output_path)
+    with open(output_path + '.sha256', 'w', encoding='utf-8') as f:
+        f.write(f"{digests['sha256']}  {os.path.basename(output_path)}\n")
+    logger.info(f"Downloaded {size} bytes from {url} to {output_path}")
+    return output_path
+
+
+def download_in_background(url: str, output_path: str, expected_sha256: Optional[str] = None) -> concurrent.futures.Future:
+    """Queue a download on the shared download pool; repeated calls for one path share a future."""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = concurrent.futures.ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix="download")
+        future = _in_flight.get(output_path)
+        if future is None or future.done():
+            future = _pool.submit(download_file, url, output_path, expected_sha256)
+            _in_flight[output_path] = future
+            future.add_done_callback(lambda _: _forget(output_path, future))
+        return future
+
+
+def _forget(output_path: str, future: concurrent.futures.Future) -> None:
+    with _lock:
+        if _in_flight.get(output_path) is future:
+            del _in_flight[output_path]
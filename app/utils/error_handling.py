@@ -1,10 +1,30 @@
 # utils/error_handling.py
 import logging
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, stop_any, wait_exponential
 from functools import wraps
+from app.config import RETRY_MIN_WAIT_SECONDS, RETRY_MAX_WAIT_SECONDS
+from app.utils.resilience import CircuitOpenError, DeadlineExceeded, remaining
+from app.utils.telemetry import increment
 
 logger = logging.getLogger(__name__)
 
+_backoff = wait_exponential(multiplier=1, min=RETRY_MIN_WAIT_SECONDS, max=RETRY_MAX_WAIT_SECONDS)
+
+def _wait_within_deadline(retry_state) -> float:
+    # Never sleep past the request deadline
+    left = remaining()
+    wait = _backoff(retry_state)
+    return wait if left is None else max(0.0, min(wait, left))
+
+def _deadline_passed(retry_state) -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+def _count_retry(retry_state) -> None:
+    # Called with (self, func, *args) before sleeping for the next attempt
+    func = retry_state.args[1] if len(retry_state.args) > 1 else None
+    increment("edubytes_retries_total", operation=getattr(func, '__name__', 'api_call'))
+
 def handle_api_errors(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
@@ -16,10 +36,16 @@ def handle_api_errors(func):
     return wrapper
 
 class ErrorHandler:
-    @retry(stop=stop_after_attempt(2), wait=wait_exponential(multiplier=1, min=4, max=10))
+    # An open breaker or an expired deadline will not be fixed by retrying
+    @retry(
+        stop=stop_any(stop_after_attempt(2), _deadline_passed),
+        wait=_wait_within_deadline,
+        retry=retry_if_not_exception_type((CircuitOpenError, DeadlineExceeded)),
+        before_sleep=_count_retry
+    )
     def api_call_with_retry(self, func, *args, **kwargs):
         try:
             return func(*args, **kwargs)
         except Exception as e:
             logger.error(f"API call failed: {str(e)}")
-            raise
\ No newline at end of file
+            raise
@@ -0,0 +1,163 @@
+# utils/json_repair.py
+import re
+import json
+import logging
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+MAX_TRUNCATION_ATTEMPTS = 20
+
+_SMART_DOUBLE_QUOTES = '“”'
+_STRUCTURAL = ':,}]'
+_SIMPLE_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '"': '"', '\\': '\\', '/': '/'}
+
+
+def _normalize_quotes(text: str) -> str:
+    """Replace typographic double quotes used as JSON delimiters, leaving those inside string values alone."""
+    out = []
+    in_string = False
+    smart_open = False
+    escaped = False
+    for i, char in enumerate(text):
+        if not in_string:
+            if char == '"' or char in _SMART_DOUBLE_QUOTES:
+                in_string = True
+                smart_open = char != '"'
+                char = '"'
+        elif escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == '"':
+            in_string = False
+        elif char in _SMART_DOUBLE_QUOTES and smart_open:
+            # A string opened with a typographic quote ends at one followed by JSON structure
+            following = text[i + 1:].lstrip()[:1]
+            if not following or following in _STRUCTURAL:
+                in_string = False
+                char = '"'
+        out.append(char)
+    return ''.join(out)
+
+
+def _close_json(text: str) -> str:
+    """Escape raw newlines inside strings and close any unterminated string, array or object."""
+    out = []
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            elif char == '\n':
+                out.append('\\n')
+                continue
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]' and stack:
+            stack.pop()
+        out.append(char)
+    if escaped:
+        out.pop()
+    if in_string:
+        out.append('"')
+    return ''.join(out).rstrip().rstrip(',') + ''.join(reversed(stack))
+
+
+def repair_json(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse a JSON object from model output, repairing common defects locally.
+
+    Handles code fences, prose around the object, typographic quotes used as
+    delimiters, trailing commas, raw newlines inside strings and truncated
+    output. Typographic quotes inside string values are kept as they are.
+
+    Args:
+        text (str): Raw model output
+
+    Returns:
+        Optional[Dict[str, Any]]: The parsed object, or None if nothing usable was found
+    """
+    if not text:
+        return None
+    candidate = _FENCE.sub('', text.strip())
+    start = candidate.find('{')
+    if start == -1:
+        return None
+    end = candidate.rfind('}')
+    attempts = [candidate[start:end + 1]] if end > start else []
+    attempts.append(candidate[start:])
+
+    # Truncated output: also try dropping the last, incomplete element
+    truncated = _normalize_quotes(candidate[start:])
+    cut = len(truncated)
+    for _ in range(MAX_TRUNCATION_ATTEMPTS):
+        cut = truncated.rfind(',', 0, cut)
+        if cut <= 0:
+            break
+        attempts.append(truncated[:cut])
+
+    for attempt in attempts:
+        for fixed in (
+            attempt,
+            _TRAILING_COMMA.sub(r'\1', _normalize_quotes(attempt)),
+            _TRAILING_COMMA.sub(r'\1', _close_json(_normalize_quotes(attempt))),
+        ):
+            try:
+                data = json.loads(fixed)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(data, dict):
+                if fixed is not attempt:
+                    logger.info("Repaired malformed JSON from model output")
+                return data
+    logger.warning("Could not repair JSON from model output")
+    return None
+
+
+def extract_partial_string(buffer: str, key: str) -> str:
+    """Return the (possibly still streaming) value of a top-level string field, unescaped."""
+    buffer = _normalize_quotes(buffer)
+    match = re.search(r'"%s"\s*:\s*"' % re.escape(key), buffer)
+    if not match:
+        return ''
+    value = []
+    i = match.end()
+    while i < len(buffer):
+        char = buffer[i]
+        if char == '"':
+            break
+        if char != '\\':
+            value.append(char)
+            i += 1
+            continue
+        escape = buffer[i + 1:i + 2]
+        if not escape:
+            break  # The escape is still streaming
+        if escape == 'u':
+            digits = buffer[i + 2:i + 6]
+            if len(digits) < 4:
+                break
+            try:
+                value.append(chr(int(digits, 16)))
+            except ValueError:
+                value.append(digits)
+            i += 6
+            continue
+        value.append(_SIMPLE_ESCAPES.get(escape, escape))
+        i += 2
+    # Join UTF-16 surrogate pairs (emoji); drop a high surrogate whose pair has not arrived yet
+    text = ''.join(value)
+    if text and '\ud800' <= text[-1] <= '\udbff':
+        text = text[:-1]
+    return text.encode('utf-16', 'surrogatepass').decode('utf-16', 'replace')
@@ -0,0 +1,207 @@
+# utils/keywords.py
+import os
+import re
+import json
+import math
+import logging
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.config import KEYWORD_INDEX_PATH
+from app.services.registry import ServiceRegistry
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z][a-z'-]*[a-z]")
+
+# Function words plus the boilerplate every generated lesson shares ("Imagine...", "for example")
+STOP_WORDS = frozenset("""
+a about above after again against all also always am an and any are aren't around as at be because been before
+being below between both but by can can't cannot could couldn't did didn't do does doesn't doing don't down during
+each even ever every few for from further get gets getting got had hasn't has have haven't having he he'd he'll
+he's her here here's hers herself him himself his how how's i i'd i'll i'm i've if in into is isn't it it's its
+itself just let let's like lot lots made make makes many may me might more most much must mustn't my myself no nor
+not now of off on once one only or other ought our ours ourselves out over own really same say says she she'd
+she'll she's should shouldn't so some something such than that that's the their theirs them themselves then there
+there's these they they'd they'll they're they've thing things think this those through to too two under until up
+upon us use used using very was wasn't way ways we we'd we'll we're we've well were weren't what what's when
+when's where where's which while who who's whom why why's will with won't would wouldn't yes yet you you'd you'll
+you're you've your yours yourself yourselves
+imagine example examples scenario explanation explain cross-cultural cultural alternative perspective different
+learn learning lesson fun happens happen called kind kinds another world real life day new big small help helps
+""".split())
+
+
+class KeywordExtractor:
+    """Rank lesson keywords locally with TF-IDF, without any API call.
+
+    Document frequencies come from the lesson texts already saved under
+    outputs/ and are persisted as JSON, so ranking a lesson is one pass over
+    its few hundred terms, in plain Python (numpy would cost UI startup
+    time). Terms are single words and two-word phrases; ties are broken by
+    first appearance, so the same text always yields the same list.
+
+    When no index file exists, the first lookup starts building one from the
+    catalogue in the background; until it is ready, terms are ranked by
+    frequency alone. `python -m app.utils.keywords --rebuild` refreshes it as
+    the catalogue grows.
+    """
+
+    def __init__(self, path: str = KEYWORD_INDEX_PATH):
+        self.path = path
+        self._documents = 0
+        self._df: Dict[str, int] = {}
+        self._loaded = False
+        self._building = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _terms(text: str) -> List[str]:
+        """Content words and adjacent content-word pairs, in order of appearance."""
+        terms = []
+        previous = None
+        for word in _WORD.findall(text.lower()):
+            if word in STOP_WORDS or len(word) < 3:
+                previous = None
+                continue
+            terms.append(word)
+            if previous:
+                terms.append(f"{previous} {word}")
+            previous = word
+        return terms
+
+    def _ensure_loaded(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, encoding='utf-8') as f:
+                        data = json.load(f)
+                    self._documents, self._df = data['documents'], data['df']
+                except (OSError, ValueError, KeyError) as e:
+                    logger.error(f"Failed to load keyword index {self.path}: {str(e)}")
+            else:
+                self._build_in_background()
+            self._loaded = True
+
+    def _build_in_background(self) -> None:
+        """Build the first index from the saved lessons off the request path. Call with the lock held."""
+        if self._building:
+            return
+        self._building = True
+
+        def run():
+            try:
+                texts = self._saved_texts()
+                if texts:
+                    self.rebuild(texts)
+                else:
+                    # Writing an empty index would stop the next process from trying again
+                    logger.info("No saved lessons to build the keyword index from yet")
+            except Exception as e:
+                logger.error(f"Background keyword index build failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._building = False
+
+        logger.info(f"Keyword index {self.path} not found, building it in the background")
+        threading.Thread(target=run, name="keyword-index-build", daemon=True).start()
+
+    @staticmethod
+    def _saved_texts() -> List[str]:
+        from app.utils.catalogue import get_catalogue
+        from app.utils.output_manager import OutputManager
+        texts = []
+        for entry in get_catalogue().iter_prompts('text'):
+            lesson = OutputManager.load_lesson(entry['request_id'])
+            if lesson and lesson['content']:
+                texts.append(lesson['content'])
+        return texts
+
+    def rebuild(self, texts: Optional[List[str]] = None) -> int:
+        """Recount document frequencies over `texts`, or over every saved lesson. Returns the document count."""
+        if texts is None:
+            texts = self._saved_texts()
+
+        df: Dict[str, int] = {}
+        for text in texts:
+            for term in set(self._terms(text)):
+                df[term] = df.get(term, 0) + 1
+        # Terms seen only once carry no corpus signal and would bloat the file
+        df = {term: count for term, count in df.items() if count > 1}
+
+        Path(os.path.dirname(self.path)).mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'documents': len(texts), 'df': df}, f)
+        os.replace(tmp_path, self.path)
+        with self._lock:
+            self._documents, self._df, self._loaded = len(texts), df, True
+        logger.info(f"Rebuilt keyword index from {len(texts)} lessons ({len(df)} terms)")
+        return len(texts)
+
+    def extract(self, text: str, limit: int = 10) -> List[str]:
+        """
+        Return the highest-ranked keywords of a text.
+
+        Args:
+            text (str): Lesson text
+            limit (int): Maximum number of keywords
+
+        Returns:
+            List[str]: Keywords, best first; a phrase suppresses the single words it contains
+        """
+        self._ensure_loaded()
+        terms = self._terms(text)
+        if not terms:
+            return []
+
+        # Dicts keep insertion order, so a term's position is its first appearance
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+
+        scores: Dict[str, float] = {}
+        for term, count in counts.items():
+            idf = math.log((1 + self._documents) / (1 + self._df.get(term, 0))) + 1
+            # A repeated phrase is a stronger topic signal than either of its words
+            weight = (1.5 if count > 1 else 0.0) if ' ' in term else 1.0
+            scores[term] = count * idf * weight
+        # Sort by score, then by first appearance (sorted is stable)
+        order = sorted(scores, key=lambda term: -scores[term])
+
+        ranked: List[str] = []
+        covered = set()
+        for term in order:
+            if scores[term] <= 0 or len(ranked) >= limit:
+                break
+            words = term.split()
+            if any(word in covered for word in words):
+                continue
+            ranked.append(term)
+            covered.update(words)
+        return ranked
+
+    @staticmethod
+    def to_hashtags(keywords: List[str]) -> List[str]:
+        """Format keywords the way the Mistral hashtag call does, e.g. 'solar system' -> '#SolarSystem'."""
+        return ["#" + "".join(part.capitalize() for part in re.split(r"[\s'-]+", keyword) if part) for keyword in keywords]
+
+
+def get_keyword_extractor() -> KeywordExtractor:
+    return ServiceRegistry.get('keyword_extractor', KeywordExtractor)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the local keyword index")
+    parser.add_argument("--rebuild", action="store_true", help="Recount document frequencies over saved lessons")
+    parser.add_argument("--text", help="Print the keywords of this text")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.rebuild:
+        get_keyword_extractor().rebuild()
+    if args.text:
+        print(", ".join(get_keyword_extractor().extract(args.text)))
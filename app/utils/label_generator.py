@@ -1,14 +1,22 @@
 import re
 import logging
 from typing import List
-from app.services.mistral_tiny_service import MistralService
+from app.services.registry import get_label_service
+from app.utils.keywords import KeywordExtractor, get_keyword_extractor
+from app.config import LABEL_PROVIDER
 
 logger = logging.getLogger(__name__)
 
+def generate_local_labels(prompt: str) -> List[str]:
+    """Generate content labels from locally ranked keywords, without an API call."""
+    return KeywordExtractor.to_hashtags(get_keyword_extractor().extract(prompt, limit=10))
+
 def generate_content_labels(prompt: str) -> List[str]:
-    """Generate content labels using Mistral AI."""
+    """Generate content labels using Mistral AI, or locally when LABEL_PROVIDER is "local"."""
     logger.info(f"Generating content labels for prompt: {prompt}")
-    mistral_service = MistralService()
+    if LABEL_PROVIDER == "local":
+        return generate_local_labels(prompt)
+    mistral_service = get_label_service()
     content_labels = set()
     
     try:
@@ -20,9 +28,13 @@ def generate_content_labels(prompt: str) -> List[str]:
             logger.info("No hashtags found in initial response, attempting secondary generation")
             content_labels = set(mistral_service.retry_with_alternative_prompt(prompt))
         
+        if not content_labels:
+            logger.info("No hashtags from Mistral, falling back to local keywords")
+            return generate_local_labels(prompt)
+
         logger.info(f"Generated {len(content_labels)} unique hashtags")
         return list(content_labels)
         
     except Exception as e:
         logger.error(f"Error generating content labels: {str(e)}")
-        return []
+        return generate_local_labels(prompt)
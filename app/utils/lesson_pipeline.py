@@ -0,0 +1,445 @@
+# utils/lesson_pipeline.py
+import logging
+import concurrent.futures
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.registry import get_content_agent, get_image_agent, get_audio_agent, get_video_agent
+from app.utils.error_handling import ErrorHandler
+from app.utils.output_manager import OutputManager
+from app.utils.label_generator import generate_content_labels
+from app.utils.workflow import StageGraph, SUCCESS
+from app.utils.resilience import deadline
+from app.utils.scheduler import get_scheduler
+from app.utils.catalogue import get_catalogue
+from app.utils.telemetry import increment, trace
+from app.config import (
+    WORKFLOW_MAX_WORKERS, SEMANTIC_REUSE_ENABLED, LESSON_STRUCTURED_OUTPUT, REQUEST_DEADLINE_SECONDS,
+    VIDEO_DOWNLOAD_WAIT_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+error_handler = ErrorHandler()
+
+
+def find_reusable_lesson(age: int, prompt: str, video_needed: bool, images_needed: bool) -> Optional[Dict[str, Any]]:
+    """Return a stored lesson close enough to the prompt that covers every requested modality."""
+    required = ['text', 'audio'] + (['images'] if images_needed else []) + (['video'] if video_needed else [])
+    try:
+        # Exact (normalized) prompt matches are a single indexed catalogue query
+        request_id = get_catalogue().find_by_prompt(age, prompt, required)
+        lesson = OutputManager.load_lesson(request_id) if request_id else None
+        if lesson:
+            logger.info(f"Reusing identical lesson {request_id}")
+            get_catalogue().record_reuse(request_id)
+            increment("edubytes_cache_requests_total", cache="catalogue", result="hit")
+            return lesson
+    except Exception as e:
+        logger.error(f"Catalogue lesson lookup failed: {str(e)}")
+    increment("edubytes_cache_requests_total", cache="catalogue", result="miss")
+
+    if not SEMANTIC_REUSE_ENABLED:
+        return None
+    try:
+        # numpy and sentence_transformers load on the first lookup, not at startup
+        from app.utils.semantic_index import get_semantic_index
+        lesson = get_semantic_index().lookup(age, prompt)
+    except Exception as e:
+        logger.error(f"Semantic lesson lookup failed: {str(e)}")
+        return None
+    if not lesson or not lesson["audio"]:
+        increment("edubytes_cache_requests_total", cache="semantic", result="miss")
+        return None
+    if (images_needed and not lesson["images"]) or (video_needed and not lesson["video"]):
+        logger.info(f"Lesson {lesson['request_id']} lacks a requested modality, generating a new one")
+        increment("edubytes_cache_requests_total", cache="semantic", result="miss")
+        return None
+    get_catalogue().record_reuse(lesson['request_id'])
+    increment("edubytes_cache_requests_total", cache="semantic", result="hit")
+    return lesson
+
+
+def record_lesson_results(request_id: str, age: int, prompt: str, timings: Dict[str, float], indexable: bool) -> None:
+    """Store stage timings in the catalogue and, when the lesson is complete, add it to the reuse index."""
+    try:
+        get_catalogue().record_timings(request_id, timings)
+    except Exception as e:
+        logger.error(f"Failed to record timings for {request_id}: {str(e)}")
+
+    # Make the finished lesson available for reuse
+    if SEMANTIC_REUSE_ENABLED and indexable:
+        try:
+            from app.utils.semantic_index import get_semantic_index
+            get_semantic_index().add(request_id, age, prompt)
+        except Exception as e:
+            logger.error(f"Failed to index lesson {request_id}: {str(e)}")
+
+
+def merge_labels(label_sets: List[List[str]], limit: int = 10) -> List[str]:
+    """Combine per-age hashtags, most common first, then by first appearance."""
+    counts: Dict[str, int] = {}
+    spelling: Dict[str, str] = {}
+    for labels in label_sets:
+        for label in labels or []:
+            key = label.lstrip('#').lower()
+            if key:
+                counts[key] = counts.get(key, 0) + 1
+                spelling.setdefault(key, label)
+    ranked = sorted(counts, key=lambda key: -counts[key])  # sorted() is stable, so ties keep first appearance
+    return [spelling[key] for key in ranked[:limit]]
+
+
+class LessonPipeline:
+    """The lesson generation stages, independent of any UI.
+
+    Creates the request directory up front, then runs content, labels,
+    images, audio and video as a StageGraph on the scheduler lanes. Progress
+    (text tokens, audio chunks) is reported through `emit(kind, payload)`, so
+    the Gradio handler can stream it while headless callers simply ignore it.
+    """
+
+    def __init__(
+        self,
+        age: int,
+        prompt: str,
+        video_needed: bool = False,
+        images_needed: bool = False,
+        emit: Optional[Callable[[str, Any], None]] = None
+    ):
+        self.age = int(age)
+        self.prompt = prompt
+        self.video_needed = video_needed
+        self.images_needed = images_needed
+        self.emit = emit or (lambda kind, payload: None)
+        self.video_downloads: List[concurrent.futures.Future] = []
+
+        # Generate request ID and create output directories
+        self.request_id = OutputManager.generate_request_id()
+        self.output_paths = OutputManager.create_request_directory(self.request_id)
+        OutputManager.save_request_metadata(self.request_id, self.age, prompt)
+        logger.info(f"Starting generation workflow with request ID: {self.request_id}, video generation: {video_needed}")
+
+    def _generate_content(self) -> Dict[str, Any]:
+        content_agent = get_content_agent()
+
+        def stream():
+            # A retry starts the lesson text over
+            self.emit("content_reset", None)
+            parts = []
+            for token in content_agent.stream_content(self.age, self.prompt):
+                parts.append(token)
+                self.emit("token", token)
+            return {"text": "".join(parts), "answers": "", "labels": None, "image_prompts": None}
+
+        def stream_structured():
+            # One call returns the lesson together with its labels and image prompts
+            self.emit("content_reset", None)
+            for kind, payload in content_agent.stream_structured(self.age, self.prompt):
+                if kind == "body":
+                    self.emit("token", payload)
+                    continue
+                text = content_agent.format_lesson(payload)
+                # Replace the streamed body with the full lesson, learning points and quiz questions included
+                self.emit("content_reset", None)
+                self.emit("token", text)
+                return {
+                    "text": text,
+                    # The answer key is shown and saved separately, never narrated
+                    "answers": content_agent.format_answers(payload),
+                    "labels": payload["hashtags"] or None,
+                    "image_prompts": payload["image_prompts"] or None,
+                }
+            raise RuntimeError("Structured generation returned no lesson")
+
+        content = error_handler.api_call_with_retry(stream_structured if LESSON_STRUCTURED_OUTPUT else stream)
+        # Save the text now so it survives a failed labels stage, which only appends to it
+        OutputManager.save_text_output(self.request_id, content["text"])
+        if content["answers"]:
+            OutputManager.save_answers_output(self.request_id, content["answers"])
+        return content
+
+    def _generate_labels(self, content: Dict[str, Any]) -> List[str]:
+        # Use the labels from the structured response, otherwise ask for them separately
+        content_labels = content["labels"] or generate_content_labels(content["text"])
+        logger.info(f"Generated content labels: {content_labels}")
+        formatted_labels = OutputManager.LABELS_SEPARATOR + ", ".join(content_labels)
+        OutputManager.save_text_output(self.request_id, content["text"] + formatted_labels)
+        return content_labels
+
+    def _generate_images(self, content: Dict[str, Any], content_labels: List[str]) -> List[str]:
+        image_agent = get_image_agent()
+        images = error_handler.api_call_with_retry(
+            image_agent.generate_images,
+            content["text"],
+            self.age,
+            content_labels,  # Pass the labels to image agent
+            content["image_prompts"]
+        )
+        return OutputManager.save_images_output(self.request_id, images)
+
+    def _generate_audio(self, content: Dict[str, Any]) -> str:
+        # Tee the TTS stream to disk and to the caller; nothing is buffered in full
+        audio_agent = get_audio_agent()
+        chunks = audio_agent.stream_audio(content["text"], self.age)
+        for chunk in OutputManager.stream_audio_output(self.request_id, chunks):
+            self.emit("audio", chunk)
+        return OutputManager.get_output_paths(self.request_id)['audio']
+
+    def _generate_video(self, content: Dict[str, Any]) -> str:
+        video_agent = get_video_agent()
+        video = error_handler.api_call_with_retry(
+            video_agent.generate_video,
+            content["text"],
+            self.age
+        )
+        if video.startswith(('http://', 'https://')):
+            # Return the remote URL now; the local copy is downloaded in the background
+            self.video_downloads.append(OutputManager.download_video_async(self.request_id, video))
+            return video
+        return OutputManager.save_video_output(self.request_id, video)
+
+    def build_graph(self) -> StageGraph:
+        # Only images depend on the labels; audio and video start as soon as content is ready
+        # Text and audio run on the fast lane, so queued video jobs never delay them
+        graph = StageGraph(max_workers=WORKFLOW_MAX_WORKERS, scheduler=get_scheduler())
+        graph.add_stage("content", self._generate_content, lane="fast")
+        graph.add_stage("labels", self._generate_labels, depends_on=["content"], lane="fast", priority=1)
+        if self.images_needed:
+            graph.add_stage("images", self._generate_images, depends_on=["content", "labels"], lane="image")
+        graph.add_stage("audio", self._generate_audio, depends_on=["content"], lane="fast", priority=1)
+        if self.video_needed:
+            graph.add_stage("video", self._generate_video, depends_on=["content"], lane="video")
+        return graph
+
+    def run(
+        self,
+        on_complete: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        on_start: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Run every stage and record the finished lesson.
+
+        Args:
+            on_complete (Optional[Callable]): Called with (name, result) as each stage settles
+            on_start (Optional[Callable]): Called with the stage name when a stage starts
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Per-stage results, as returned by StageGraph.run
+        """
+        # Every provider call in the graph shares one request deadline, and its spans share the request_id
+        with deadline(REQUEST_DEADLINE_SECONDS), trace(
+            self.request_id, age=self.age, images=self.images_needed, video=self.video_needed
+        ):
+            results = self.build_graph().run(on_complete=on_complete, on_start=on_start)
+        self._record(results)
+        logger.info(f"Completed generation workflow for request ID: {self.request_id}")
+        return results
+
+    def _record(self, results: Dict[str, Dict[str, Any]]) -> None:
+        record_lesson_results(
+            self.request_id, self.age, self.prompt,
+            {name: result["elapsed"] for name, result in results.items() if result["status"] == SUCCESS},
+            indexable=results["labels"]["status"] == SUCCESS and results["audio"]["status"] == SUCCESS
+        )
+
+    def wait_for_video(self, timeout: float = VIDEO_DOWNLOAD_WAIT_SECONDS) -> Optional[str]:
+        """Wait for the background video download and return the local path, or None if it is not ready."""
+        local_path = None
+        for download in self.video_downloads:
+            try:
+                local_path = download.result(timeout=timeout)
+            except Exception as e:
+                logger.warning(f"Keeping remote video URL for {self.request_id}: {str(e)}")
+        return local_path
+
+
+class MultiAgeLessonPipeline:
+    """One prompt rendered for several ages in a single pass.
+
+    The per-age lesson texts are requested from Mistral concurrently, one
+    request per age; a retry only asks again for the ages that failed. Work that
+    does not depend on the age is done once and shared: the topic labels, the
+    illustrations (generated from the youngest age's lesson, so they suit
+    every level) and the optional video. Only the text and the narration are
+    produced per age, and each age still gets its own request directory, so
+    catalogue reuse and bundles work as for a single lesson.
+    """
+
+    def __init__(self, ages: List[int], prompt: str, video_needed: bool = False, images_needed: bool = False):
+        self.ages = sorted({int(age) for age in ages})
+        if not self.ages:
+            raise ValueError("At least one age is required")
+        self.prompt = prompt
+        self.video_needed = video_needed
+        self.images_needed = images_needed
+        self.video_downloads: List[concurrent.futures.Future] = []
+        self.request_ids: Dict[int, str] = {}
+        for age in self.ages:
+            request_id = OutputManager.generate_request_id()
+            OutputManager.create_request_directory(request_id)
+            OutputManager.save_request_metadata(request_id, age, prompt)
+            self.request_ids[age] = request_id
+        logger.info(f"Starting multi-age generation for ages {self.ages}: {self.request_ids}")
+
+    def _generate_content(self) -> Dict[int, Dict[str, Any]]:
+        content_agent = get_content_agent()
+        lessons: Dict[int, Dict[str, Any]] = {}
+
+        def generate_missing() -> Dict[int, Dict[str, Any]]:
+            # Ages that succeeded on an earlier attempt are kept, not requested again
+            lessons.update(content_agent.generate_structured_batch(
+                [age for age in self.ages if age not in lessons], self.prompt
+            ))
+            failed = [age for age in self.ages if age not in lessons]
+            if failed:
+                raise RuntimeError(f"No lesson generated for ages {failed}")
+            return {age: lessons[age] for age in self.ages}
+
+        lessons = error_handler.api_call_with_retry(generate_missing)
+        contents = {}
+        for age, lesson in lessons.items():
+            text = content_agent.format_lesson(lesson)
+            answers = content_agent.format_answers(lesson)
+            # Saved here so every age keeps its text even if the labels stage fails
+            OutputManager.save_text_output(self.request_ids[age], text)
+            if answers:
+                OutputManager.save_answers_output(self.request_ids[age], answers)
+            contents[age] = {
+                "text": text,
+                "answers": answers,
+                "labels": lesson["hashtags"],
+                "image_prompts": lesson["image_prompts"],
+            }
+        return contents
+
+    def _generate_labels(self, contents: Dict[int, Dict[str, Any]]) -> List[str]:
+        # One label set for the topic, saved with every age's text
+        youngest = contents[self.ages[0]]
+        labels = merge_labels([content["labels"] for content in contents.values()])
+        labels = labels or generate_content_labels(youngest["text"])
+        formatted_labels = OutputManager.LABELS_SEPARATOR + ", ".join(labels)
+        for age, content in contents.items():
+            OutputManager.save_text_output(self.request_ids[age], content["text"] + formatted_labels)
+        return labels
+
+    def _generate_images(self, contents: Dict[int, Dict[str, Any]], labels: List[str]) -> Dict[int, List[str]]:
+        # Generate the illustrations once; each age's directory gets its own encoded copies
+        youngest = self.ages[0]
+        image_prompts = next((c["image_prompts"] for c in contents.values() if c["image_prompts"]), None)
+        images = error_handler.api_call_with_retry(
+            get_image_agent().generate_images,
+            contents[youngest]["text"],
+            youngest,
+            labels,
+            image_prompts
+        )
+        return {age: OutputManager.save_images_output(self.request_ids[age], images) for age in self.ages}
+
+    def _audio_stage(self, age: int) -> Callable[[Dict[int, Dict[str, Any]]], str]:
+        def generate_audio(contents: Dict[int, Dict[str, Any]]) -> str:
+            request_id = self.request_ids[age]
+            chunks = get_audio_agent().stream_audio(contents[age]["text"], age)
+            for _ in OutputManager.stream_audio_output(request_id, chunks):
+                pass
+            return OutputManager.get_output_paths(request_id)['audio']
+        return generate_audio
+
+    def _generate_video(self, contents: Dict[int, Dict[str, Any]]) -> str:
+        youngest = self.ages[0]
+        video = error_handler.api_call_with_retry(
+            get_video_agent().generate_video,
+            contents[youngest]["text"],
+            youngest
+        )
+        first_request = self.request_ids[youngest]
+        if video.startswith(('http://', 'https://')):
+            # Downloaded once; wait_for_video copies it to the other ages
+            self.video_downloads.append(OutputManager.download_video_async(first_request, video))
+            return video
+        local_path = OutputManager.save_video_output(first_request, video)
+        for age in self.ages[1:]:
+            OutputManager.save_video_output(self.request_ids[age], local_path)
+        return local_path
+
+    def build_graph(self) -> StageGraph:
+        graph = StageGraph(max_workers=WORKFLOW_MAX_WORKERS, scheduler=get_scheduler())
+        graph.add_stage("content", self._generate_content, lane="fast")
+        graph.add_stage("labels", self._generate_labels, depends_on=["content"], lane="fast", priority=1)
+        if self.images_needed:
+            graph.add_stage("images", self._generate_images, depends_on=["content", "labels"], lane="image")
+        for age in self.ages:
+            graph.add_stage(f"audio:{age}", self._audio_stage(age), depends_on=["content"], lane="fast", priority=1)
+        if self.video_needed:
+            graph.add_stage("video", self._generate_video, depends_on=["content"], lane="video")
+        return graph
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Run every stage and group the results by age.
+
+        Returns:
+            Dict[str, Any]: prompt, ages, shared labels, per-stage status and a `lessons`
+            mapping of age to request_id, text, audio, images and video
+        """
+        # The shared stages are traced under the youngest age's request_id
+        with deadline(REQUEST_DEADLINE_SECONDS), trace(
+            self.request_ids[self.ages[0]], ages=self.ages, request_ids=self.request_ids,
+            images=self.images_needed, video=self.video_needed
+        ):
+            results = self.build_graph().run()
+
+        shared = ("content", "labels", "images", "video")
+        for age, request_id in self.request_ids.items():
+            timings = {
+                name: result["elapsed"] for name, result in results.items()
+                if result["status"] == SUCCESS and name in shared
+            }
+            audio = results[f"audio:{age}"]
+            if audio["status"] == SUCCESS:
+                timings["audio"] = audio["elapsed"]
+            record_lesson_results(
+                request_id, age, self.prompt, timings,
+                indexable=results["labels"]["status"] == SUCCESS and audio["status"] == SUCCESS
+            )
+        logger.info(f"Completed multi-age generation for ages {self.ages}")
+        return self.group(results)
+
+    def group(self, results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        def value(name: str) -> Any:
+            result = results.get(name)
+            return result["result"] if result and result["status"] == SUCCESS else None
+
+        contents = value("content") or {}
+        images = value("images") or {}
+        return {
+            "prompt": self.prompt,
+            "ages": self.ages,
+            "labels": value("labels") or [],
+            "stages": {
+                name: {"status": r["status"], "elapsed": r["elapsed"], "error": r["error"]}
+                for name, r in results.items()
+            },
+            "lessons": {
+                age: {
+                    "request_id": self.request_ids[age],
+                    "text": contents.get(age, {}).get("text"),
+                    "answers": contents.get(age, {}).get("answers", ""),
+                    "audio": value(f"audio:{age}"),
+                    "images": images.get(age, []),
+                    "video": value("video"),
+                }
+                for age in self.ages
+            },
+        }
+
+    def wait_for_video(self, timeout: float = VIDEO_DOWNLOAD_WAIT_SECONDS) -> Optional[str]:
+        """Wait for the shared video download and copy it into every age's directory."""
+        local_path = None
+        for download in self.video_downloads:
+            try:
+                local_path = download.result(timeout=timeout)
+            except Exception as e:
+                logger.warning(f"Shared video for {self.prompt!r} was not downloaded: {str(e)}")
+        if local_path:
+            for age in self.ages[1:]:
+                OutputManager.save_video_output(self.request_ids[age], local_path)
+        return local_path
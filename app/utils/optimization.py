@@ -1,15 +1,14 @@
 # utils/optimization.py
-from functools import lru_cache
-import concurrent.futures
 
 class GenerationOptimizer:
-    @lru_cache(maxsize=100)
-    def cached_text_generation(self, prompt: str) -> str:
-        return ContentAgent().generate_content(prompt)
+    def cached_text_generation(self, age: int, prompt: str) -> str:
+        # ContentAgent reads and writes the shared disk-backed LessonCache
+        from app.services.registry import get_content_agent
+        return get_content_agent().generate_content(age, prompt)
     
-    def parallel_image_generation(self, prompts: list) -> list:
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            return list(executor.map(
-                lambda p: ImageAgent().generate_image(p),
-                prompts
-            ))
+    def parallel_image_generation(self, text: str, age: int, keywords: list, max_workers: int = None) -> list:
+        # ImageAgent fans the keywords out across its own worker pool
+        from app.agents.image_agent import ImageAgent
+        from app.services.registry import get_image_agent
+        agent = ImageAgent(max_workers=max_workers) if max_workers else get_image_agent()
+        return agent.generate_images(text, age, keywords)
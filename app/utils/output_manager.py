@@ -1,17 +1,51 @@
 import os
+import json
+import time
 import string
 import random
-from typing import Dict, List
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional
 from pathlib import Path
 import shutil
-from PIL import Image
 import logging
+import threading
+import concurrent.futures
+
+from app.config import IMAGE_OUTPUT_FORMAT, IMAGE_OUTPUT_QUALITY, IMAGE_ENCODE_WORKERS, IMAGE_RENDITIONS
+from app.utils.telemetry import record_span, traced
+
+if TYPE_CHECKING:
+    from PIL import Image
 
 logger = logging.getLogger(__name__)
 
+IMAGE_EXTENSIONS = {'WEBP': 'webp', 'AVIF': 'avif', 'JPEG': 'jpg', 'PNG': 'png'}
+
+_encode_pool = None
+_encode_pool_lock = threading.Lock()
+
+def _get_encode_pool() -> concurrent.futures.ThreadPoolExecutor:
+    # Pillow releases the GIL while encoding, so images encode in parallel
+    global _encode_pool
+    with _encode_pool_lock:
+        if _encode_pool is None:
+            _encode_pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=IMAGE_ENCODE_WORKERS, thread_name_prefix="image-encode"
+            )
+        return _encode_pool
+
 class OutputManager:
     OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'outputs')
+    LABELS_SEPARATOR = "\n\nLabels: "
     
+    @staticmethod
+    def _update_catalogue(action: str, *args, **kwargs) -> None:
+        """Apply a catalogue update; failures are logged and never break the save itself."""
+        try:
+            from app.utils.catalogue import get_catalogue
+            getattr(get_catalogue(), action)(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Failed to update output catalogue ({action}): {str(e)}")
+
     @staticmethod
     def generate_request_id(length: int = 12) -> str:
         """Generate a random alphanumeric request ID."""
@@ -33,19 +67,42 @@ class OutputManager:
         return paths
     
     @staticmethod
+    @traced("save.text")
     def save_text_output(request_id: str, content: str) -> str:
         """Save text content to file."""
         output_path = os.path.join(OutputManager.OUTPUT_DIR, request_id, 'text', 'content.txt')
         try:
+            start = time.perf_counter()
             with open(output_path, 'w', encoding='utf-8') as f:
                 f.write(content)
             logger.info(f"Saved text content to {output_path}")
+            OutputManager._update_catalogue('record_asset', request_id, 'text', output_path, time.perf_counter() - start)
+            _, separator, labels = content.partition(OutputManager.LABELS_SEPARATOR)
+            if separator:
+                OutputManager._update_catalogue(
+                    'set_labels', request_id, [label.strip() for label in labels.split(',') if label.strip()]
+                )
             return output_path
         except Exception as e:
             logger.error(f"Failed to save text content: {str(e)}")
             raise
 
     @staticmethod
+    @traced("save.answers")
+    def save_answers_output(request_id: str, answers: str) -> str:
+        """Save the quiz answer key next to the lesson text."""
+        output_path = os.path.join(OutputManager.OUTPUT_DIR, request_id, 'text', 'answers.txt')
+        try:
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write(answers)
+            logger.info(f"Saved quiz answers to {output_path}")
+            return output_path
+        except Exception as e:
+            logger.error(f"Failed to save quiz answers: {str(e)}")
+            raise
+
+    @staticmethod
+    @traced("save.audio")
     def save_audio_output(request_id: str, audio_data: bytes) -> str:
         """Save audio content to file."""
         if audio_data is None:
@@ -58,44 +115,166 @@ class OutputManager:
             
         output_path = os.path.join(OutputManager.OUTPUT_DIR, request_id, 'audio', 'audio.mp3')
         try:
+            start = time.perf_counter()
             with open(output_path, 'wb') as f:
                 f.write(audio_data)
             logger.info(f"Saved audio content to {output_path}")
+            OutputManager._update_catalogue('record_asset', request_id, 'audio', output_path, time.perf_counter() - start)
             return output_path
         except Exception as e:
             logger.error(f"Failed to save audio content: {str(e)}")
             return ""
 
     @staticmethod
-    def save_images_output(request_id: str, images: List[Image.Image]) -> List[str]:
-        """Save multiple images to files."""
+    def stream_audio_output(request_id: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Write audio chunks to file as they arrive, passing each one through.
+
+        The save.audio span covers only the writes, not the time spent waiting for the TTS stream.
+        """
+        output_path = os.path.join(OutputManager.OUTPUT_DIR, request_id, 'audio', 'audio.mp3')
+        total_bytes = 0
+        write_seconds = 0.0
+        try:
+            start = time.perf_counter()
+            with open(output_path, 'wb') as f:
+                for chunk in chunks:
+                    write_start = time.perf_counter()
+                    f.write(chunk)
+                    f.flush()
+                    write_seconds += time.perf_counter() - write_start
+                    total_bytes += len(chunk)
+                    yield chunk
+            record_span("save.audio", write_seconds, bytes=total_bytes)
+            logger.info(f"Streamed {total_bytes} bytes of audio to {output_path}")
+            OutputManager._update_catalogue('record_asset', request_id, 'audio', output_path, time.perf_counter() - start)
+        except Exception as e:
+            record_span("save.audio", write_seconds, "error", bytes=total_bytes)
+            logger.error(f"Failed to stream audio content: {str(e)}")
+            raise
+
+    @staticmethod
+    def _encode_image(image: 'Image.Image', output_path: str, image_format: str, quality: int, max_size: int = 0) -> str:
+        """Encode one image in the configured codec, downscaled to fit `max_size` if given."""
+        if max_size and max(image.size) > max_size:
+            from PIL import Image as PILImage
+            image = image.copy()
+            image.thumbnail((max_size, max_size), PILImage.LANCZOS)
+        if image_format == 'PNG':
+            image.save(output_path, 'PNG', optimize=False)
+            return output_path
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(output_path, image_format, quality=quality)
+        return output_path
+
+    @staticmethod
+    @traced("save.images")
+    def save_images_output(
+        request_id: str,
+        images: List['Image.Image'],
+        image_format: str = IMAGE_OUTPUT_FORMAT,
+        quality: int = IMAGE_OUTPUT_QUALITY
+    ) -> List[str]:
+        """Save multiple images plus their smaller renditions, encoding them in parallel on the encode pool.
+
+        Returns the full-size paths; use `rendition_path` to get a smaller rendition of each.
+        """
+        from PIL import Image as PILImage
+        PILImage.init()
         output_dir = os.path.join(OutputManager.OUTPUT_DIR, request_id, 'images')
-        saved_paths = []
+        image_format = image_format.upper()
+        if image_format not in IMAGE_EXTENSIONS or image_format not in PILImage.SAVE:
+            logger.warning(f"Image format '{image_format}' is not available, using PNG")
+            image_format = 'PNG'
+        extension = IMAGE_EXTENSIONS[image_format]
         try:
-            for idx, image in enumerate(images):
-                output_path = os.path.join(output_dir, f'image_{idx}.png')
-                image.save(output_path, 'PNG')
-                saved_paths.append(output_path)
-            logger.info(f"Saved {len(saved_paths)} images to {output_dir}")
+            start = time.perf_counter()
+            futures = [
+                _get_encode_pool().submit(
+                    OutputManager._encode_image, image,
+                    os.path.join(output_dir, f'image_{idx}.{extension}'), image_format, quality
+                )
+                for idx, image in enumerate(images)
+            ]
+            rendition_futures = {
+                rendition: [
+                    _get_encode_pool().submit(
+                        OutputManager._encode_image, image,
+                        os.path.join(output_dir, f'image_{idx}_{rendition}.{extension}'), image_format, quality, max_size
+                    )
+                    for idx, image in enumerate(images)
+                ]
+                for rendition, max_size in IMAGE_RENDITIONS.items()
+            }
+            saved_paths = [future.result() for future in futures]
+            rendition_paths = {
+                rendition: [future.result() for future in pending]
+                for rendition, pending in rendition_futures.items()
+            }
+            logger.info(f"Saved {len(saved_paths)} {image_format} images with {', '.join(IMAGE_RENDITIONS)} renditions to {output_dir}")
+            elapsed = time.perf_counter() - start
+            OutputManager._update_catalogue('replace_assets', request_id, 'images', saved_paths, elapsed)
+            for rendition, paths in rendition_paths.items():
+                OutputManager._update_catalogue('replace_assets', request_id, f'images_{rendition}', paths, elapsed)
             return saved_paths
         except Exception as e:
             logger.error(f"Failed to save images: {str(e)}")
             raise
 
     @staticmethod
+    def rendition_path(image_path: str, rendition: str) -> str:
+        """Path of a smaller rendition ('thumb', 'medium') of a saved image; falls back to the full image."""
+        if rendition not in IMAGE_RENDITIONS:
+            return image_path
+        root, extension = os.path.splitext(image_path)
+        path = f"{root}_{rendition}{extension}"
+        return path if os.path.exists(path) else image_path
+
+    @staticmethod
+    def download_video_async(request_id: str, video_url: str) -> concurrent.futures.Future:
+        """Download a remote video into the request's video folder in the background.
+
+        The returned future resolves to the local path once the file is complete and verified.
+        """
+        from app.utils.downloader import download_in_background
+        output_path = os.path.join(OutputManager.OUTPUT_DIR, request_id, 'video', 'video.mp4')
+        OutputManager._update_catalogue('record_asset', request_id, 'video_url', video_url)
+        start = time.perf_counter()
+
+        def on_done(future: concurrent.futures.Future) -> None:
+            # Finishes on the download pool, outside the request's context
+            record_span(
+                "download.video", time.perf_counter() - start,
+                "ok" if future.exception() is None else "error", request_id=request_id
+            )
+            if future.exception() is None:
+                OutputManager._update_catalogue('record_asset', request_id, 'video', output_path, time.perf_counter() - start)
+            else:
+                logger.error(f"Background video download failed for {request_id}: {str(future.exception())}")
+
+        future = download_in_background(video_url, output_path)
+        future.add_done_callback(on_done)
+        return future
+
+    @staticmethod
+    @traced("save.video")
     def save_video_output(request_id: str, video_url: str) -> str:
-        """Save video content from URL or copy from local path."""
+        """Save video content from URL or copy from local path.
+
+        Remote URLs are returned immediately while the download continues in the background.
+        """
         output_path = os.path.join(OutputManager.OUTPUT_DIR, request_id, 'video', 'video.mp4')
         try:
             if video_url.startswith(('http://', 'https://')):
-                # For video URLs, you might want to implement download logic here
-                # This is a placeholder for the actual implementation
-                logger.info(f"Video URL saved: {video_url}")
+                OutputManager.download_video_async(request_id, video_url)
+                logger.info(f"Video URL saved, downloading in background: {video_url}")
                 return video_url
             else:
                 # For local files, copy to output directory
+                start = time.perf_counter()
                 shutil.copy2(video_url, output_path)
                 logger.info(f"Saved video content to {output_path}")
+                OutputManager._update_catalogue('record_asset', request_id, 'video', output_path, time.perf_counter() - start)
                 return output_path
         except Exception as e:
             logger.error(f"Failed to save video content: {str(e)}")
@@ -107,7 +286,60 @@ class OutputManager:
         base_dir = os.path.join(OutputManager.OUTPUT_DIR, request_id)
         return {
             'text': os.path.join(base_dir, 'text', 'content.txt'),
+            'answers': os.path.join(base_dir, 'text', 'answers.txt'),
             'audio': os.path.join(base_dir, 'audio', 'audio.mp3'),
             'images': os.path.join(base_dir, 'images'),
             'video': os.path.join(base_dir, 'video', 'video.mp4')
         }
+
+    @staticmethod
+    def save_request_metadata(request_id: str, age: int, prompt: str) -> str:
+        """Record the age and prompt a request was generated for."""
+        output_path = os.path.join(OutputManager.OUTPUT_DIR, request_id, 'metadata.json')
+        try:
+            created_at = time.time()
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump({'request_id': request_id, 'age': int(age), 'prompt': prompt, 'created_at': created_at}, f)
+            OutputManager._update_catalogue('record_lesson', request_id, age, prompt, created_at)
+            return output_path
+        except Exception as e:
+            logger.error(f"Failed to save request metadata: {str(e)}")
+            raise
+
+    @staticmethod
+    def load_request_metadata(request_id: str) -> Optional[Dict[str, Any]]:
+        """Return the stored metadata for a request, or None if it has none."""
+        metadata_path = os.path.join(OutputManager.OUTPUT_DIR, request_id, 'metadata.json')
+        if not os.path.exists(metadata_path):
+            return None
+        with open(metadata_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def load_lesson(request_id: str) -> Optional[Dict[str, Any]]:
+        """Load a stored lesson's text, labels and media paths for reuse."""
+        paths = OutputManager.get_output_paths(request_id)
+        if not os.path.exists(paths['text']):
+            return None
+        with open(paths['text'], encoding='utf-8') as f:
+            content, _, labels = f.read().partition(OutputManager.LABELS_SEPARATOR)
+        answers = ''
+        if os.path.exists(paths['answers']):
+            with open(paths['answers'], encoding='utf-8') as f:
+                answers = f.read()
+        images = []
+        if os.path.isdir(paths['images']):
+            renditions = tuple(f'_{rendition}' for rendition in IMAGE_RENDITIONS)
+            images = sorted(
+                os.path.join(paths['images'], name) for name in os.listdir(paths['images'])
+                if name.startswith('image_') and not os.path.splitext(name)[0].endswith(renditions)
+            )
+        return {
+            'request_id': request_id,
+            'content': content,
+            'answers': answers,
+            'labels': [label.strip() for label in labels.split(',') if label.strip()],
+            'audio': paths['audio'] if os.path.exists(paths['audio']) else '',
+            'images': images,
+            'video': paths['video'] if os.path.exists(paths['video']) else '',
+        }
@@ -0,0 +1,190 @@
+# utils/rate_limiter.py
+import os
+import time
+import uuid
+import sqlite3
+import logging
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.config import RATE_LIMIT_ENABLED, RATE_LIMIT_PATH, RATE_LIMIT_LEASE_SECONDS, RATE_LIMITS
+from app.services.registry import ServiceRegistry
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on one back-off sleep, so freed in-flight slots are noticed quickly
+MAX_POLL_SECONDS = 0.25
+SLOW_WAIT_SECONDS = 1.0
+
+
+class RateLimitTimeout(TimeoutError):
+    """Raised when a caller's timeout runs out while waiting for the limiter."""
+
+
+class RateLimiter:
+    """Token-bucket and max-in-flight limits per provider, shared by every process on the host.
+
+    Bucket levels and in-flight slots live in a SQLite database, so separate
+    app, batch and worker processes draw from the same quota. A caller over
+    the limit is not failed: it sleeps until a token or slot frees up. Time
+    spent waiting is recorded per limit key in the same database.
+    """
+
+    def __init__(
+        self,
+        path: str = RATE_LIMIT_PATH,
+        limits: Dict[str, Dict[str, float]] = RATE_LIMITS,
+        lease_seconds: int = RATE_LIMIT_LEASE_SECONDS
+    ):
+        self.path = path
+        self.limits = limits
+        self.lease_seconds = lease_seconds
+        Path(os.path.dirname(path)).mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases (lease_id TEXT NOT NULL, key TEXT NOT NULL, "
+                "acquired_at REAL NOT NULL, PRIMARY KEY (lease_id, key))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS waits (key TEXT PRIMARY KEY, acquisitions INTEGER NOT NULL, "
+                "waited INTEGER NOT NULL, total_seconds REAL NOT NULL, max_seconds REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Autocommit mode so each acquisition can take the write lock up front with BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _keys(self, provider: str, endpoint: Optional[str]) -> List[str]:
+        keys = [provider] if provider in self.limits else []
+        if endpoint and f"{provider}:{endpoint}" in self.limits:
+            keys.append(f"{provider}:{endpoint}")
+        return keys
+
+    def _try_acquire(self, conn: sqlite3.Connection, keys: List[str], lease_id: str) -> float:
+        """Take a token and a slot for every key atomically. Returns 0 on success, else seconds to wait."""
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM leases WHERE acquired_at < ?", (now - self.lease_seconds,))
+            wait = 0.0
+            levels = {}
+            for key in keys:
+                rps = float(self.limits[key].get("rps") or 0)
+                max_in_flight = int(self.limits[key].get("max_in_flight") or 0)
+                if rps:
+                    burst = max(1.0, rps)
+                    row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+                    tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rps)
+                    levels[key] = tokens
+                    if tokens < 1:
+                        wait = max(wait, (1 - tokens) / rps)
+                if max_in_flight:
+                    in_flight = conn.execute("SELECT COUNT(*) FROM leases WHERE key = ?", (key,)).fetchone()[0]
+                    if in_flight >= max_in_flight:
+                        wait = max(wait, MAX_POLL_SECONDS)
+
+            if wait == 0:
+                for key in keys:
+                    if key in levels:
+                        conn.execute(
+                            "INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                            (key, levels[key] - 1, now)
+                        )
+                    if self.limits[key].get("max_in_flight"):
+                        conn.execute("INSERT INTO leases (lease_id, key, acquired_at) VALUES (?, ?, ?)", (lease_id, key, now))
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _record_wait(self, keys: List[str], waited: float, slept: bool) -> None:
+        with self._connect() as conn:
+            for key in keys:
+                conn.execute(
+                    "INSERT INTO waits (key, acquisitions, waited, total_seconds, max_seconds) VALUES (?, 1, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET acquisitions = acquisitions + 1, waited = waited + excluded.waited, "
+                    "total_seconds = total_seconds + excluded.total_seconds, "
+                    "max_seconds = MAX(max_seconds, excluded.max_seconds)",
+                    (key, 1 if slept else 0, waited, waited)
+                )
+
+    def acquire(self, provider: str, endpoint: Optional[str] = None, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Block until the provider (and endpoint) limits admit one more call.
+
+        Args:
+            provider (str): Provider name, e.g. 'mistral'
+            endpoint (Optional[str]): Model or endpoint name for endpoint-specific limits
+            timeout (Optional[float]): Give up after this many seconds
+
+        Returns:
+            Optional[str]: Lease id to pass to release(), or None when no limit applies
+
+        Raises:
+            RateLimitTimeout: If the timeout runs out first
+        """
+        keys = self._keys(provider, endpoint) if RATE_LIMIT_ENABLED else []
+        if not keys:
+            return None
+        lease_id = uuid.uuid4().hex
+        start = time.monotonic()
+        slept = False
+        with self._connect() as conn:
+            while True:
+                wait = self._try_acquire(conn, keys, lease_id)
+                if wait == 0:
+                    break
+                waited = time.monotonic() - start
+                if timeout is not None and waited + min(wait, MAX_POLL_SECONDS) > timeout:
+                    raise RateLimitTimeout(f"Timed out after {waited:.1f}s waiting for the {provider} rate limit")
+                time.sleep(min(wait, MAX_POLL_SECONDS))
+                slept = True
+
+        waited = time.monotonic() - start
+        if waited >= SLOW_WAIT_SECONDS:
+            logger.info(f"Waited {waited:.2f}s for the {', '.join(keys)} rate limit")
+        try:
+            self._record_wait(keys, waited, slept)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to record rate limiter wait: {str(e)}")
+        return lease_id
+
+    def release(self, lease_id: Optional[str]) -> None:
+        """Free the in-flight slots held by a lease."""
+        if lease_id is None:
+            return
+        with self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE lease_id = ?", (lease_id,))
+
+    @contextmanager
+    def slot(self, provider: str, endpoint: Optional[str] = None, timeout: Optional[float] = None) -> Iterator[None]:
+        """Hold a rate-limited slot for the duration of the block."""
+        lease_id = self.acquire(provider, endpoint, timeout)
+        try:
+            yield
+        finally:
+            self.release(lease_id)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-key acquisitions, how many had to wait, total and max wait seconds, and current in-flight count."""
+        with self._connect() as conn:
+            stats = {
+                row[0]: {"acquisitions": row[1], "waited": row[2], "total_wait_seconds": row[3], "max_wait_seconds": row[4]}
+                for row in conn.execute("SELECT key, acquisitions, waited, total_seconds, max_seconds FROM waits")
+            }
+            for key, in_flight in conn.execute("SELECT key, COUNT(*) FROM leases GROUP BY key"):
+                stats.setdefault(key, {})["in_flight"] = in_flight
+        return stats
+
+
+def get_rate_limiter() -> RateLimiter:
+    return ServiceRegistry.get('rate_limiter', RateLimiter)
@@ -0,0 +1,279 @@
+# utils/resilience.py
+import time
+import inspect
+import logging
+import threading
+import contextvars
+import concurrent.futures
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from app.config import BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS, HEDGE_WORKERS
+from app.services.registry import ServiceRegistry
+from app.utils.rate_limiter import RateLimitTimeout, get_rate_limiter
+from app.utils.telemetry import increment
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ("mistral", "elevenlabs", "fal")
+
+# Breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the current request has run out of time."""
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Bound everything run in this context (and copied contexts) to `seconds` from now.
+
+    A nested deadline can only shorten the one already in effect.
+    """
+    if not seconds:
+        yield
+        return
+    expires = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(expires if current is None else min(current, expires))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None when there is none."""
+    expires = _deadline.get()
+    return None if expires is None else expires - time.monotonic()
+
+
+def check_deadline() -> None:
+    """Raise DeadlineExceeded if the current deadline has passed."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+def bounded_timeout(timeout: float) -> float:
+    """Shorten a per-call timeout so it never outlives the current deadline."""
+    check_deadline()
+    left = remaining()
+    return timeout if left is None else min(timeout, left)
+
+
+class CircuitBreaker:
+    """Stop calling a provider that keeps failing, then probe it again after a pause.
+
+    After `failure_threshold` consecutive failures the breaker opens and calls
+    fail immediately with CircuitOpenError instead of tying up a worker. Once
+    `reset_seconds` have passed a single probe call is let through; its
+    outcome closes or re-opens the breaker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = BREAKER_RESET_SECONDS
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Admit a call or raise CircuitOpenError."""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._state = HALF_OPEN
+                logger.info(f"Circuit breaker '{self.name}' half-open, probing provider")
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            self._rejected += 1
+        raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit breaker '{self.name}' closed")
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(f"Circuit breaker '{self.name}' opened after {self._failures} failures")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Settle an admitted call that ended without a verdict on the provider (e.g. our own deadline)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def state(self) -> Dict[str, Any]:
+        """Current state, consecutive failures and calls rejected while open."""
+        with self._lock:
+            state = self._state
+            if state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                state = HALF_OPEN
+            return {"state": state, "failures": self._failures, "rejected": self._rejected}
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    return ServiceRegistry.get(f'breaker.{provider}', lambda: CircuitBreaker(provider))
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Export the state of every provider breaker."""
+    return {provider: get_breaker(provider).state() for provider in PROVIDERS}
+
+
+def _get_hedge_pool() -> concurrent.futures.ThreadPoolExecutor:
+    return ServiceRegistry.get(
+        'hedge_pool',
+        lambda: concurrent.futures.ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+    )
+
+
+def hedged(func: Callable, *args, hedge_after: float, **kwargs) -> Any:
+    """
+    Call `func`, starting one duplicate call if the first has not returned after `hedge_after` seconds.
+
+    Args:
+        func (Callable): Idempotent provider call
+        hedge_after (float): Seconds to wait before sending the duplicate
+
+    Returns:
+        Any: The result of whichever call succeeds first
+    """
+    pool = _get_hedge_pool()
+    futures = [pool.submit(contextvars.copy_context().run, func, *args, **kwargs)]
+    done, _ = concurrent.futures.wait(futures, timeout=min(hedge_after, remaining() or hedge_after))
+    if not done:
+        check_deadline()
+        logger.info(f"Hedging slow call to {getattr(func, '__qualname__', func)} after {hedge_after:.1f}s")
+        increment("edubytes_hedged_calls_total")
+        futures.append(pool.submit(contextvars.copy_context().run, func, *args, **kwargs))
+
+    error = None
+    pending = set(futures)
+    while pending:
+        done, pending = concurrent.futures.wait(
+            pending, timeout=remaining(), return_when=concurrent.futures.FIRST_COMPLETED
+        )
+        if not done:
+            raise DeadlineExceeded("Request deadline exceeded")
+        for future in done:
+            try:
+                return future.result()
+            except Exception as e:
+                error = e
+    raise error
+
+
+def _rate_limited(provider: str, endpoint: Optional[str], func: Callable) -> Callable:
+    @wraps(func)
+    def limited(*args, **kwargs):
+        # Wait for quota rather than fail, but never past the deadline
+        with get_rate_limiter().slot(provider, endpoint, timeout=remaining()):
+            return func(*args, **kwargs)
+    return limited
+
+
+def _admit(provider: str) -> CircuitBreaker:
+    """Check the deadline and the provider's breaker, counting rejected calls."""
+    breaker = get_breaker(provider)
+    check_deadline()
+    try:
+        breaker.before_call()
+    except CircuitOpenError:
+        increment("edubytes_provider_calls_total", provider=provider, outcome="rejected")
+        raise
+    return breaker
+
+
+def call(
+    provider: str,
+    func: Callable,
+    *args,
+    endpoint: Optional[str] = None,
+    hedge_after: float = 0.0,
+    **kwargs
+) -> Any:
+    """Call `func` through the provider's breaker and rate limiter, within the current deadline, optionally hedged."""
+    breaker = _admit(provider)
+    limited = _rate_limited(provider, endpoint, func)
+    try:
+        result = hedged(limited, *args, hedge_after=hedge_after, **kwargs) if hedge_after else limited(*args, **kwargs)
+    except (DeadlineExceeded, RateLimitTimeout):
+        breaker.release()
+        increment("edubytes_provider_calls_total", provider=provider, outcome="timeout")
+        raise
+    except Exception:
+        breaker.record_failure()
+        increment("edubytes_provider_calls_total", provider=provider, outcome="failure")
+        raise
+    breaker.record_success()
+    increment("edubytes_provider_calls_total", provider=provider, outcome="success")
+    return result
+
+
+def stream(provider: str, chunks: Iterator[Any], endpoint: Optional[str] = None) -> Iterator[Any]:
+    """Relay a provider stream through its breaker, holding a rate-limited slot and checking the deadline between chunks."""
+    breaker = _admit(provider)
+    try:
+        with get_rate_limiter().slot(provider, endpoint, timeout=remaining()):
+            for chunk in chunks:
+                check_deadline()
+                yield chunk
+    except (DeadlineExceeded, RateLimitTimeout, GeneratorExit) as e:
+        breaker.release()
+        outcome = "cancelled" if isinstance(e, GeneratorExit) else "timeout"
+        increment("edubytes_provider_calls_total", provider=provider, outcome=outcome)
+        raise
+    except Exception:
+        breaker.record_failure()
+        increment("edubytes_provider_calls_total", provider=provider, outcome="failure")
+        raise
+    breaker.record_success()
+    increment("edubytes_provider_calls_total", provider=provider, outcome="success")
+
+
+def resilient(provider: str, endpoint: Optional[str] = None, hedge_after: float = 0.0) -> Callable:
+    """Decorator form of `call` (or `stream` for generator functions)."""
+    def decorator(func: Callable) -> Callable:
+        if inspect.isgeneratorfunction(func):
+            @wraps(func)
+            def stream_wrapper(*args, **kwargs):
+                return stream(provider, func(*args, **kwargs), endpoint=endpoint)
+            return stream_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return call(provider, func, *args, endpoint=endpoint, hedge_after=hedge_after, **kwargs)
+        return wrapper
+    return decorator
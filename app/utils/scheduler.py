@@ -0,0 +1,128 @@
+# utils/scheduler.py
+import queue
+import logging
+import itertools
+import threading
+import concurrent.futures
+from typing import Any, Callable, Dict, Optional
+
+from app.config import SCHEDULER_LANES
+from app.services.registry import ServiceRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a lane's queue is at capacity and a job is refused."""
+
+
+class JobScheduler:
+    """Priority job queues with a separate worker pool per lane.
+
+    Fast work (text, audio) and slow work (images, video) run on different
+    worker threads, so a backlog of video jobs never occupies the workers a
+    text-only lesson needs. Each lane has a bounded queue: once it is full,
+    new jobs are refused with QueueFullError instead of waiting indefinitely.
+    Within a lane, jobs run in order of their request's arrival, so a burst of
+    new requests never delays the remaining stages of lessons already in
+    progress; jobs of one request run by priority, lower numbers first.
+    """
+
+    def __init__(self, lanes: Dict[str, Dict[str, int]] = SCHEDULER_LANES):
+        self._lanes: Dict[str, Dict[str, Any]] = {}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        for name, settings in lanes.items():
+            lane = {
+                "queue": queue.PriorityQueue(maxsize=settings["max_queue"]),
+                "workers": settings["workers"],
+                "max_queue": settings["max_queue"],
+                "running": 0,
+                "completed": 0,
+                "rejected": 0,
+            }
+            self._lanes[name] = lane
+            for i in range(settings["workers"]):
+                threading.Thread(target=self._worker, args=(name,), name=f"{name}-worker-{i}", daemon=True).start()
+
+    def _worker(self, lane_name: str) -> None:
+        lane = self._lanes[lane_name]
+        while True:
+            _, _, _, future, func, args, kwargs = lane["queue"].get()
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                with self._lock:
+                    lane["running"] += 1
+                try:
+                    future.set_result(func(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+                finally:
+                    with self._lock:
+                        lane["running"] -= 1
+                        lane["completed"] += 1
+            finally:
+                lane["queue"].task_done()
+
+    def arrival(self) -> int:
+        """Ticket for a new request; pass it to submit so its jobs queue behind earlier requests'."""
+        return next(self._sequence)
+
+    def submit(
+        self,
+        lane: str,
+        func: Callable,
+        *args,
+        priority: int = 0,
+        arrival: Optional[int] = None,
+        **kwargs
+    ) -> concurrent.futures.Future:
+        """
+        Queue a job on a lane.
+
+        Args:
+            lane (str): Lane name, e.g. 'fast', 'image' or 'video'
+            func (Callable): Job to run on one of the lane's workers
+            priority (int): Lower values run first among jobs with the same arrival
+            arrival (Optional[int]): Ticket from arrival(); jobs of earlier requests run first.
+                Defaults to a fresh ticket, i.e. the job is treated as a new request
+
+        Returns:
+            concurrent.futures.Future: Resolves with the job's result
+
+        Raises:
+            QueueFullError: If the lane's queue is at capacity
+        """
+        if lane not in self._lanes:
+            raise ValueError(f"Unknown scheduler lane '{lane}'")
+        future = concurrent.futures.Future()
+        sequence = next(self._sequence)
+        entry = (sequence if arrival is None else arrival, priority, sequence, future, func, args, kwargs)
+        try:
+            self._lanes[lane]["queue"].put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self._lanes[lane]["rejected"] += 1
+            logger.warning(f"Rejected job on lane '{lane}': queue is full ({self._lanes[lane]['max_queue']})")
+            raise QueueFullError(f"The {lane} queue is full, please try again later")
+        return future
+
+    def queue_depths(self) -> Dict[str, Dict[str, int]]:
+        """Return queued, running, completed and rejected job counts per lane."""
+        with self._lock:
+            return {
+                name: {
+                    "queued": lane["queue"].qsize(),
+                    "running": lane["running"],
+                    "workers": lane["workers"],
+                    "max_queue": lane["max_queue"],
+                    "completed": lane["completed"],
+                    "rejected": lane["rejected"],
+                }
+                for name, lane in self._lanes.items()
+            }
+
+
+def get_scheduler() -> JobScheduler:
+    return ServiceRegistry.get('scheduler', JobScheduler)
@@ -0,0 +1,216 @@
+# utils/semantic_index.py
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from app.config import EMBEDDING_MODEL, SEMANTIC_REUSE_THRESHOLD
+from app.services.registry import ServiceRegistry
+from app.utils.cache import LessonCache
+from app.utils.output_manager import OutputManager
+from app.utils.catalogue import get_catalogue
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def get_embedding_model():
+    """Shared sentence_transformers model, loaded on first use."""
+    def load():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(EMBEDDING_MODEL)
+    return ServiceRegistry.get('embedding_model', load)
+
+
+class SemanticLessonIndex:
+    """Vector index over earlier lessons in outputs/ for near-duplicate reuse.
+
+    Each lesson is stored as a normalized prompt embedding plus its age, so a
+    lookup is one matrix-vector product restricted to lessons for the same
+    age. The index is persisted next to the outputs and reloaded whenever
+    another process has written a newer copy. The UI, batch runs and workers
+    share it, so reads and read-append-writes hold a file lock as well as the
+    in-process lock. A missing index is rebuilt on a background thread (or
+    with `python -m app.utils.semantic_index --rebuild`), never inside a
+    lookup.
+    """
+
+    def __init__(self, output_dir: str = OutputManager.OUTPUT_DIR, threshold: float = SEMANTIC_REUSE_THRESHOLD):
+        self.output_dir = output_dir
+        self.threshold = threshold
+        self.index_dir = os.path.join(output_dir, '.index')
+        self.embeddings_path = os.path.join(self.index_dir, 'semantic.npy')
+        self.entries_path = os.path.join(self.index_dir, 'semantic.json')
+        self.lock_path = os.path.join(self.index_dir, 'semantic.lock')
+        self._embeddings = np.zeros((0, 0), dtype=np.float32)
+        self._request_ids: List[str] = []
+        self._ages = np.zeros(0, dtype=np.int32)
+        self._loaded_mtime: Optional[float] = None
+        self._lock = threading.RLock()
+        self._rebuilding = False
+
+    def _embed(self, prompts: List[str]) -> np.ndarray:
+        texts = [LessonCache.normalize_prompt(p) for p in prompts]
+        vectors = get_embedding_model().encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        """Hold the in-process lock and a shared (read) or exclusive (write) lock on the index files."""
+        with self._lock:
+            Path(self.index_dir).mkdir(parents=True, exist_ok=True)
+            with open(self.lock_path, 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _ensure_loaded(self) -> None:
+        """Reload the index if another process saved a newer copy. Call with the file lock held."""
+        if not os.path.exists(self.entries_path):
+            if self._loaded_mtime is None:
+                self._rebuild_in_background()
+            return
+        mtime = os.path.getmtime(self.entries_path)
+        if mtime == self._loaded_mtime:
+            return
+        with open(self.entries_path, encoding='utf-8') as f:
+            entries = json.load(f)
+        embeddings = np.load(self.embeddings_path) if entries else np.zeros((0, 0), dtype=np.float32)
+        if len(embeddings) != len(entries):
+            # Written without the lock by an older version; a wrong pairing would serve the wrong lesson
+            logger.error(f"Semantic index has {len(embeddings)} vectors for {len(entries)} lessons, rebuilding")
+            self._loaded_mtime = mtime
+            self._rebuild_in_background()
+            return
+        self._embeddings = embeddings
+        self._request_ids = [e['request_id'] for e in entries]
+        self._ages = np.array([e['age'] for e in entries], dtype=np.int32)
+        self._loaded_mtime = mtime
+
+    def _save(self) -> None:
+        """Write the vectors and entry list. Call with the exclusive file lock held."""
+        entries = [{'request_id': r, 'age': int(a)} for r, a in zip(self._request_ids, self._ages)]
+        tmp_path = self.embeddings_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, self._embeddings)
+        os.replace(tmp_path, self.embeddings_path)
+        tmp_path = self.entries_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.entries_path)
+        self._loaded_mtime = os.path.getmtime(self.entries_path)
+
+    def _rebuild_in_background(self) -> None:
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def run():
+            try:
+                self.rebuild()
+            except Exception as e:
+                logger.error(f"Background semantic index rebuild failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._rebuilding = False
+
+        threading.Thread(target=run, name="semantic-index-rebuild", daemon=True).start()
+
+    def rebuild(self) -> int:
+        """Re-embed every catalogued lesson that has saved text. Returns the lesson count."""
+        # The catalogue lists every lesson with saved text without walking outputs/
+        metadata = list(get_catalogue().iter_prompts('text'))
+        # Embedding the whole catalogue is slow, so it happens before taking any lock
+        embeddings = self._embed([m['prompt'] for m in metadata]) if metadata else np.zeros((0, 0), dtype=np.float32)
+        with self._locked(exclusive=True):
+            # Keep lessons another writer added while the catalogue was being embedded
+            if os.path.exists(self.entries_path):
+                self._loaded_mtime = None
+                self._ensure_loaded()
+            known = {m['request_id'] for m in metadata}
+            extra = [i for i, request_id in enumerate(self._request_ids) if request_id not in known]
+            self._request_ids = [m['request_id'] for m in metadata] + [self._request_ids[i] for i in extra]
+            self._ages = np.concatenate([
+                np.array([m['age'] for m in metadata], dtype=np.int32), self._ages[extra]
+            ]).astype(np.int32)
+            if extra:
+                embeddings = self._embeddings[extra] if embeddings.size == 0 else np.vstack([embeddings, self._embeddings[extra]])
+            self._embeddings = embeddings
+            self._save()
+        logger.info(f"Rebuilt semantic lesson index with {len(self._request_ids)} lessons")
+        return len(self._request_ids)
+
+    def add(self, request_id: str, age: int, prompt: str) -> None:
+        """Add a finished lesson to the index."""
+        vector = self._embed([prompt])
+        # Reload, append and save under one exclusive lock, so concurrent writers never drop an entry
+        with self._locked(exclusive=True):
+            self._ensure_loaded()
+            self._embeddings = vector if self._embeddings.size == 0 else np.vstack([self._embeddings, vector])
+            self._request_ids.append(request_id)
+            self._ages = np.append(self._ages, np.int32(age))
+            self._save()
+
+    def lookup(self, age: int, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a stored lesson for the same age whose prompt is close enough to reuse.
+
+        Args:
+            age (int): Target age; only lessons for exactly this age are considered
+            prompt (str): Incoming lesson prompt
+
+        Returns:
+            Optional[Dict[str, Any]]: The stored lesson (see OutputManager.load_lesson) plus its
+            similarity score, or None when nothing passes the threshold
+        """
+        with self._locked(exclusive=False):
+            self._ensure_loaded()
+            candidates = np.flatnonzero(self._ages == int(age))
+            if candidates.size == 0:
+                return None
+            embeddings = self._embeddings[candidates]
+            request_ids = [self._request_ids[i] for i in candidates]
+
+        scores = embeddings @ self._embed([prompt])[0]
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        if score < self.threshold:
+            logger.info(f"No semantic match for '{prompt}' (best score {score:.3f})")
+            return None
+
+        lesson = OutputManager.load_lesson(request_ids[best])
+        if lesson is None:
+            return None
+        lesson['score'] = score
+        logger.info(f"Reusing lesson {lesson['request_id']} for '{prompt}' (score {score:.3f})")
+        return lesson
+
+
+def get_semantic_index() -> SemanticLessonIndex:
+    return ServiceRegistry.get('semantic_index', SemanticLessonIndex)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Semantic lesson index for near-duplicate reuse")
+    parser.add_argument("--rebuild", action="store_true", help="Re-embed every catalogued lesson")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.rebuild:
+        print(f"Indexed {get_semantic_index().rebuild()} lessons")
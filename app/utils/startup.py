@@ -0,0 +1,72 @@
+# utils/startup.py
+import re
+import sys
+import time
+import logging
+import subprocess
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Module whose import cost is what a fresh replica pays before serving
+STARTUP_MODULE = "app.ui.interface"
+
+_IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile_imports(module: str = STARTUP_MODULE) -> Dict[str, object]:
+    """
+    Import `module` in a fresh interpreter with -X importtime.
+
+    Args:
+        module (str): Dotted module path to import
+
+    Returns:
+        Dict[str, object]: wall-clock seconds for the cold import and per-module
+        self/cumulative import times in seconds, slowest first
+    """
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True
+    )
+    wall_time = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed: {completed.stderr.strip().splitlines()[-1:]}")
+
+    modules: List[Dict[str, object]] = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match:
+            modules.append({
+                "module": match.group(4),
+                "self": int(match.group(1)) / 1e6,
+                "cumulative": int(match.group(2)) / 1e6,
+                "depth": len(match.group(3)) // 2,
+            })
+    modules.sort(key=lambda m: m["cumulative"], reverse=True)
+    return {"module": module, "wall_time": wall_time, "modules": modules}
+
+
+def format_report(profile: Dict[str, object], limit: int = 25) -> str:
+    """Render a profile as a table of the slowest imports."""
+    lines = [
+        f"Cold import of {profile['module']}: {profile['wall_time']:.2f}s wall clock",
+        f"{'cumulative':>11} {'self':>9}  module",
+    ]
+    for entry in profile["modules"][:limit]:
+        lines.append(f"{entry['cumulative']:>10.3f}s {entry['self']:>8.3f}s  {entry['module']}")
+    return "\n".join(lines)
+
+
+def check_startup_budget(budget_seconds: float, module: str = STARTUP_MODULE) -> bool:
+    """Return True if a cold import of `module` fits within the budget."""
+    profile = profile_imports(module)
+    within_budget = profile["wall_time"] <= budget_seconds
+    if within_budget:
+        logger.info(f"Startup took {profile['wall_time']:.2f}s (budget {budget_seconds:.2f}s)")
+    else:
+        logger.error(f"Startup took {profile['wall_time']:.2f}s, over the {budget_seconds:.2f}s budget")
+        logger.error(format_report(profile, limit=10))
+    return within_budget
@@ -0,0 +1,341 @@
+# utils/telemetry.py
+import json
+import time
+import uuid
+import inspect
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.config import METRICS_HOST, METRICS_PORT, TRACE_MAX_REQUESTS, POSTHOG_API_KEY, POSTHOG_HOST
+from app.services.registry import ServiceRegistry
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the span duration histogram buckets, in seconds
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+# Type and help text for every exported metric
+METRICS = {
+    "edubytes_span_duration_seconds": ("histogram", "Duration of pipeline spans (stages, per-keyword images, downloads, saves)"),
+    "edubytes_cache_requests_total": ("counter", "Cache and reuse lookups by cache and result"),
+    "edubytes_retries_total": ("counter", "Retried calls by operation"),
+    "edubytes_provider_calls_total": ("counter", "Provider calls by provider and outcome"),
+    "edubytes_hedged_calls_total": ("counter", "Duplicate requests sent for slow provider calls"),
+    "edubytes_circuit_breaker_open": ("gauge", "1 when the provider's circuit breaker is open or half-open"),
+    "edubytes_circuit_breaker_rejected_total": ("counter", "Calls rejected by an open circuit breaker"),
+    "edubytes_rate_limit_acquisitions_total": ("counter", "Rate limiter acquisitions by limit key, all processes on the host"),
+    "edubytes_rate_limit_waits_total": ("counter", "Acquisitions that had to wait, by limit key"),
+    "edubytes_rate_limit_wait_seconds_total": ("counter", "Time spent waiting for the rate limiter, by limit key"),
+    "edubytes_rate_limit_in_flight": ("gauge", "Rate-limited calls currently in flight, by limit key"),
+    "edubytes_scheduler_queued": ("gauge", "Jobs waiting in each scheduler lane"),
+    "edubytes_scheduler_running": ("gauge", "Jobs running in each scheduler lane"),
+    "edubytes_scheduler_rejected_total": ("counter", "Jobs refused by a full scheduler lane"),
+}
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("telemetry_request_id", default=None)
+_parent_span: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("telemetry_parent_span", default=None)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_sample(name: str, labels: Labels, value: float) -> str:
+    label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels)
+    return f"{name}{{{label_text}}} {value:g}" if label_text else f"{name} {value:g}"
+
+
+class Metrics:
+    """In-process counters and histograms, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1.0, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.setdefault(key, {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        """Flatten counters and histograms into (name, labels, value) samples."""
+        with self._lock:
+            samples = [(name, labels, value) for (name, labels), value in self._counters.items()]
+            for (name, labels), histogram in self._histograms.items():
+                for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+                    samples.append((f"{name}_bucket", labels + (("le", f"{bound:g}"),), count))
+                samples.append((f"{name}_bucket", labels + (("le", "+Inf"),), histogram["count"]))
+                samples.append((f"{name}_sum", labels, histogram["sum"]))
+                samples.append((f"{name}_count", labels, histogram["count"]))
+        return samples
+
+
+def get_metrics() -> Metrics:
+    return ServiceRegistry.get('metrics', Metrics)
+
+
+def increment(name: str, value: float = 1.0, **labels) -> None:
+    """Add to a counter, e.g. increment("edubytes_retries_total", operation="download")."""
+    get_metrics().increment(name, value, **labels)
+
+
+class Tracer:
+    """Finished spans of the most recent requests, grouped by request_id."""
+
+    def __init__(self, max_requests: int = TRACE_MAX_REQUESTS):
+        self.max_requests = max_requests
+        self._traces: 'OrderedDict[str, List[Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any]) -> None:
+        request_id = record["request_id"] or "-"
+        with self._lock:
+            self._traces.setdefault(request_id, []).append(record)
+            self._traces.move_to_end(request_id)
+            while len(self._traces) > self.max_requests:
+                self._traces.popitem(last=False)
+
+    def get(self, request_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._traces.get(request_id, []))
+
+
+def get_tracer() -> Tracer:
+    return ServiceRegistry.get('tracer', Tracer)
+
+
+def record_span(
+    name: str,
+    duration: float,
+    status: str = "ok",
+    request_id: Optional[str] = None,
+    start: Optional[float] = None,
+    **attributes
+) -> Dict[str, Any]:
+    """
+    Record a finished span: one structured log line, a histogram sample and an entry in the request's trace.
+
+    Args:
+        name (str): Span name, e.g. 'images.keyword' or 'save.audio'
+        duration (float): Seconds the span took
+        status (str): 'ok' or 'error'
+        request_id (Optional[str]): Defaults to the request being traced in this context
+        start (Optional[float]): Unix start time; defaults to now minus the duration
+
+    Returns:
+        Dict[str, Any]: The span record
+    """
+    record = {
+        "request_id": request_id or _request_id.get(),
+        "span_id": attributes.pop("span_id", None) or uuid.uuid4().hex[:16],
+        "parent_id": attributes.pop("parent_id", None) or _parent_span.get(),
+        "name": name,
+        "start": round(start if start is not None else time.time() - duration, 3),
+        "duration": round(duration, 4),
+        "status": status,
+        "attributes": attributes,
+    }
+    get_metrics().observe("edubytes_span_duration_seconds", duration, span=name, status=status)
+    get_tracer().add(record)
+    logger.info(f"span {json.dumps(record, default=str)}")
+    return record
+
+
+@contextmanager
+def span(name: str, request_id: Optional[str] = None, **attributes) -> Iterator[Dict[str, Any]]:
+    """Time the block as a span; spans opened inside it (in this or copied contexts) become its children.
+
+    Attributes added to the yielded dict while the block runs are recorded too.
+    """
+    span_id = uuid.uuid4().hex[:16]
+    parent_id = _parent_span.get()
+    token = _parent_span.set(span_id)
+    started = time.time()
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield attributes
+    except BaseException as e:
+        # A generator closed early is not an error
+        status = "cancelled" if isinstance(e, GeneratorExit) else "error"
+        attributes.setdefault("error", str(e) or type(e).__name__)
+        raise
+    finally:
+        _parent_span.reset(token)
+        record_span(
+            name, time.perf_counter() - start, status, request_id=request_id, start=started,
+            span_id=span_id, parent_id=parent_id, **attributes
+        )
+
+
+def traced(name: str, **attributes) -> Callable:
+    """Decorator form of `span`; generator functions are timed until the caller stops iterating."""
+    def decorator(func: Callable) -> Callable:
+        if inspect.isgeneratorfunction(func):
+            @wraps(func)
+            def stream_wrapper(*args, **kwargs):
+                with span(name, **attributes):
+                    yield from func(*args, **kwargs)
+            return stream_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def trace(request_id: str, name: str = "request", **attributes) -> Iterator[None]:
+    """Attribute every span opened in this context (and contexts copied from it) to `request_id`."""
+    token = _request_id.set(request_id)
+    try:
+        with span(name, **attributes):
+            yield
+    finally:
+        _request_id.reset(token)
+        _export(request_id)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def _get_posthog() -> Any:
+    def create():
+        # Optional dependency, imported only when an export key is configured
+        from posthog import Posthog
+        return Posthog(POSTHOG_API_KEY, host=POSTHOG_HOST)
+    return ServiceRegistry.get('posthog', create)
+
+
+def _export(request_id: str) -> None:
+    """Send a finished request's span durations to PostHog, when configured."""
+    if not POSTHOG_API_KEY:
+        return
+    spans = get_tracer().get(request_id)
+    properties = {"spans": len(spans), "errors": sum(1 for s in spans if s["status"] == "error")}
+    # Spans such as images.keyword repeat within a request; aggregate them like the histogram does
+    for record in spans:
+        name = record["name"]
+        properties[f"{name}_seconds"] = round(properties.get(f"{name}_seconds", 0.0) + record["duration"], 4)
+        properties[f"{name}_count"] = properties.get(f"{name}_count", 0) + 1
+        properties[f"{name}_max"] = max(properties.get(f"{name}_max", 0.0), record["duration"])
+    try:
+        # The client queues events and sends them from its own thread
+        _get_posthog().capture(distinct_id=request_id, event="lesson_request", properties=properties)
+    except Exception as e:
+        logger.error(f"PostHog export failed: {str(e)}")
+
+
+def _runtime_samples() -> List[Tuple[str, Labels, float]]:
+    """Breaker, rate limiter and scheduler state, read at scrape time."""
+    from app.utils.resilience import breaker_states
+    from app.utils.rate_limiter import get_rate_limiter
+    from app.utils.scheduler import get_scheduler
+
+    samples = []
+    try:
+        for provider, state in breaker_states().items():
+            labels = _labels({"provider": provider})
+            samples.append(("edubytes_circuit_breaker_open", labels, 0 if state["state"] == "closed" else 1))
+            samples.append(("edubytes_circuit_breaker_rejected_total", labels, state["rejected"]))
+    except Exception as e:
+        logger.error(f"Failed to read circuit breaker states: {str(e)}")
+    try:
+        for key, stats in get_rate_limiter().stats().items():
+            labels = _labels({"key": key})
+            samples.append(("edubytes_rate_limit_acquisitions_total", labels, stats.get("acquisitions", 0)))
+            samples.append(("edubytes_rate_limit_waits_total", labels, stats.get("waited", 0)))
+            samples.append(("edubytes_rate_limit_wait_seconds_total", labels, stats.get("total_wait_seconds", 0.0)))
+            samples.append(("edubytes_rate_limit_in_flight", labels, stats.get("in_flight", 0)))
+    except Exception as e:
+        logger.error(f"Failed to read rate limiter stats: {str(e)}")
+    try:
+        for lane, depths in get_scheduler().queue_depths().items():
+            labels = _labels({"lane": lane})
+            samples.append(("edubytes_scheduler_queued", labels, depths["queued"]))
+            samples.append(("edubytes_scheduler_running", labels, depths["running"]))
+            samples.append(("edubytes_scheduler_rejected_total", labels, depths["rejected"]))
+    except Exception as e:
+        logger.error(f"Failed to read scheduler queue depths: {str(e)}")
+    return samples
+
+
+def render_metrics() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    grouped: Dict[str, List[str]] = {}
+    for name, labels, value in get_metrics().samples() + _runtime_samples():
+        family = next((f for f in METRICS if name == f or name.startswith(f"{f}_")), name)
+        grouped.setdefault(family, []).append(_format_sample(name, labels, value))
+
+    lines = []
+    for family in sorted(grouped):
+        metric_type, help_text = METRICS.get(family, ("untyped", ""))
+        lines.append(f"# HELP {family} {help_text}")
+        lines.append(f"# TYPE {family} {metric_type}")
+        lines.extend(sorted(grouped[family]))
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"Metrics request from {self.client_address[0]}: {format % args}")
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = METRICS_HOST) -> Optional[ThreadingHTTPServer]:
+    """
+    Serve /metrics for Prometheus on a daemon thread.
+
+    Args:
+        port (int): Port to listen on
+        host (str): Interface to bind; loopback unless METRICS_HOST says otherwise
+
+    Returns:
+        Optional[ThreadingHTTPServer]: The running server (call shutdown() to stop it), or None
+        if the port could not be bound; metrics are optional, so the app keeps starting
+    """
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.error(f"Metrics server not started on {host}:{port}: {str(e)}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Serving Prometheus metrics on http://{host}:{port}/metrics")
+    return server
@@ -1,12 +1,28 @@
+import time
 import logging
+import threading
+import concurrent.futures
 import moviepy.editor as mp
-from typing import List, Optional
+import numpy as np
+from typing import List, Optional, Tuple
 from PIL import Image
-from moviepy.video.io.VideoFileClip import VideoFileClip
 import os
+import tempfile
+from app.config import RENDER_PROFILES, RENDER_THREADS, RENDER_WORKERS
+from app.utils.output_manager import OutputManager
 
 logger = logging.getLogger(__name__)
 
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+def _get_render_pool() -> concurrent.futures.ThreadPoolExecutor:
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = concurrent.futures.ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="render")
+        return _render_pool
+
 class VideoProcessor:
     @staticmethod
     def create_multimodal_video(
@@ -15,69 +31,251 @@ class VideoProcessor:
         audio_path: Optional[str],
         images: List[Image.Image],
         video_path: Optional[str] = None,
-        duration: int = 30
+        duration: int = 30,
+        profile: str = "final",
+        request_id: Optional[str] = None
     ) -> str:
+        """
+        Compose images or a source video with a text overlay and narration.
+
+        Args:
+            output_path (str): Where to write the MP4
+            text (str): Overlay text
+            audio_path (Optional[str]): Narration track
+            images (List[Image.Image]): Frames shown in sequence when there is no source video
+            video_path (Optional[str]): Source video used as the base clip
+            duration (int): Length in seconds when built from images
+            profile (str): Key of RENDER_PROFILES, e.g. 'preview' or 'final'
+            request_id (Optional[str]): If given, the render time is stored in the output catalogue
+
+        Returns:
+            str: output_path
+        """
+        has_video = bool(video_path and os.path.exists(video_path))
+        if not images and not has_video:
+            raise ValueError("At least one image or a source video is required")
+        if profile not in RENDER_PROFILES:
+            raise ValueError(f"Unknown render profile '{profile}'")
+        settings = RENDER_PROFILES[profile]
+        height = settings["height"]
+        start = time.perf_counter()
+
+        # Every clip opened here, closed in reverse order so ffmpeg readers never leak
+        clips = []
         try:
-            # Save images temporarily
-            temp_image_paths = []
-            for i, img in enumerate(images):
-                temp_path = f"temp_image_{i}.png"
-                img.save(temp_path)
-                temp_image_paths.append(temp_path)
-
-            # Create clips from images
-            image_clips = [
-                mp.ImageClip(img_path).set_duration(duration / len(images))
-                for img_path in temp_image_paths
-            ]
-
-            # Create text overlay
-            text_clip = (mp.TextClip(
-                text,
-                fontsize=24,
-                color='white',
-                bg_color='rgba(0,0,0,0.5)',
-                size=(600, None)
-            ).set_duration(duration))
-
-            # Initialize base clip
-            if video_path and os.path.exists(video_path):
-                base_clip = mp.VideoFileClip(video_path)
-            else:
-                # If no video, concatenate image clips
-                base_clip = mp.concatenate_videoclips(image_clips)
-
-            # Combine elements
-            final_clip = mp.CompositeVideoClip([
-                base_clip,
-                text_clip.set_position(('center', 'bottom'))
-            ])
-
-            # Add audio if available
-            if audio_path and os.path.exists(audio_path):
-                audio_clip = mp.AudioFileClip(audio_path)
-                final_clip = final_clip.set_audio(audio_clip)
-
-            # Write final video
-            final_clip.write_videofile(
-                output_path,
-                fps=24,
-                codec='libx264',
-                audio_codec='aac'
-            )
+            # Per-render scratch space: concurrent renders never share temp files
+            with tempfile.TemporaryDirectory(prefix="edubytes-render-") as temp_dir:
+                # Create clips straight from the in-memory frames, downscaled for low-resolution profiles
+                image_clips = [
+                    mp.ImageClip(np.array(VideoProcessor._fit_height(img, height))).set_duration(duration / len(images))
+                    for img in images
+                ]
+                clips.extend(image_clips)
 
-            # Cleanup temporary files
-            for temp_path in temp_image_paths:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
+                # Create text overlay
+                text_clip = (mp.TextClip(
+                    text,
+                    fontsize=24,
+                    color='white',
+                    bg_color='rgba(0,0,0,0.5)',
+                    size=(VideoProcessor._scaled_width(600, height), None),
+                    tempfilename=os.path.join(temp_dir, 'text.png'),
+                    temptxt=os.path.join(temp_dir, 'text.txt')
+                ).set_duration(duration))
+                clips.append(text_clip)
 
+                # Initialize base clip
+                if has_video:
+                    # ffmpeg scales while decoding, so low-resolution profiles never decode full frames
+                    base_clip = mp.VideoFileClip(video_path, target_resolution=(height, None) if height else None)
+                else:
+                    # If no video, concatenate image clips
+                    base_clip = mp.concatenate_videoclips(image_clips)
+                clips.append(base_clip)
+
+                # Combine elements
+                final_clip = mp.CompositeVideoClip([
+                    base_clip,
+                    text_clip.set_position(('center', 'bottom'))
+                ])
+                clips.append(final_clip)
+
+                # Add audio if available
+                if audio_path and os.path.exists(audio_path):
+                    audio_clip = mp.AudioFileClip(audio_path)
+                    clips.append(audio_clip)
+                    final_clip = final_clip.set_audio(audio_clip)
+                    clips.append(final_clip)
+
+                # Write final video; moviepy's temporary audio track defaults to the cwd
+                final_clip.write_videofile(
+                    output_path,
+                    fps=settings["fps"],
+                    codec='libx264',
+                    audio_codec='aac',
+                    audio_bitrate=settings["audio_bitrate"],
+                    preset=settings["preset"],
+                    threads=RENDER_THREADS,
+                    ffmpeg_params=['-crf', str(settings["crf"])],
+                    temp_audiofile=os.path.join(temp_dir, 'temp-audio.m4a'),
+                    logger=None
+                )
+
+            elapsed = time.perf_counter() - start
+            logger.info(f"Rendered {profile} video {output_path} in {elapsed:.2f}s")
+            if request_id:
+                OutputManager._update_catalogue('record_timings', request_id, {f"render_{profile}": elapsed})
             return output_path
 
         except Exception as e:
             logger.error(f"Error creating multimodal video: {str(e)}")
             raise
         finally:
-            # Ensure cleanup of temporary files
-            for temp_path in temp_image_paths:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
+            for clip in reversed(clips):
+                try:
+                    clip.close()
+                except Exception as e:
+                    logger.warning(f"Failed to close clip: {str(e)}")
+
+    @staticmethod
+    def render_preview_then_final(
+        output_path: str,
+        text: str,
+        audio_path: Optional[str],
+        images: List[Image.Image],
+        video_path: Optional[str] = None,
+        duration: int = 30,
+        request_id: Optional[str] = None
+    ) -> Tuple[str, concurrent.futures.Future]:
+        """
+        Render a quick preview now and the final-quality video in the background.
+
+        The preview is written next to `output_path` and removed once the final
+        render has replaced it.
+
+        Returns:
+            Tuple[str, Future]: The preview path, and a future resolving to `output_path`
+        """
+        root, extension = os.path.splitext(output_path)
+        preview_path = f"{root}_preview{extension}"
+        VideoProcessor.create_multimodal_video(
+            preview_path, text, audio_path, images, video_path, duration, profile="preview", request_id=request_id
+        )
+
+        def render_final() -> str:
+            VideoProcessor.create_multimodal_video(
+                output_path, text, audio_path, images, video_path, duration, profile="final", request_id=request_id
+            )
+            if os.path.exists(preview_path):
+                os.remove(preview_path)
+            return output_path
+
+        return preview_path, _get_render_pool().submit(render_final)
+
+    @staticmethod
+    def create_slideshow(
+        output_path: str,
+        images: List[Image.Image],
+        audio_path: Optional[str] = None,
+        seconds_per_image: float = 5.0,
+        size: Tuple[int, int] = (640, 360),
+        fps: int = 12,
+        bitrate: str = "300k"
+    ) -> str:
+        """
+        Build a small Ken Burns-style slideshow: each image slowly zooms and pans.
+
+        When narration is given, the slides share its length; otherwise each
+        image is shown for `seconds_per_image`.
+
+        Returns:
+            str: output_path
+        """
+        if not images:
+            raise ValueError("A slideshow needs at least one image")
+        start = time.perf_counter()
+        clips = []
+        try:
+            with tempfile.TemporaryDirectory(prefix="edubytes-slideshow-") as temp_dir:
+                audio_clip = None
+                total = seconds_per_image * len(images)
+                if audio_path and os.path.exists(audio_path):
+                    audio_clip = mp.AudioFileClip(audio_path)
+                    clips.append(audio_clip)
+                    total = audio_clip.duration
+
+                slides = [
+                    VideoProcessor._ken_burns_clip(image, size, total / len(images), index)
+                    for index, image in enumerate(images)
+                ]
+                clips.extend(slides)
+                slideshow = mp.concatenate_videoclips(slides)
+                clips.append(slideshow)
+                if audio_clip:
+                    slideshow = slideshow.set_audio(audio_clip)
+                    clips.append(slideshow)
+
+                slideshow.write_videofile(
+                    output_path,
+                    fps=fps,
+                    codec='libx264',
+                    audio_codec='aac',
+                    bitrate=bitrate,
+                    audio_bitrate="48k",
+                    preset="slow",
+                    threads=RENDER_THREADS,
+                    temp_audiofile=os.path.join(temp_dir, 'temp-audio.m4a'),
+                    logger=None
+                )
+            logger.info(f"Rendered slideshow {output_path} in {time.perf_counter() - start:.2f}s")
+            return output_path
+        except Exception as e:
+            logger.error(f"Error creating slideshow: {str(e)}")
+            raise
+        finally:
+            for clip in reversed(clips):
+                try:
+                    clip.close()
+                except Exception as e:
+                    logger.warning(f"Failed to close clip: {str(e)}")
+
+    @staticmethod
+    def _ken_burns_clip(image: Image.Image, size: Tuple[int, int], duration: float, index: int) -> mp.VideoClip:
+        """Clip that zooms from the widest frame-shaped view of the image into (or out of) one side of it, alternating per slide."""
+        width, height = size
+        margin = 1.2  # the source covers 120% of the frame so there is room to move
+        source = image.convert('RGB')
+        cover = max(width * margin / source.width, height * margin / source.height)
+        source = source.resize((round(source.width * cover), round(source.height * cover)), Image.LANCZOS)
+        # Widest window with the frame's aspect ratio that fits in the source, so no frame is stretched
+        start_scale = min(source.width / width, source.height / height)
+        zoom_in = index % 2 == 0
+        # Alternate the pan direction so consecutive slides don't drift the same way
+        pan_x, pan_y = [(1, 0), (-1, 0), (0, 1), (0, -1)][index % 4]
+
+        def make_frame(t: float) -> np.ndarray:
+            progress = min(max(t / duration, 0.0), 1.0) if duration else 0.0
+            if not zoom_in:
+                progress = 1.0 - progress
+            # Window shrinks from the widest frame-shaped box to exactly one frame's worth of pixels
+            scale = start_scale - (start_scale - 1) * progress
+            window_w = width * scale
+            window_h = height * scale
+            left = (source.width - window_w) / 2 * (1 + pan_x * progress)
+            top = (source.height - window_h) / 2 * (1 + pan_y * progress)
+            frame = source.resize(size, Image.BILINEAR, box=(left, top, left + window_w, top + window_h))
+            return np.asarray(frame)
+
+        return mp.VideoClip(make_frame, duration=duration)
+
+    @staticmethod
+    def _fit_height(image: Image.Image, height: Optional[int]) -> Image.Image:
+        image = image.convert('RGB')
+        if height and image.height > height:
+            width = max(2, round(image.width * height / image.height) // 2 * 2)  # x264 needs even sizes
+            image = image.resize((width, height), Image.LANCZOS)
+        return image
+
+    @staticmethod
+    def _scaled_width(width: int, height: Optional[int], reference_height: int = 720) -> int:
+        return round(width * height / reference_height) if height else width
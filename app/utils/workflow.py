@@ -0,0 +1,150 @@
+# utils/workflow.py
+import time
+import logging
+import contextvars
+import concurrent.futures
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from app.utils.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+# Stage states
+PENDING = "pending"
+SUCCESS = "success"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class StageGraph:
+    """Run workflow stages concurrently, respecting their dependencies.
+
+    Each stage is started as soon as all of its dependencies have succeeded,
+    so independent branches (e.g. audio and images) overlap. A failing stage
+    only marks itself as failed; stages that depend on it are skipped and
+    every other branch keeps running.
+
+    When a scheduler is given, stages registered with a lane are queued on
+    that lane's workers instead of the graph's own thread pool.
+    """
+
+    def __init__(self, max_workers: int = 4, scheduler: Optional[Any] = None):
+        self.max_workers = max_workers
+        self.scheduler = scheduler
+        self._stages: Dict[str, Dict[str, Any]] = {}
+
+    def add_stage(
+        self,
+        name: str,
+        func: Callable,
+        depends_on: Iterable[str] = (),
+        lane: Optional[str] = None,
+        priority: int = 0
+    ) -> None:
+        """
+        Register a stage.
+
+        Args:
+            name (str): Unique stage name
+            func (Callable): Called with the results of `depends_on`, in order
+            depends_on (Iterable[str]): Names of stages that must succeed first
+            lane (Optional[str]): Scheduler lane to run on, if the graph has a scheduler
+            priority (int): Priority among this graph's jobs on the lane; lower runs first
+        """
+        if name in self._stages:
+            raise ValueError(f"Stage '{name}' is already registered")
+        depends_on = tuple(depends_on)
+        for dependency in depends_on:
+            if dependency not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dependency}'")
+        self._stages[name] = {"func": func, "depends_on": depends_on, "lane": lane, "priority": priority}
+
+    def run(
+        self,
+        on_complete: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        on_start: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Execute all stages and wait for them to finish.
+
+        Args:
+            on_complete (Optional[Callable]): Called with (name, result) as each stage settles
+            on_start (Optional[Callable]): Called with the stage name when a stage is submitted
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Per-stage dicts with status, result, error and elapsed seconds
+        """
+        results = {
+            name: {"status": PENDING, "result": None, "error": None, "elapsed": 0.0}
+            for name in self._stages
+        }
+        running = {}
+        # One ticket per run: on a shared lane this graph's stages queue behind graphs that started earlier
+        arrival = self.scheduler.arrival() if self.scheduler else None
+
+        def settle(name: str, status: str, result: Any = None, error: Optional[str] = None, elapsed: float = 0.0):
+            results[name].update(status=status, result=result, error=error, elapsed=elapsed)
+            if on_complete:
+                try:
+                    on_complete(name, results[name])
+                except Exception as e:
+                    logger.error(f"Stage completion callback failed for '{name}': {str(e)}")
+
+        def timed(name: str, func: Callable, args: list):
+            start = time.perf_counter()
+            try:
+                with span(name):
+                    return func(*args)
+            finally:
+                results[name]["elapsed"] = time.perf_counter() - start
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                # Start or skip every pending stage whose dependencies have settled
+                for name, stage in self._stages.items():
+                    if results[name]["status"] != PENDING or name in running.values():
+                        continue
+                    dependency_states = [results[d]["status"] for d in stage["depends_on"]]
+                    if any(state in (FAILED, SKIPPED) for state in dependency_states):
+                        failed = [d for d in stage["depends_on"] if results[d]["status"] in (FAILED, SKIPPED)]
+                        logger.warning(f"Skipping stage '{name}': dependency {', '.join(failed)} did not succeed")
+                        settle(name, SKIPPED, error=f"Skipped because {', '.join(failed)} did not succeed")
+                    elif all(state == SUCCESS for state in dependency_states):
+                        args = [results[d]["result"] for d in stage["depends_on"]]
+                        # Stages inherit the caller's context, e.g. the request deadline
+                        context = contextvars.copy_context()
+                        try:
+                            if self.scheduler and stage["lane"]:
+                                future = self.scheduler.submit(
+                                    stage["lane"], context.run, timed, name, stage["func"], args,
+                                    priority=stage["priority"], arrival=arrival
+                                )
+                            else:
+                                future = executor.submit(context.run, timed, name, stage["func"], args)
+                        except Exception as e:
+                            # Admission refused: only this stage fails
+                            logger.error(f"Stage '{name}' could not be scheduled: {str(e)}")
+                            settle(name, FAILED, error=str(e))
+                            continue
+                        running[future] = name
+                        if on_start:
+                            try:
+                                on_start(name)
+                            except Exception as e:
+                                logger.error(f"Stage start callback failed for '{name}': {str(e)}")
+
+                if not running:
+                    break
+
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    elapsed = results[name]["elapsed"]
+                    try:
+                        settle(name, SUCCESS, result=future.result(), elapsed=elapsed)
+                        logger.info(f"Stage '{name}' completed in {elapsed:.2f}s")
+                    except Exception as e:
+                        logger.error(f"Stage '{name}' failed after {elapsed:.2f}s: {str(e)}")
+                        settle(name, FAILED, error=str(e), elapsed=elapsed)
+
+        return results
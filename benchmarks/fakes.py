@@ -0,0 +1,398 @@
+# benchmarks/fakes.py
+import io
+import os
+import json
+import math
+import time
+import random
+import tempfile
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.services.registry import ServiceRegistry
+from app.services.mistral import MistralService
+from app.services import mistral_tiny_service
+from app.services.elevenlabs import ElevenLabsService
+from app.services.fal_ai import FalService
+
+# Latency in seconds, payload sizes and injected error rates for each stand-in provider.
+# Latency entries: {"dist": "lognormal", "median": s, "sigma": s} | {"dist": "uniform", "low": s, "high": s} |
+# {"dist": "fixed", "value": s}
+AGENT_BUILD_TIMEOUT_SECONDS = 30
+
+DEFAULT_PROFILE: Dict[str, Dict[str, Any]] = {
+    "mistral": {
+        "first_token": {"dist": "lognormal", "median": 0.6, "sigma": 0.35},
+        "tokens_per_second": 60,
+        "lesson_words": 250,
+        "error_rate": 0.0,
+    },
+    "mistral_labels": {
+        "latency": {"dist": "lognormal", "median": 0.9, "sigma": 0.3},
+        "error_rate": 0.0,
+    },
+    "elevenlabs": {
+        "first_chunk": {"dist": "lognormal", "median": 0.4, "sigma": 0.3},
+        "audio_bytes": 400_000,
+        "bytes_per_second": 400_000,
+        "chunk_bytes": 16_384,
+        "error_rate": 0.0,
+    },
+    "fal_images": {
+        "latency": {"dist": "lognormal", "median": 3.0, "sigma": 0.4},
+        "image_size": [1024, 768],
+        "error_rate": 0.0,
+    },
+    "fal_video": {
+        "latency": {"dist": "lognormal", "median": 20.0, "sigma": 0.3},
+        "video_bytes": 2_000_000,
+        "error_rate": 0.0,
+    },
+    "cdn": {
+        "latency": {"dist": "lognormal", "median": 0.15, "sigma": 0.5},
+        "bytes_per_second": 20_000_000,
+    },
+}
+
+_WORDS = (
+    "sun light plants leaves energy water roots grow seeds soil air green food sugar oxygen flowers "
+    "bees pollen garden farmer rain cloud river ocean animals forest season spring summer autumn winter"
+).split()
+
+
+class FakeProviderError(Exception):
+    """Injected provider failure."""
+
+
+def merge_profile(overrides: Optional[Dict[str, Dict[str, Any]]] = None, latency_scale: float = 1.0,
+                  error_rate: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """Apply per-provider overrides, a latency multiplier and a global error rate to the default profile."""
+    profile = json.loads(json.dumps(DEFAULT_PROFILE))
+    for provider, settings in (overrides or {}).items():
+        profile.setdefault(provider, {}).update(settings)
+    for settings in profile.values():
+        for key, value in settings.items():
+            if isinstance(value, dict) and "dist" in value:
+                value["scale"] = latency_scale
+            elif key.endswith("_per_second") and latency_scale > 0:
+                # Streaming rates shrink or grow with the latencies
+                settings[key] = value / latency_scale
+        if error_rate is not None and "error_rate" in settings:
+            settings["error_rate"] = error_rate
+    return profile
+
+
+class Behaviour:
+    """Seeded sampler for one provider's latency and failures."""
+
+    def __init__(self, name: str, settings: Dict[str, Any], seed: int):
+        self.name = name
+        self.settings = settings
+        self._random = random.Random(f"{seed}:{name}")
+        self._lock = threading.Lock()
+
+    def delay(self, key: str) -> float:
+        spec = self.settings[key]
+        with self._lock:
+            if spec["dist"] == "lognormal":
+                value = spec["median"] * math.exp(spec["sigma"] * self._random.gauss(0, 1))
+            elif spec["dist"] == "uniform":
+                value = self._random.uniform(spec["low"], spec["high"])
+            else:
+                value = spec["value"]
+        return value * spec.get("scale", 1.0)
+
+    def sleep(self, key: str) -> None:
+        time.sleep(self.delay(key))
+
+    def maybe_fail(self) -> None:
+        with self._lock:
+            failed = self._random.random() < self.settings.get("error_rate", 0.0)
+        if failed:
+            raise FakeProviderError(f"{self.name}: injected failure (HTTP 503)")
+
+
+class _Message:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeChatModel:
+    """Stands in for ChatMistralAI: stream, invoke, bind and predict with a simulated token rate."""
+
+    def __init__(self, behaviour: Behaviour, json_mode: bool = False):
+        self.behaviour = behaviour
+        self.json_mode = json_mode
+
+    def bind(self, **kwargs) -> 'FakeChatModel':
+        return FakeChatModel(self.behaviour, json_mode=kwargs.get("response_format", {}).get("type") == "json_object")
+
+    def _response(self, prompt: str) -> str:
+        rng = random.Random(prompt)
+        words = " ".join(rng.choice(_WORDS) for _ in range(self.behaviour.settings["lesson_words"]))
+        body = f"Imagine a sunny day. {words.capitalize()}."
+        if not self.json_mode:
+            return body
+        return json.dumps({
+            "body": body,
+            "hashtags": [f"#{w.capitalize()}" for w in rng.sample(_WORDS, 10)],
+            "learning_points": ["Plants need light", "Water helps plants grow", "Leaves make food"],
+            "quiz": [{"question": "What do plants need?", "answer": "Light and water"}],
+            "image_prompts": [f"A friendly {w} in a sunny garden" for w in rng.sample(_WORDS, 5)],
+        })
+
+    def stream(self, prompt: Any) -> Iterator[_Message]:
+        self.behaviour.maybe_fail()
+        self.behaviour.sleep("first_token")
+        text = self._response(str(prompt))
+        # Roughly one token per four characters, released in small bursts
+        tokens = [text[i:i + 4] for i in range(0, len(text), 4)]
+        interval = 1.0 / self.behaviour.settings["tokens_per_second"]
+        for i in range(0, len(tokens), 8):
+            time.sleep(interval * 8)
+            yield _Message("".join(tokens[i:i + 8]))
+
+    def invoke(self, prompt: Any) -> _Message:
+        return _Message("".join(chunk.content for chunk in self.stream(prompt)))
+
+    def predict(self, prompt: str) -> str:
+        return self.invoke(prompt).content
+
+
+class FakeMistralService(MistralService):
+    """MistralService on a fake model; the resilience wrappers still run."""
+
+    def __init__(self, behaviour: Behaviour):
+        self._model = FakeChatModel(behaviour)
+        self._model_lock = threading.Lock()
+
+
+class FakeLabelModel:
+    """Called by the hashtag chain (prompt | model | parser) in place of the label model."""
+
+    def __init__(self, behaviour: Behaviour):
+        self.behaviour = behaviour
+
+    def __call__(self, prompt_value: Any) -> str:
+        self.behaviour.maybe_fail()
+        self.behaviour.sleep("latency")
+        rng = random.Random(str(prompt_value))
+        return ", ".join(f"#{w.capitalize()}" for w in rng.sample(_WORDS, 10))
+
+
+class FakeLabelService(mistral_tiny_service.MistralService):
+    def __init__(self, behaviour: Behaviour):
+        self.api_key = "fake"
+        self.model = FakeLabelModel(behaviour)
+
+
+class _FakeTextToSpeech:
+    def __init__(self, behaviour: Behaviour):
+        self.behaviour = behaviour
+
+    def convert_as_stream(self, text: str, **kwargs) -> Iterator[bytes]:
+        settings = self.behaviour.settings
+        self.behaviour.maybe_fail()
+        self.behaviour.sleep("first_chunk")
+        remaining = settings["audio_bytes"]
+        chunk_bytes = settings["chunk_bytes"]
+        while remaining > 0:
+            size = min(chunk_bytes, remaining)
+            time.sleep(size / settings["bytes_per_second"])
+            remaining -= size
+            yield b"\xff" * size
+
+
+class _FakeElevenLabsClient:
+    def __init__(self, behaviour: Behaviour):
+        self.text_to_speech = _FakeTextToSpeech(behaviour)
+
+
+class _FakeVoices:
+    def resolve(self, name: str) -> str:
+        return name
+
+
+class FakeElevenLabsService(ElevenLabsService):
+    def __init__(self, behaviour: Behaviour):
+        self.api_key = "fake"
+        self.client = _FakeElevenLabsClient(behaviour)
+        self.voices = _FakeVoices()
+
+
+class _FakeFalClient:
+    def __init__(self, images: Behaviour, video: Behaviour, video_path: str):
+        self.images = images
+        self.video = video
+        self.video_path = video_path
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, endpoint: str, arguments: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        if endpoint == FalService.VIDEO_ENDPOINT:
+            self.video.maybe_fail()
+            self.video.sleep("latency")
+            # A local file, so the pipeline copies it instead of downloading
+            return {"video": {"url": self.video_path}}
+        self.images.maybe_fail()
+        self.images.sleep("latency")
+        with self._lock:
+            self._counter += 1
+            start = self._counter
+        return {"images": [{"url": f"https://fake-cdn.local/images/{start}-{i}.jpg"}
+                           for i in range(arguments.get("num_images", 1))]}
+
+
+class FakeFalService(FalService):
+    def __init__(self, images: Behaviour, video: Behaviour, video_path: str):
+        self.api_key = "fake"
+        self.client = _FakeFalClient(images, video, video_path)
+
+
+class _FakeResponse:
+    def __init__(self, payload: bytes, behaviour: Behaviour):
+        self.payload = payload
+        self.behaviour = behaviour
+        self.status_code = 200
+        self.headers = {"Content-Length": str(len(payload))}
+
+    def __enter__(self) -> '_FakeResponse':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+    def raise_for_status(self) -> None:
+        return None
+
+    def iter_content(self, chunk_size: int = 65536) -> Iterator[bytes]:
+        rate = self.behaviour.settings["bytes_per_second"]
+        for i in range(0, len(self.payload), chunk_size):
+            chunk = self.payload[i:i + chunk_size]
+            time.sleep(len(chunk) / rate)
+            yield chunk
+
+
+class FakeHTTPSession:
+    """Serves generated images for the fake CDN URLs."""
+
+    def __init__(self, behaviour: Behaviour, image_size: List[int], seed: int):
+        from PIL import Image
+        self.behaviour = behaviour
+        # Noise does not compress, so the payload is close to a real photo's size
+        noise = random.Random(seed).randbytes(image_size[0] * image_size[1] * 3)
+        buffer = io.BytesIO()
+        Image.frombytes("RGB", tuple(image_size), noise).save(buffer, format="JPEG", quality=85)
+        self.image_bytes = buffer.getvalue()
+
+    def get(self, url: str, **kwargs) -> _FakeResponse:
+        self.behaviour.sleep("latency")
+        return _FakeResponse(self.image_bytes, self.behaviour)
+
+    def close(self) -> None:
+        return None
+
+
+def install_fakes(profile: Dict[str, Dict[str, Any]], work_dir: str, seed: int = 0,
+                  rate_limits: bool = False) -> Dict[str, Any]:
+    """
+    Reset the service registry and register stand-in providers, plus a private cache, catalogue and output dir.
+
+    The agents are then built through their real registry factories (see build_agents), so a
+    registry that cannot build nested services fails here rather than in production.
+
+    Args:
+        profile (Dict[str, Dict[str, Any]]): Provider behaviour, see DEFAULT_PROFILE
+        work_dir (str): Scratch directory for outputs and databases
+        seed (int): Seed for latency and failure sampling
+        rate_limits (bool): Keep the configured provider rate limits instead of disabling them
+
+    Returns:
+        Dict[str, Any]: Payload sizes actually served, for the report
+    """
+    import app.agents.content_agent as content_agent_module
+    from app.config import RATE_LIMITS
+    from app.utils.cache import LessonCache
+    from app.utils.catalogue import OutputCatalogue
+    from app.utils.keywords import KeywordExtractor
+    from app.utils.output_manager import OutputManager
+    from app.utils.rate_limiter import RateLimiter
+
+    ServiceRegistry.reset()
+    behaviours = {name: Behaviour(name, settings, seed) for name, settings in profile.items()}
+
+    video_path = os.path.join(work_dir, "fake-video.mp4")
+    with open(video_path, "wb") as f:
+        f.write(os.urandom(profile["fal_video"]["video_bytes"]))
+    session = FakeHTTPSession(behaviours["cdn"], profile["fal_images"]["image_size"], seed)
+
+    OutputManager.OUTPUT_DIR = os.path.join(work_dir, "outputs")
+    os.makedirs(OutputManager.OUTPUT_DIR, exist_ok=True)
+    ServiceRegistry.override('http_session', session)
+    # Providers are built lazily, from inside the agent factories, exactly like the real ones
+    ServiceRegistry.register('mistral', lambda: FakeMistralService(behaviours["mistral"]))
+    ServiceRegistry.register('mistral_labels', lambda: FakeLabelService(behaviours["mistral_labels"]))
+    ServiceRegistry.register('elevenlabs', lambda: FakeElevenLabsService(behaviours["elevenlabs"]))
+    ServiceRegistry.register(
+        'fal', lambda: FakeFalService(behaviours["fal_images"], behaviours["fal_video"], video_path)
+    )
+    ServiceRegistry.override('catalogue', OutputCatalogue(path=os.path.join(work_dir, "catalogue.db")))
+    ServiceRegistry.override('rate_limiter', RateLimiter(
+        path=os.path.join(work_dir, "ratelimits.db"), limits=RATE_LIMITS if rate_limits else {}
+    ))
+    ServiceRegistry.override('keyword_extractor', KeywordExtractor(path=os.path.join(work_dir, "keywords.json")))
+    # Agents come from the registry's real factories; the content agent then gets a private cache
+    content_agent_module.LESSON_CACHE_ENABLED = False
+    agents = build_agents()
+    agents['content_agent'].cache = LessonCache(path=os.path.join(work_dir, "lessons.db"))
+    return {"image_bytes": len(session.image_bytes), "video_bytes": profile["fal_video"]["video_bytes"],
+            "audio_bytes": profile["elevenlabs"]["audio_bytes"]}
+
+
+def build_agents(timeout: float = AGENT_BUILD_TIMEOUT_SECONDS) -> Dict[str, Any]:
+    """
+    Build every agent concurrently through the registry factories, as the first requests of a fresh process do.
+
+    Args:
+        timeout (float): Seconds to wait for all agents before declaring the registry blocked
+
+    Returns:
+        Dict[str, Any]: Agents by registry name
+
+    Raises:
+        RuntimeError: If a factory fails or does not return in time
+    """
+    from app.services import registry
+
+    factories = {
+        'content_agent': registry.get_content_agent,
+        'image_agent': registry.get_image_agent,
+        'audio_agent': registry.get_audio_agent,
+        'video_agent': registry.get_video_agent,
+    }
+    agents: Dict[str, Any] = {}
+    errors: Dict[str, Exception] = {}
+
+    def build(name: str) -> None:
+        try:
+            agents[name] = factories[name]()
+        except Exception as e:
+            errors[name] = e
+
+    # Daemon threads, so a deadlocked factory fails the run instead of hanging it
+    threads = [threading.Thread(target=build, args=(name,), daemon=True) for name in factories]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    blocked = sorted(set(factories) - set(agents) - set(errors))
+    if blocked:
+        raise RuntimeError(f"Registry factories still blocked after {timeout}s: {', '.join(blocked)}")
+    if errors:
+        raise RuntimeError(f"Registry factories failed: {errors}")
+    return agents
+
+
+def make_work_dir() -> str:
+    return tempfile.mkdtemp(prefix="edubytes-bench-")
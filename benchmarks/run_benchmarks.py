@@ -0,0 +1,457 @@
+# benchmarks/run_benchmarks.py
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import resource
+import threading
+import subprocess
+import concurrent.futures
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from benchmarks.fakes import install_fakes, make_work_dir, merge_profile
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SCENARIOS = ("content", "labels", "images", "audio", "video", "workflow")
+DEFAULT_SCENARIOS = "content,labels,images,audio,workflow"
+STAGES = ("content", "labels", "images", "audio", "video")
+SAMPLE_INTERVAL_SECONDS = 0.05
+
+SAMPLE_LESSON = (
+    "Imagine a sunny day in the garden. Plants use sunlight, water and air to make their own food. "
+    "The green leaves catch the light like tiny solar panels, the roots drink water from the soil, "
+    "and the plant turns them into sugar and gives us oxygen to breathe. "
+) * 4
+SAMPLE_LABELS = ["#Photosynthesis", "#Plants", "#Sunlight", "#Leaves", "#Oxygen"]
+SAMPLE_IMAGE_PROMPTS = [f"A friendly cartoon of {topic} in a sunny garden" for topic in
+                        ("a leaf", "the sun", "roots", "a flower", "a watering can")]
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize_latencies(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 4),
+        "p50": round(percentile(values, 0.50), 4),
+        "p95": round(percentile(values, 0.95), 4),
+        "p99": round(percentile(values, 0.99), 4),
+        "max": round(max(values), 4),
+    }
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+class ResourceSampler:
+    """Sample resident memory on a background thread and measure process CPU time for a block."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.peak_rss = 0
+        self._stop = threading.Event()
+
+    def _sample(self) -> None:
+        while not self._stop.is_set():
+            self.peak_rss = max(self.peak_rss, _rss_bytes() or 0)
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> 'ResourceSampler':
+        self.start_rss = _rss_bytes()
+        self.peak_rss = self.start_rss or 0
+        self._cpu_start = time.process_time()
+        self._wall_start = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.cpu_seconds = time.process_time() - self._cpu_start
+        self.wall_seconds = time.perf_counter() - self._wall_start
+        if self.start_rss is None:
+            # No /proc: fall back to the lifetime peak (kilobytes on Linux, bytes on macOS)
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.peak_rss = peak if sys.platform == "darwin" else peak * 1024
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "wall_seconds": round(self.wall_seconds, 3),
+            "cpu_seconds": round(self.cpu_seconds, 3),
+            "cpu_utilization": round(self.cpu_seconds / self.wall_seconds, 3) if self.wall_seconds else 0.0,
+            "start_rss_mb": round((self.start_rss or 0) / 2**20, 1),
+            "peak_rss_mb": round(self.peak_rss / 2**20, 1),
+        }
+
+
+class StageRecorder:
+    """Wall and thread CPU time for each pipeline stage call, gathered across worker threads."""
+
+    def __init__(self):
+        self.samples: Dict[str, Dict[str, List[float]]] = {}
+        self.errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, stage: str, func: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            wall = time.perf_counter()
+            cpu = time.thread_time()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                with self._lock:
+                    self.errors[stage] = self.errors.get(stage, 0) + 1
+                raise
+            finally:
+                with self._lock:
+                    entry = self.samples.setdefault(stage, {"wall": [], "cpu": []})
+                    entry["wall"].append(time.perf_counter() - wall)
+                    entry["cpu"].append(time.thread_time() - cpu)
+        return timed
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            stage: {
+                "latency": summarize_latencies(entry["wall"]),
+                # CPU of the stage's own thread; work it hands to other pools is counted in the process total
+                "cpu_seconds_mean": round(sum(entry["cpu"]) / len(entry["cpu"]), 4),
+                "errors": self.errors.get(stage, 0),
+            }
+            for stage, entry in sorted(self.samples.items())
+        }
+
+
+@contextmanager
+def instrument_stages(recorder: StageRecorder) -> Iterator[None]:
+    """Time every LessonPipeline stage method for the duration of the block."""
+    from app.utils.lesson_pipeline import LessonPipeline
+
+    originals = {stage: getattr(LessonPipeline, f"_generate_{stage}") for stage in STAGES}
+    for stage, method in originals.items():
+        setattr(LessonPipeline, f"_generate_{stage}", recorder.wrap(stage, method))
+    try:
+        yield
+    finally:
+        for stage, method in originals.items():
+            setattr(LessonPipeline, f"_generate_{stage}", method)
+
+
+class Scenarios:
+    """One benchmarked operation per scenario; each call runs one request and returns extra timings."""
+
+    def __init__(self, age: int, video_needed: bool):
+        self.age = age
+        self.video_needed = video_needed
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def unique_prompt(self) -> str:
+        # Distinct prompts keep the lesson cache and catalogue reuse from short-circuiting the run
+        with self._lock:
+            self._counter += 1
+            return f"How do plants make food from sunlight? (benchmark run {self._counter})"
+
+    def _request_dir(self) -> str:
+        from app.utils.output_manager import OutputManager
+        request_id = OutputManager.generate_request_id()
+        OutputManager.create_request_directory(request_id)
+        return request_id
+
+    def content(self) -> Dict[str, float]:
+        from app.services.registry import get_content_agent
+        start = time.perf_counter()
+        first = None
+        for kind, _ in get_content_agent().stream_structured(self.age, self.unique_prompt()):
+            if first is None:
+                first = time.perf_counter() - start
+        return {"first_token": first}
+
+    def labels(self) -> Dict[str, float]:
+        from app.utils.label_generator import generate_content_labels
+        if not generate_content_labels(f"{SAMPLE_LESSON} {self.unique_prompt()}"):
+            raise RuntimeError("No labels generated")
+        return {}
+
+    def images(self) -> Dict[str, float]:
+        from app.services.registry import get_image_agent
+        from app.utils.output_manager import OutputManager
+        request_id = self._request_dir()
+        images = get_image_agent().generate_images(SAMPLE_LESSON, self.age, SAMPLE_LABELS, SAMPLE_IMAGE_PROMPTS)
+        OutputManager.save_images_output(request_id, images)
+        return {}
+
+    def audio(self) -> Dict[str, float]:
+        from app.services.registry import get_audio_agent
+        from app.utils.output_manager import OutputManager
+        request_id = self._request_dir()
+        start = time.perf_counter()
+        first = None
+        chunks = get_audio_agent().stream_audio(SAMPLE_LESSON, self.age)
+        for _ in OutputManager.stream_audio_output(request_id, chunks):
+            if first is None:
+                first = time.perf_counter() - start
+        return {"first_chunk": first}
+
+    def video(self) -> Dict[str, float]:
+        from app.services.registry import get_video_agent
+        from app.utils.output_manager import OutputManager
+        request_id = self._request_dir()
+        OutputManager.save_video_output(request_id, get_video_agent().generate_video(SAMPLE_LESSON, self.age))
+        return {}
+
+    def workflow(self) -> Dict[str, float]:
+        """Drive the Gradio handler exactly as the UI does, images on."""
+        from app.ui.interface import start_generation_workflow
+        start = time.perf_counter()
+        first = None
+        updates = 0
+        for update in start_generation_workflow(self.age, self.unique_prompt(), self.video_needed, True):
+            updates += 1
+            if first is None:
+                first = time.perf_counter() - start
+        # The handler reports failures as a final update instead of raising
+        status = str(update[0].get("value") or "") if isinstance(update[0], dict) else ""
+        if status.startswith("Error") or status == "An unexpected error occurred":
+            raise RuntimeError(status)
+        return {"first_update": first, "updates": updates}
+
+
+def run_level(scenario: Callable[[], Dict[str, float]], requests: int, concurrency: int) -> Dict[str, Any]:
+    """Run `requests` calls of a scenario with `concurrency` in flight and report latency, throughput and resources."""
+    from app.services.registry import ServiceRegistry
+    from app.utils.resilience import PROVIDERS, CircuitBreaker, breaker_states
+
+    # Start every level with closed breakers, so failures in one level do not leak into the next
+    for provider in PROVIDERS:
+        ServiceRegistry.override(f'breaker.{provider}', CircuitBreaker(provider))
+
+    latencies: List[float] = []
+    extras: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def one_request() -> None:
+        start = time.perf_counter()
+        try:
+            extra = scenario()
+        except Exception as e:
+            with lock:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            return
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            for key, value in extra.items():
+                if value is not None:
+                    extras.setdefault(key, []).append(value)
+
+    recorder = StageRecorder()
+    with instrument_stages(recorder), ResourceSampler() as sampler:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(one_request) for _ in range(requests)]:
+                future.result()
+
+    result = {
+        "concurrency": concurrency,
+        "requests": requests,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "error_rate": round(1 - len(latencies) / requests, 4) if requests else 0.0,
+        "throughput_per_second": round(len(latencies) / sampler.wall_seconds, 4) if sampler.wall_seconds else 0.0,
+        "latency": summarize_latencies(latencies),
+        **{key: summarize_latencies(values) for key, values in extras.items() if key != "updates"},
+        "resources": sampler.report(),
+        "breakers": breaker_states(),
+    }
+    stages = recorder.report()
+    if stages:
+        result["stages"] = stages
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(
+    scenarios: List[str],
+    concurrency_levels: List[int],
+    requests: int,
+    profile: Dict[str, Dict[str, Any]],
+    age: int = 8,
+    video_needed: bool = False,
+    seed: int = 0,
+    rate_limits: bool = False
+) -> Dict[str, Any]:
+    """
+    Run each scenario at each concurrency level against the stand-in providers.
+
+    Args:
+        scenarios (List[str]): Names from SCENARIOS
+        concurrency_levels (List[int]): Requests in flight for each level
+        requests (int): Requests per level
+        profile (Dict[str, Dict[str, Any]]): Stand-in provider behaviour, see benchmarks.fakes.DEFAULT_PROFILE
+        age (int): Learner age for every lesson
+        video_needed (bool): Whether the workflow scenario also makes a video
+        seed (int): Seed for latency and failure sampling
+        rate_limits (bool): Apply the configured provider rate limits
+
+    Returns:
+        Dict[str, Any]: Run metadata and per scenario, per level results
+    """
+    import app.utils.lesson_pipeline as lesson_pipeline
+
+    work_dir = make_work_dir()
+    try:
+        payloads = install_fakes(profile, work_dir, seed=seed, rate_limits=rate_limits)
+        # Embedding lookups would make reuse depend on earlier runs
+        lesson_pipeline.SEMANTIC_REUSE_ENABLED = False
+        runner = Scenarios(age, video_needed)
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        for name in scenarios:
+            for concurrency in concurrency_levels:
+                logger.warning(f"Running {name} at concurrency {concurrency} ({requests} requests)")
+                results.setdefault(name, []).append(run_level(getattr(runner, name), requests, concurrency))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": seed,
+            "age": age,
+            "video": video_needed,
+            "rate_limits": rate_limits,
+            "profile": profile,
+            "payloads": payloads,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> str:
+    """Render p50/p95 latency and throughput changes against a baseline run."""
+    lines = [
+        f"Comparing {current['meta'].get('commit')} against {baseline['meta'].get('commit')}",
+        f"{'scenario':<10} {'conc':>4} {'p50':>16} {'p95':>16} {'throughput/s':>20}",
+    ]
+
+    def change(old: Optional[float], new: Optional[float]) -> str:
+        if old is None or new is None:
+            return "n/a"
+        delta = f"{(new - old) / old * 100:+.0f}%" if old else "new"
+        return f"{new:.3f} ({delta})"
+
+    for name, levels in current["results"].items():
+        previous = {level["concurrency"]: level for level in baseline["results"].get(name, [])}
+        for level in levels:
+            old = previous.get(level["concurrency"])
+            if old is None:
+                continue
+            lines.append(
+                f"{name:<10} {level['concurrency']:>4} "
+                f"{change(old['latency'].get('p50'), level['latency'].get('p50')):>16} "
+                f"{change(old['latency'].get('p95'), level['latency'].get('p95')):>16} "
+                f"{change(old['throughput_per_second'], level['throughput_per_second']):>20}"
+            )
+    return "\n".join(lines)
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"{'scenario':<10} {'conc':>4} {'ok':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'cpu%':>6} {'rss MB':>8}"]
+    for name, levels in report["results"].items():
+        for level in levels:
+            latency = level["latency"]
+            resources = level["resources"]
+            lines.append(
+                f"{name:<10} {level['concurrency']:>4} {level['succeeded']:>5} "
+                f"{latency.get('p50', 0):>8.3f} {latency.get('p95', 0):>8.3f} {latency.get('p99', 0):>8.3f} "
+                f"{level['throughput_per_second']:>8.2f} {resources['cpu_utilization'] * 100:>6.0f} "
+                f"{resources['peak_rss_mb']:>8.1f}"
+            )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the lesson pipeline against local stand-in providers")
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS,
+                        help=f"Comma-separated scenarios from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per concurrency level")
+    parser.add_argument("--profile", help="JSON file overriding provider settings in benchmarks.fakes.DEFAULT_PROFILE")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiply every simulated latency")
+    parser.add_argument("--error-rate", type=float, help="Failure rate applied to every provider")
+    parser.add_argument("--age", type=int, default=8)
+    parser.add_argument("--video", action="store_true", help="Also generate a video in the workflow scenario")
+    parser.add_argument("--rate-limits", action="store_true", help="Apply the configured provider rate limits")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Show the application's INFO logs")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    overrides = None
+    if args.profile:
+        with open(args.profile, encoding='utf-8') as f:
+            overrides = json.load(f)
+    report = run_benchmarks(
+        scenarios,
+        [int(c) for c in args.concurrency.split(",") if c.strip()],
+        args.requests,
+        merge_profile(overrides, latency_scale=args.latency_scale, error_rate=args.error_rate),
+        age=args.age,
+        video_needed=args.video,
+        seed=args.seed,
+        rate_limits=args.rate_limits,
+    )
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{report['meta']['commit'] or 'unknown'}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print(format_report(report))
+    print(f"Saved results to {output}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print(compare(json.load(f), report))
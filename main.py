@@ -1,10 +1,13 @@
 import os
+import sys
 import logging
+import argparse
 from dotenv import load_dotenv
 
-from app.ui.interface import create_interface
-
-from app.config import Config, PORT_APP
+from app.config import (
+    Config, PORT_APP, STARTUP_BUDGET_SECONDS, GRADIO_CONCURRENCY_LIMIT, GRADIO_MAX_QUEUE,
+    METRICS_ENABLED, METRICS_PORT, METRICS_HOST
+)
 
 def setup_logging():
     logging.basicConfig(
@@ -16,20 +19,46 @@ def setup_logging():
         ]
     )
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the EduBytes Gradio app")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Report per-module import time for a cold start and exit")
+    parser.add_argument("--check-startup", action="store_true",
+                        help="Exit non-zero if a cold start exceeds STARTUP_BUDGET_SECONDS")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+
     # Load environment variables
     load_dotenv()
     
     # Setup logging
     setup_logging()
     logger = logging.getLogger(__name__)
+
+    if args.profile_startup or args.check_startup:
+        from app.utils.startup import profile_imports, format_report, check_startup_budget
+        if args.profile_startup:
+            print(format_report(profile_imports()))
+        if args.check_startup and not check_startup_budget(STARTUP_BUDGET_SECONDS):
+            sys.exit(1)
+        return
     
     try:
         # Initialize config
         config = Config()
+
+        # Prometheus scrapes stage timings, cache hits, retries and provider state from here
+        if METRICS_ENABLED:
+            from app.utils.telemetry import start_metrics_server
+            start_metrics_server(METRICS_PORT, METRICS_HOST)
         
         # Create and launch the Gradio interface
+        from app.ui.interface import create_interface
         demo = create_interface()
+        # Let many lessons run at once; the job scheduler bounds provider work per lane
+        demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY_LIMIT, max_size=GRADIO_MAX_QUEUE)
         demo.launch(
             server_name="0.0.0.0", 
             server_port=PORT_APP,